@@ -1,11 +1,33 @@
+import logging
 import os
 from flask import Flask
 from flask_cors import CORS
 import cloudinary
 from config.config import Config
 from config.extensions import mongo, jwt
+from config.log_config import setup_logging
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+# Seconds between attempts to create the indexes while the database is unreachable
+INDEX_RETRY_SECONDS = 30
+
+def ensure_indexes():
+    from services import leaderboard, equity_history
+    from models.transaction import Transaction
+    from models.user import User
+    from models.chat import ChatMessage, ChatSession
+
+    User.ensure_indexes()
+    ChatMessage.ensure_indexes()
+    ChatSession.ensure_indexes()
+    Transaction.ensure_indexes()
+    leaderboard.ensure_indexes()
+    equity_history.ensure_indexes()
 
 def create_app():
+    setup_logging()
     app = Flask(__name__)
     CORS(app, resources={r"/*": {"origins": "*"}})
 
@@ -13,6 +35,7 @@ def create_app():
     # Load configuration
     app.config["MONGO_URI"] = Config.MONGO_URI
     app.config["JWT_SECRET_KEY"] = Config.JWT_SECRET_KEY
+    app.config["ENABLE_BACKGROUND_JOBS"] = Config.ENABLE_BACKGROUND_JOBS
 
     #define cloudinary config from env variables
     cloudinary.config(
@@ -22,14 +45,16 @@ def create_app():
     )
 
     # Initialize extensions
-    mongo.init_app(app)
+    mongo.init_app(app, event_listeners=[metrics.MongoCommandTimer()])
     jwt.init_app(app)
+    metrics.init_app(app)
 
     # Register routes ------------------------------------------------------------------------------------
     from routes.auth_routes import auth_bp
     from routes.transaction_routes import transaction_bp
     from routes.user_routes import user_bp
     from routes.chat import chat_bp
+    from routes.market_routes import market_bp
 
 
 
@@ -37,9 +62,26 @@ def create_app():
     app.register_blueprint(transaction_bp, url_prefix="/transaction")
     app.register_blueprint(user_bp, url_prefix="/user")
     app.register_blueprint(chat_bp, url_prefix="/chat")
+    app.register_blueprint(market_bp, url_prefix="/market")
 
     #-----------------------------------------------------------------------------------------------------
 
+    # Indexes and background jobs ------------------------------------------------------------------------
+    from services.scheduler import should_start_jobs, start_retrying_job
+    from services import leaderboard, equity_snapshots, quote_refresher, symbol_index, hot_stocks
+
+    # Created in the background: with the database down, create_index would block startup
+    # until the server selection timeout and the indexes would never be created
+    start_retrying_job(app, "ensure-indexes", INDEX_RETRY_SECONDS, ensure_indexes)
+
+    if should_start_jobs(app):
+        leaderboard.start_leaderboard_refresher(app)
+        equity_snapshots.start_equity_snapshot_job(app)
+        quote_refresher.start_quote_refresher(app)
+        symbol_index.start_symbol_index_refresher(app)
+        hot_stocks.start_hot_stocks_refresher(app)
+
+    #-----------------------------------------------------------------------------------------------------
 
     
     @app.route("/")
@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+import random
+import tracemalloc
+
+# Allow running this file directly from the repository root or the backend directory.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.cache import SWRCache
+from services.quote_table import QuoteTable
+
+# Memory and lookup cost of the column-wise quote table against the dict-based SWRCache.
+# Usage: python3 backend/benchmarks/bench_quote_table.py [symbols] [portfolio_size]
+
+def make_quote(rng):
+    price = rng.uniform(5, 500)
+    return {"c": price, "d": 1.0, "dp": 0.5, "h": price * 1.01, "l": price * 0.99, "o": price, "pc": price - 1.0, "t": 1700000000}
+
+def fill(cache, symbols, quotes):
+    # A fresh copy per entry, like a decoded Finnhub response the cache keeps (or drops)
+    for symbol, quote in zip(symbols, quotes):
+        cache.put(symbol, {**quote, "c": quote["c"] + 0.0})
+
+def measure_memory(factory, symbols, quotes):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    cache = factory()
+    fill(cache, symbols, quotes)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return cache, size
+
+def timed(label, fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<40} {best * 1000:10.3f} ms")
+
+def main():
+    n_symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    portfolio_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+    rng = random.Random(42)
+    symbols = [f"SYM{i}" for i in range(n_symbols)]
+    quotes = [make_quote(rng) for _ in symbols]
+    fetch = lambda symbol: None
+
+    dict_cache, dict_bytes = measure_memory(lambda: SWRCache(fetch, ttl=60, max_size=n_symbols), symbols, quotes)
+    table, table_bytes = measure_memory(lambda: QuoteTable(fetch, ttl=60, max_size=n_symbols), symbols, quotes)
+    print(f"{n_symbols} cached quotes")
+    print(f"{'SWRCache (dict per quote)':<40} {dict_bytes / n_symbols:10.1f} bytes/symbol")
+    print(f"{'QuoteTable (columns)':<40} {table_bytes / n_symbols:10.1f} bytes/symbol")
+
+    portfolio = rng.sample(symbols, portfolio_size)
+    print(f"\nprices for {portfolio_size} symbols")
+    timed("SWRCache, peek per symbol", lambda: [dict_cache.peek(symbol)["c"] for symbol in portfolio])
+    timed("QuoteTable.gather", lambda: table.gather(portfolio, "c"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import random
+import numpy as np
+
+# Allow running this file directly from the repository root or the backend directory.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.valuation import value_portfolio, value_portfolios
+from services.equity_snapshots import flatten_accounts, value_accounts
+
+# Micro-benchmark for the valuation engine.
+# Usage: python3 backend/benchmarks/bench_valuation.py [accounts] [holdings_per_account] [snapshot_accounts]
+
+def make_accounts(n_accounts, holdings_per_account, symbols):
+    rng = random.Random(42)
+    accounts = []
+    for i in range(n_accounts):
+        portfolio = []
+        for symbol in rng.sample(symbols, holdings_per_account):
+            quantity = rng.uniform(1, 100)
+            avg_price = rng.uniform(5, 500)
+            portfolio.append({"symbol": symbol, "quantity": quantity, "avg_price": avg_price, "total_cost": quantity * avg_price})
+        accounts.append({
+            "_id": i,
+            "balance": rng.uniform(0, 10_000),
+            "portfolio": portfolio,
+            "stats": {"net_contributions": rng.uniform(1_000, 50_000), "total_commissions": rng.uniform(0, 100)}
+        })
+    return accounts
+
+def value_with_python_loop(account, prices):
+    """The per-holding loop the routes used before the engine existed, for comparison."""
+    total_portfolio_value = 0
+    unrealized_pl = 0
+    for stock in account["portfolio"]:
+        total_invested = round(stock.get("total_cost", 0), 2)
+        current_price = prices.get(stock["symbol"]) or stock.get("avg_price", 0)
+        current_value = round(stock.get("quantity", 0) * current_price, 2)
+        total_portfolio_value += current_value
+        unrealized_pl += round(current_value - total_invested, 2)
+    net_contributions = account["stats"]["net_contributions"]
+    total_equity = account["balance"] + total_portfolio_value
+    overall_pl = round(total_equity - net_contributions, 2)
+    return overall_pl, round(overall_pl / net_contributions * 100, 2), round(overall_pl - unrealized_pl, 2)
+
+def timed(label, fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<40} {best * 1000:10.1f} ms")
+    return best
+
+def main():
+    n_accounts = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    holdings_per_account = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    symbols = [f"SYM{i}" for i in range(500)]
+    prices = {symbol: random.uniform(5, 500) for symbol in symbols}
+    accounts = make_accounts(n_accounts, holdings_per_account, symbols)
+
+    print(f"{n_accounts} accounts x {holdings_per_account} holdings")
+    timed("python loop, one account at a time", lambda: [value_with_python_loop(a, prices) for a in accounts])
+    timed("value_portfolio, one account at a time", lambda: [value_portfolio(a["portfolio"], prices, a["balance"], a["stats"]) for a in accounts])
+    timed("value_portfolios, one batch", lambda: value_portfolios(accounts, prices))
+
+    # The nightly equity snapshot job: flatten every account, then value them all at once
+    n_snapshot = int(sys.argv[3]) if len(sys.argv) > 3 else 100_000
+    snapshot_accounts = make_accounts(n_snapshot, holdings_per_account, symbols)
+    price_lookup = lambda distinct: np.array([prices[symbol] for symbol in distinct])
+    print(f"\n{n_snapshot} accounts x {holdings_per_account} holdings (equity snapshots)")
+    columns = flatten_accounts(snapshot_accounts)
+    timed("flatten_accounts", lambda: flatten_accounts(snapshot_accounts), repeat=1)
+    timed("value_accounts", lambda: value_accounts(columns, price_lookup))
+
+if __name__ == "__main__":
+    main()
@@ -13,4 +13,113 @@ class Config:
     CLOUDINARY_CLOUD_NAME = os.getenv("CLOUDINARY_CLOUD_NAME")
     CLOUDINARY_API_KEY = os.getenv("CLOUDINARY_API_KEY")
     CLOUDINARY_API_SECRET = os.getenv("CLOUDINARY_API_SECRET")
-  
\ No newline at end of file
+
+    FINNHUB_API_KEY = os.getenv("FINNHUB_API_KEY")
+    FINNHUB_BASE_URL = os.getenv("FINNHUB_BASE_URL", "https://finnhub.io/api/v1")
+    # Quote cache: how long a quote is fresh, how long a stale one may still be served
+    # while it is refreshed in the background, and how many symbols are kept in memory.
+    QUOTE_CACHE_TTL = float(os.getenv("QUOTE_CACHE_TTL", 30))
+    QUOTE_CACHE_STALE_TTL = float(os.getenv("QUOTE_CACHE_STALE_TTL", 300))
+    QUOTE_CACHE_MAX_SIZE = int(os.getenv("QUOTE_CACHE_MAX_SIZE", 2048))
+    # Upper bound on concurrent Finnhub requests made by batch quote lookups.
+    QUOTE_FETCH_WORKERS = int(os.getenv("QUOTE_FETCH_WORKERS", 16))
+    # Rate budget for all Finnhub calls of the process: calls per minute (the free tier
+    # allows 60) and the largest burst. QUOTE_RATE_BUDGET_PER_MINUTE is the older name.
+    FINNHUB_RATE_BUDGET_PER_MINUTE = float(os.getenv("FINNHUB_RATE_BUDGET_PER_MINUTE", os.getenv("QUOTE_RATE_BUDGET_PER_MINUTE", 50)))
+    FINNHUB_RATE_BURST = float(os.getenv("FINNHUB_RATE_BURST", 10))
+    # Background refresh of the hot symbol set (held by any user or recently requested).
+    # The refresher uses at most QUOTE_REFRESH_BUDGET_SHARE of the available rate budget and
+    # requested symbols lose half their weight every QUOTE_HOT_HALF_LIFE seconds.
+    QUOTE_REFRESH_INTERVAL = float(os.getenv("QUOTE_REFRESH_INTERVAL", 5))
+    QUOTE_REFRESH_BUDGET_SHARE = float(os.getenv("QUOTE_REFRESH_BUDGET_SHARE", 0.7))
+    QUOTE_HOT_HALF_LIFE = float(os.getenv("QUOTE_HOT_HALF_LIFE", 900))
+    QUOTE_HELD_SYMBOLS_REFRESH_SECONDS = float(os.getenv("QUOTE_HELD_SYMBOLS_REFRESH_SECONDS", 300))
+
+    # Server-side caches for the /market endpoints (seconds). Company profiles and symbol
+    # searches hardly change, news does; stale entries are served while they refresh.
+    MARKET_PROFILE_TTL = float(os.getenv("MARKET_PROFILE_TTL", 3 * 24 * 3600))
+    MARKET_SEARCH_TTL = float(os.getenv("MARKET_SEARCH_TTL", 24 * 3600))
+    MARKET_NEWS_TTL = float(os.getenv("MARKET_NEWS_TTL", 300))
+    # Requests per minute (and burst) each client IP may make to /market/*, which is public
+    MARKET_RATE_LIMIT_PER_MINUTE = float(os.getenv("MARKET_RATE_LIMIT_PER_MINUTE", 120))
+    MARKET_RATE_LIMIT_BURST = int(os.getenv("MARKET_RATE_LIMIT_BURST", 60))
+    # How often the hot stocks list is recomputed, and how long clients may cache it
+    HOT_STOCKS_REFRESH_SECONDS = float(os.getenv("HOT_STOCKS_REFRESH_SECONDS", 60))
+
+    # Local symbol search: the US symbol list (downloaded from Finnhub when missing), an
+    # optional JSON snapshot of the index next to it for fast startup, and how often the list is refreshed
+    SYMBOL_LIST_PATH = os.getenv("SYMBOL_LIST_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "us_symbols.json"))
+    SYMBOL_INDEX_SNAPSHOT_PATH = os.getenv("SYMBOL_INDEX_SNAPSHOT_PATH", SYMBOL_LIST_PATH + ".index.json")
+    SYMBOL_LIST_REFRESH_SECONDS = float(os.getenv("SYMBOL_LIST_REFRESH_SECONDS", 24 * 3600))
+
+    # POST /transaction/batch: most orders per request, and whether the account update and the
+    # transaction history are written in one multi-document transaction (needs a replica set)
+    TRADE_BATCH_MAX_ORDERS = int(os.getenv("TRADE_BATCH_MAX_ORDERS", 50))
+    TRADE_BATCH_USE_TRANSACTIONS = os.getenv("TRADE_BATCH_USE_TRANSACTIONS", "false").lower() == "true"
+
+    # Newest transactions returned with /user/profile; older ones are paged via /transaction/history
+    PROFILE_RECENT_TRANSACTIONS = int(os.getenv("PROFILE_RECENT_TRANSACTIONS", 20))
+
+    # Chat messages are deleted by a TTL index this many days after they were sent
+    CHAT_RETENTION_DAYS = float(os.getenv("CHAT_RETENTION_DAYS", 7))
+
+    # AI chat context: the portfolio summary is cached per account version and quote epoch
+    # (prices in it are at most one epoch old), lists the most recent transactions and is
+    # cut to roughly AI_CONTEXT_MAX_TOKENS
+    AI_CONTEXT_QUOTE_EPOCH_SECONDS = float(os.getenv("AI_CONTEXT_QUOTE_EPOCH_SECONDS", 60))
+    AI_CONTEXT_MAX_TOKENS = int(os.getenv("AI_CONTEXT_MAX_TOKENS", 1500))
+    AI_CONTEXT_RECENT_TRANSACTIONS = int(os.getenv("AI_CONTEXT_RECENT_TRANSACTIONS", 10))
+    AI_CONTEXT_CACHE_SIZE = int(os.getenv("AI_CONTEXT_CACHE_SIZE", 1024))
+
+    # AI conversation window: /chat/ask sends the model at most the last
+    # AI_CONVERSATION_RECENT_MESSAGES messages of the session within AI_CONVERSATION_MAX_TOKENS;
+    # older turns are folded into a rolling summary of at most AI_CONVERSATION_SUMMARY_MAX_TOKENS
+    AI_CONVERSATION_RECENT_MESSAGES = int(os.getenv("AI_CONVERSATION_RECENT_MESSAGES", 10))
+    AI_CONVERSATION_MAX_TOKENS = int(os.getenv("AI_CONVERSATION_MAX_TOKENS", 2000))
+    AI_CONVERSATION_SUMMARY_MAX_TOKENS = int(os.getenv("AI_CONVERSATION_SUMMARY_MAX_TOKENS", 500))
+
+    # AI answer cache: an answer is reused for the same question while the account and the
+    # quote epoch of the AI context are unchanged, for at most AI_RESPONSE_CACHE_TTL_SECONDS
+    AI_RESPONSE_CACHE_ENABLED = os.getenv("AI_RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    AI_RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("AI_RESPONSE_CACHE_TTL_SECONDS", AI_CONTEXT_QUOTE_EPOCH_SECONDS))
+    AI_RESPONSE_CACHE_SIZE = int(os.getenv("AI_RESPONSE_CACHE_SIZE", 2048))
+
+    # AI providers: the longest wait for an answer (for streams, for the next chunk), and
+    # hedging: after AI_HEDGE_DELAY_SECONDS without an answer the request is also sent to the
+    # provider's fallback ("provider:fallback,...") and the first answer wins
+    AI_TIMEOUT_SECONDS = float(os.getenv("AI_TIMEOUT_SECONDS", 30))
+    AI_TIMEOUT_AZURE_SECONDS = float(os.getenv("AI_TIMEOUT_AZURE_SECONDS", AI_TIMEOUT_SECONDS))
+    AI_TIMEOUT_GEMINI_SECONDS = float(os.getenv("AI_TIMEOUT_GEMINI_SECONDS", AI_TIMEOUT_SECONDS))
+    AI_HEDGE_ENABLED = os.getenv("AI_HEDGE_ENABLED", "false").lower() == "true"
+    AI_HEDGE_DELAY_SECONDS = float(os.getenv("AI_HEDGE_DELAY_SECONDS", 3))
+    AI_HEDGE_FALLBACKS = dict(
+        pair.split(":", 1) for pair in os.getenv("AI_HEDGE_FALLBACKS", "azure:gemini,gemini:azure").split(",") if ":" in pair
+    )
+
+    # A local "fake" chat model that streams a canned answer, for tests and development
+    AI_FAKE_MODEL_ENABLED = os.getenv("AI_FAKE_MODEL_ENABLED", "false").lower() == "true"
+    AI_FAKE_MODEL_CHUNK_DELAY = float(os.getenv("AI_FAKE_MODEL_CHUNK_DELAY", 0.05))
+
+    # Logging: level, output format ("json" or "text"), the share of DEBUG/INFO records kept
+    # (warnings and errors are always kept) and how many records may wait to be written
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+    LOG_SAMPLE_RATE_DEBUG = float(os.getenv("LOG_SAMPLE_RATE_DEBUG", 1.0))
+    LOG_SAMPLE_RATE_INFO = float(os.getenv("LOG_SAMPLE_RATE_INFO", 1.0))
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+
+    # Request metrics on /metrics (Prometheus text format), only served when METRICS_TOKEN is set;
+    # scrapers send it as a bearer token. With PROFILING_ENABLED, requests sent with the token in
+    # an X-Profile-Token header run under cProfile and the stats are written to PROFILE_DIR.
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+    PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "profiles"))
+
+    # Background jobs (leaderboard refresh etc.) run inside the API process
+    ENABLE_BACKGROUND_JOBS = os.getenv("ENABLE_BACKGROUND_JOBS", "true").lower() == "true"
+    LEADERBOARD_REFRESH_SECONDS = float(os.getenv("LEADERBOARD_REFRESH_SECONDS", 60))
+    # How many rows per sort key are kept in memory; larger limits are read from the collection
+    LEADERBOARD_SNAPSHOT_SIZE = int(os.getenv("LEADERBOARD_SNAPSHOT_SIZE", 50))
+    # Nightly equity snapshots of every account (hour in UTC) and the Mongo read/write batch size
+    EQUITY_SNAPSHOT_HOUR_UTC = int(os.getenv("EQUITY_SNAPSHOT_HOUR_UTC", 21))
+    EQUITY_SNAPSHOT_BATCH_SIZE = int(os.getenv("EQUITY_SNAPSHOT_BATCH_SIZE", 5000))
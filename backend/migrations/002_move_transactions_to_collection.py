@@ -0,0 +1,70 @@
+import os
+from pymongo import MongoClient, UpdateOne, ASCENDING, DESCENDING
+
+# This script requires the MONGO_URI to be passed as an environment variable.
+# Example: MONGO_URI="..." python3 backend/migrations/002_move_transactions_to_collection.py
+MONGO_URI = os.environ.get("MONGO_URI")
+
+def run_migration():
+    """
+    Moves the transaction history embedded in each user document (`users.transactions`)
+    into the `transactions` collection, indexed on (user_id, date), and then removes the
+    embedded array from the user document.
+
+    Each moved transaction is upserted on (user_id, legacy_index), so the script can be
+    re-run safely if it is interrupted half way through a user.
+    """
+    if not MONGO_URI:
+        print("Error: The MONGO_URI environment variable is not set.")
+        print("Please run the script like this:")
+        print('MONGO_URI="your_connection_string" python3 backend/migrations/002_move_transactions_to_collection.py')
+        return
+
+    try:
+        print(f"Attempting to connect to MongoDB using the provided MONGO_URI...")
+        client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+        client.admin.command('ping')
+        print("Successfully connected to the database.")
+    except Exception as e:
+        print(f"Error connecting to the database: {e}")
+        return
+
+    try:
+        db = client.get_database()
+        users_collection = db.users
+        transactions_collection = db.transactions
+        transactions_collection.create_index([("user_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)])
+
+        users_migrated = 0
+        transactions_moved = 0
+        # The query finds all users that still have an embedded 'transactions' array.
+        for user in users_collection.find({"transactions": {"$exists": True}}, {"transactions": 1}):
+            operations = []
+            for index, transaction in enumerate(user.get("transactions", [])):
+                document = {**transaction, "user_id": user["_id"], "legacy_index": index}
+                document.pop("_id", None)
+                operations.append(UpdateOne(
+                    {"user_id": user["_id"], "legacy_index": index},
+                    {"$setOnInsert": document},
+                    upsert=True
+                ))
+            if operations:
+                transactions_collection.bulk_write(operations, ordered=False)
+            users_collection.update_one({"_id": user["_id"]}, {"$unset": {"transactions": ""}})
+            users_migrated += 1
+            transactions_moved += len(operations)
+
+        print("-" * 30)
+        print("Database migration completed.")
+        print(f"Users migrated:      {users_migrated}")
+        print(f"Transactions moved:  {transactions_moved}")
+        print("-" * 30)
+    except Exception as e:
+        print(f"An error occurred during the migration: {e}")
+    finally:
+        client.close()
+        print("Database connection closed.")
+
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,76 @@
+import os
+from pymongo import MongoClient, UpdateOne, ASCENDING
+
+# This script requires the MONGO_URI to be passed as an environment variable.
+# Example: MONGO_URI="..." python3 backend/migrations/003_compact_equity_snapshots.py
+MONGO_URI = os.environ.get("MONGO_URI")
+
+SLOTS = 31
+
+def run_migration():
+    """
+    Compacts the one-document-per-day `equity_snapshots` collection into the monthly
+    bucket documents of `equity_history` ({user_id, month, equity: [31], net_contributions: [31]})
+    and then drops `equity_snapshots`.
+
+    Buckets are created with $setOnInsert and days are written with positional $set,
+    so the script can be re-run safely if it is interrupted.
+    """
+    if not MONGO_URI:
+        print("Error: The MONGO_URI environment variable is not set.")
+        print("Please run the script like this:")
+        print('MONGO_URI="your_connection_string" python3 backend/migrations/003_compact_equity_snapshots.py')
+        return
+
+    try:
+        print(f"Attempting to connect to MongoDB using the provided MONGO_URI...")
+        client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+        client.admin.command('ping')
+        print("Successfully connected to the database.")
+    except Exception as e:
+        print(f"Error connecting to the database: {e}")
+        return
+
+    try:
+        db = client.get_database()
+        history_collection = db.equity_history
+        history_collection.create_index([("user_id", ASCENDING), ("month", ASCENDING)], unique=True)
+
+        snapshots_moved = 0
+        operations = []
+        for snapshot in db.equity_snapshots.find({}, {"user_id": 1, "date": 1, "total_equity": 1, "net_contributions": 1}):
+            date = snapshot["date"]
+            month = date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            key = {"user_id": snapshot["user_id"], "month": month}
+            operations.append(UpdateOne(
+                key,
+                {"$setOnInsert": {"equity": [None] * SLOTS, "net_contributions": [None] * SLOTS}},
+                upsert=True
+            ))
+            operations.append(UpdateOne(key, {"$set": {
+                f"equity.{date.day - 1}": snapshot.get("total_equity"),
+                f"net_contributions.{date.day - 1}": snapshot.get("net_contributions")
+            }}))
+            snapshots_moved += 1
+            if len(operations) >= 5000:
+                # ordered, so each bucket exists before its day is written
+                history_collection.bulk_write(operations, ordered=True)
+                operations = []
+        if operations:
+            history_collection.bulk_write(operations, ordered=True)
+
+        db.equity_snapshots.drop()
+
+        print("-" * 30)
+        print("Database migration completed.")
+        print(f"Snapshots compacted: {snapshots_moved}")
+        print("-" * 30)
+    except Exception as e:
+        print(f"An error occurred during the migration: {e}")
+    finally:
+        client.close()
+        print("Database connection closed.")
+
+
+if __name__ == "__main__":
+    run_migration()
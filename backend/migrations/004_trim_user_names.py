@@ -0,0 +1,56 @@
+import os
+from pymongo import MongoClient
+from pymongo.collation import Collation
+
+# Usernames are looked up case-insensitively through an index on the trimmed name
+# (see User.find_by_name), instead of a regex that scanned every user. This migration
+# trims the names stored before registration started trimming them, and reports names
+# that only differ by case, since only one of them can be found by name.
+# Example: MONGO_URI="..." python3 backend/migrations/004_trim_user_names.py
+MONGO_URI = os.environ.get("MONGO_URI")
+
+
+def run_migration():
+    if not MONGO_URI:
+        print("Error: The MONGO_URI environment variable is not set.")
+        print("Please run the script like this:")
+        print('MONGO_URI="your_connection_string" python3 backend/migrations/004_trim_user_names.py')
+        return
+
+    try:
+        print("Attempting to connect to MongoDB using the provided MONGO_URI...")
+        client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+        client.admin.command('ping')
+        print("Successfully connected to the database.")
+    except Exception as e:
+        print(f"Error connecting to the database: {e}")
+        return
+
+    try:
+        users = client.get_database().users
+        trimmed = 0
+        for user in users.find({"name": {"$regex": r"^\s|\s$"}}, {"name": 1}):
+            users.update_one({"_id": user["_id"]}, {"$set": {"name": user["name"].strip()}})
+            trimmed += 1
+
+        duplicates = list(users.aggregate([
+            {"$group": {"_id": "$name", "count": {"$sum": 1}, "names": {"$push": "$name"}}},
+            {"$match": {"count": {"$gt": 1}}}
+        ], collation=Collation(locale="en", strength=2)))
+
+        print("-" * 30)
+        print("Database migration completed.")
+        print(f"Usernames trimmed: {trimmed}")
+        print(f"Usernames that differ only by case: {len(duplicates)}")
+        for group in duplicates:
+            print(f"  {', '.join(group['names'])}")
+        print("-" * 30)
+    except Exception as e:
+        print(f"An error occurred during the update: {e}")
+    finally:
+        client.close()
+        print("Database connection closed.")
+
+
+if __name__ == "__main__":
+    run_migration()
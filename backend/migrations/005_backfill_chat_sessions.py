@@ -0,0 +1,67 @@
+import os
+from pymongo import MongoClient
+
+# Chat sessions are listed from the `chat_sessions` summaries that every saved message
+# updates (see ChatSession.record_message). This migration builds the summaries of the
+# sessions that already exist from their retained messages in `chat`. It can be run again:
+# it overwrites each session's totals with the ones it computes and keeps its other fields
+# (such as the conversation summary).
+# Example: MONGO_URI="..." python3 backend/migrations/005_backfill_chat_sessions.py
+MONGO_URI = os.environ.get("MONGO_URI")
+
+
+def run_migration():
+    if not MONGO_URI:
+        print("Error: The MONGO_URI environment variable is not set.")
+        print("Please run the script like this:")
+        print('MONGO_URI="your_connection_string" python3 backend/migrations/005_backfill_chat_sessions.py')
+        return
+
+    try:
+        print("Attempting to connect to MongoDB using the provided MONGO_URI...")
+        client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+        client.admin.command('ping')
+        print("Successfully connected to the database.")
+    except Exception as e:
+        print(f"Error connecting to the database: {e}")
+        return
+
+    try:
+        db = client.get_database()
+        # $merge matches on these fields and needs a unique index on them (the app creates it too)
+        db.chat_sessions.create_index([("user_id", 1), ("session_id", 1)], unique=True)
+        # $merge writes on the server; the returned cursor is empty
+        db.chat.aggregate([
+            {"$sort": {"timestamp": 1}},
+            {"$group": {
+                "_id": {"user_id": "$user_id", "session_id": "$session_id"},
+                "message_count": {"$sum": 1},
+                "created_at": {"$first": "$timestamp"},
+                "last_message_time": {"$last": "$timestamp"},
+                "session_name": {"$last": "$session_name"}
+            }},
+            {"$project": {
+                "_id": 0,
+                "user_id": "$_id.user_id",
+                "session_id": "$_id.session_id",
+                "message_count": 1,
+                "created_at": 1,
+                "last_message_time": 1,
+                "session_name": 1
+            }},
+            {"$merge": {"into": "chat_sessions", "on": ["user_id", "session_id"], "whenMatched": "merge"}}
+        ], allowDiskUse=True)
+
+        print("-" * 30)
+        print("Database migration completed.")
+        print(f"Chat sessions: {db.chat_sessions.count_documents({})}")
+        print("-" * 30)
+    except Exception as e:
+        print(f"An error occurred during the update: {e}")
+    finally:
+        client.close()
+        print("Database connection closed.")
+
+
+if __name__ == "__main__":
+    run_migration()
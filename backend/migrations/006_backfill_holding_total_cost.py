@@ -0,0 +1,56 @@
+import os
+from pymongo import MongoClient
+
+# Holdings stored before `total_cost` existed only have quantity and avg_price. The trade
+# engine copes with them, but valuation, dust liquidation and the running totals read
+# total_cost directly. This migration sets total_cost = avg_price * quantity on every such
+# holding and bumps portfolio_version so cached summaries are rebuilt. It can be run again.
+# Example: MONGO_URI="..." python3 backend/migrations/006_backfill_holding_total_cost.py
+MONGO_URI = os.environ.get("MONGO_URI")
+
+
+def run_migration():
+    if not MONGO_URI:
+        print("Error: The MONGO_URI environment variable is not set.")
+        print("Please run the script like this:")
+        print('MONGO_URI="your_connection_string" python3 backend/migrations/006_backfill_holding_total_cost.py')
+        return
+
+    try:
+        print("Attempting to connect to MongoDB using the provided MONGO_URI...")
+        client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+        client.admin.command('ping')
+        print("Successfully connected to the database.")
+    except Exception as e:
+        print(f"Error connecting to the database: {e}")
+        return
+
+    try:
+        result = client.get_database().users.update_many(
+            {"portfolio": {"$elemMatch": {"total_cost": {"$exists": False}}}},
+            [{"$set": {
+                "portfolio": {"$map": {
+                    "input": "$portfolio",
+                    "as": "holding",
+                    "in": {"$mergeObjects": ["$$holding", {"total_cost": {"$ifNull": [
+                        "$$holding.total_cost",
+                        {"$multiply": [{"$ifNull": ["$$holding.avg_price", 0]}, "$$holding.quantity"]}
+                    ]}}]}
+                }},
+                "portfolio_version": {"$add": [{"$ifNull": ["$portfolio_version", 0]}, 1]}
+            }}]
+        )
+
+        print("-" * 30)
+        print("Database migration completed.")
+        print(f"Accounts updated: {result.modified_count}")
+        print("-" * 30)
+    except Exception as e:
+        print(f"An error occurred during the update: {e}")
+    finally:
+        client.close()
+        print("Database connection closed.")
+
+
+if __name__ == "__main__":
+    run_migration()
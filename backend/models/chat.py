@@ -1,5 +1,28 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+from config.config import Config
+from config.extensions import mongo
+from utils.pagination import after_filter, before_filter
+
+# Fields of a message the chat UI renders; history reads return only these
+HISTORY_PROJECTION = {"role": 1, "message": 1, "timestamp": 1}
+SESSION_FIELDS = {"session_id": 1, "session_name": 1}
+SESSION_LIST_PROJECTION = {"_id": 0, "session_id": 1, "session_name": 1, "last_message_time": 1, "message_count": 1, "created_at": 1}
+# Error code Mongo answers with when an index exists with other options
+INDEX_OPTIONS_CONFLICT = 85
+
+def ensure_ttl_index(collection, field):
+    """Creates (or updates the expiry of) the TTL index that deletes `collection` documents CHAT_RETENTION_DAYS after `field`."""
+    retention = int(Config.CHAT_RETENTION_DAYS * 24 * 3600)
+    try:
+        collection.create_index([(field, ASCENDING)], expireAfterSeconds=retention)
+    except OperationFailure as e:
+        if e.code != INDEX_OPTIONS_CONFLICT:
+            raise
+        # The retention period changed: update the existing TTL index in place
+        mongo.db.command("collMod", collection.name, index={"keyPattern": {field: 1}, "expireAfterSeconds": retention})
 
 class ChatMessage:
     def __init__(self, user_id, message, role, timestamp=None, session_id=None, session_name=None, _id=None):
@@ -21,6 +44,13 @@ class ChatMessage:
             "timestamp": self.timestamp
         }
 
+    def save(self):
+        """Inserts the message into `chat` and counts it towards its session in `chat_sessions`."""
+        inserted = mongo.db.chat.insert_one(self.to_dict())
+        self.id = str(inserted.inserted_id)
+        ChatSession.record_message(self)
+        return self
+
     @classmethod
     def from_dict(cls, data):
         return cls(
@@ -32,3 +62,138 @@ class ChatMessage:
             timestamp=data.get("timestamp"),
             _id=data.get("_id")
         )
+
+    @staticmethod
+    def ensure_indexes():
+        """
+        History reads and session deletes use the (user_id, session_id, timestamp) index.
+        Retention is enforced by a TTL index on timestamp: Mongo deletes messages older than
+        CHAT_RETENTION_DAYS itself (its TTL monitor runs about once a minute).
+        """
+        mongo.db.chat.create_index([("user_id", ASCENDING), ("session_id", ASCENDING), ("timestamp", ASCENDING)])
+        mongo.db.chat.create_index([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)])
+        ensure_ttl_index(mongo.db.chat, "timestamp")
+
+    @staticmethod
+    def find_history(user_id_str: str, session_id: str = None, limit: int = None, before: str = None):
+        """
+        Returns a user's messages (of one session, if given) with only the rendered fields.
+        Without `limit` or `before` the whole retained history is returned oldest-first.
+        Otherwise returns up to `limit` messages older than the `before` cursor
+        (see utils.pagination), newest-first. A malformed cursor raises ValueError.
+        """
+        query = {"user_id": ObjectId(user_id_str)}
+        projection = dict(HISTORY_PROJECTION) if session_id else {**HISTORY_PROJECTION, **SESSION_FIELDS}
+        if session_id:
+            query["session_id"] = session_id
+        if not limit and not before:
+            return list(mongo.db.chat.find(query, projection).sort("timestamp", ASCENDING))
+        if before:
+            query.update(before_filter("timestamp", before))
+        return list(mongo.db.chat.find(query, projection).sort([("timestamp", DESCENDING), ("_id", DESCENDING)]).limit(limit or 0))
+
+    @staticmethod
+    def find_session_after(user_id_str: str, session_id: str, after: str = None):
+        """A session's messages after the `after` cursor (all of them without one), oldest first."""
+        query = {"user_id": ObjectId(user_id_str), "session_id": session_id}
+        if after:
+            query.update(after_filter("timestamp", after))
+        return list(mongo.db.chat.find(query, HISTORY_PROJECTION).sort([("timestamp", ASCENDING), ("_id", ASCENDING)]))
+
+    @staticmethod
+    def delete_session(user_id_str: str, session_id: str) -> int:
+        """Deletes all messages of one of the user's sessions and returns how many were removed."""
+        return mongo.db.chat.delete_many({"user_id": ObjectId(user_id_str), "session_id": session_id}).deleted_count
+
+
+class ChatSession:
+    """
+    One document per chat session in `chat_sessions`, kept up to date by every message
+    write, so listing a user's sessions is a read of the (user_id, last_message_time)
+    index instead of a $group over all of their messages.
+    message_count counts the retained messages: the TTL index deletes messages without
+    touching their session, so sessions whose first counted message (created_at) is past
+    the retention period are recounted from `chat` when they are listed.
+    """
+
+    @staticmethod
+    def ensure_indexes():
+        mongo.db.chat_sessions.create_index([("user_id", ASCENDING), ("session_id", ASCENDING)], unique=True)
+        mongo.db.chat_sessions.create_index([("user_id", ASCENDING), ("last_message_time", DESCENDING)])
+        # A session expires with its last message
+        ensure_ttl_index(mongo.db.chat_sessions, "last_message_time")
+
+    @staticmethod
+    def record_message(message: ChatMessage):
+        """Counts a saved message towards its session, creating the session on its first message."""
+        mongo.db.chat_sessions.update_one(
+            {"user_id": ObjectId(message.user_id), "session_id": message.session_id},
+            {
+                "$inc": {"message_count": 1},
+                "$max": {"last_message_time": message.timestamp},
+                "$min": {"created_at": message.timestamp},
+                # like the message history, the session is named after its latest message
+                "$set": {"session_name": message.session_name}
+            },
+            upsert=True
+        )
+
+    @staticmethod
+    def find_by_user(user_id_str: str):
+        """The user's sessions with a message inside the retention period, most recently active first."""
+        since = datetime.utcnow() - timedelta(days=Config.CHAT_RETENTION_DAYS)
+        sessions = list(mongo.db.chat_sessions.find(
+            {"user_id": ObjectId(user_id_str), "last_message_time": {"$gte": since}},
+            SESSION_LIST_PROJECTION
+        ).sort("last_message_time", DESCENDING))
+        expired = [s for s in sessions if s.get("created_at") is None or s["created_at"] < since]
+        if expired:
+            ChatSession.recount(user_id_str, expired, since)
+        return sessions
+
+    @staticmethod
+    def recount(user_id_str: str, sessions, since):
+        """
+        Recounts `sessions` (as listed by find_by_user) from their messages sent since `since`
+        and stores the counts, unless a new message was counted meanwhile. Updates the dicts.
+        """
+        rows = mongo.db.chat.aggregate([
+            {"$match": {
+                "user_id": ObjectId(user_id_str),
+                "session_id": {"$in": [s["session_id"] for s in sessions]},
+                "timestamp": {"$gte": since}
+            }},
+            {"$group": {"_id": "$session_id", "message_count": {"$sum": 1}, "created_at": {"$min": "$timestamp"}}}
+        ])
+        counts = {row["_id"]: row for row in rows}
+        for session in sessions:
+            row = counts.get(session["session_id"], {"message_count": 0, "created_at": since})
+            mongo.db.chat_sessions.update_one(
+                {"user_id": ObjectId(user_id_str), "session_id": session["session_id"], "message_count": session["message_count"]},
+                {"$set": {"message_count": row["message_count"], "created_at": row["created_at"]}}
+            )
+            session["message_count"] = row["message_count"]
+
+    @staticmethod
+    def get_summary(user_id_str: str, session_id: str):
+        """The session's rolling conversation summary and the cursor of the last message folded into it."""
+        session = mongo.db.chat_sessions.find_one(
+            {"user_id": ObjectId(user_id_str), "session_id": session_id}, {"summary": 1, "summary_through": 1}
+        ) or {}
+        return session.get("summary"), session.get("summary_through")
+
+    @staticmethod
+    def save_summary(user_id_str: str, session_id: str, previous_through, summary: str, through: str) -> bool:
+        """
+        Stores a new summary if the stored one still ends at `previous_through`, so of two
+        requests folding the same turns only one writes. Returns whether it was stored.
+        """
+        result = mongo.db.chat_sessions.update_one(
+            {"user_id": ObjectId(user_id_str), "session_id": session_id, "summary_through": previous_through},
+            {"$set": {"summary": summary, "summary_through": through}}
+        )
+        return result.modified_count > 0
+
+    @staticmethod
+    def delete(user_id_str: str, session_id: str):
+        mongo.db.chat_sessions.delete_one({"user_id": ObjectId(user_id_str), "session_id": session_id})
@@ -1,16 +1,30 @@
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from config.extensions import mongo # Import mongo instance
+from utils.pagination import before_filter
+
+# Types that move cash into the account and count towards net contributions.
+CONTRIBUTION_TYPES = ['deposit', 'liquidation']
+TRADE_TYPES = ['buy', 'sell']
 
 class Transaction:
-    def __init__(self, user_id, type, symbol, quantity, price, commission=0.0, timestamp=None, _id=None):
+    """
+    A single account event stored in the `transactions` collection.
+    Trades ('buy'/'sell') carry symbol, quantity, price and commission;
+    cash events ('deposit'/'liquidation') carry amount and description.
+    """
+    def __init__(self, user_id, type, symbol=None, quantity=0.0, price=0.0, commission=0.0, amount=None, description=None, date=None, _id=None):
         self.id = str(_id) if _id else None
         self.user_id = str(user_id)
-        self.type = type  # 'buy' or 'sell'
-        self.symbol = symbol.upper()
+        self.type = type  # 'buy', 'sell', 'deposit' or 'liquidation'
+        self.symbol = symbol.upper() if symbol else None
         self.quantity = float(quantity)
         self.price = float(price)
         self.commission = float(commission)
-        self.timestamp = timestamp if timestamp else datetime.utcnow()
+        self.amount = float(amount) if amount is not None else None
+        self.description = description
+        self.date = date if date else datetime.utcnow()
 
     def total(self):
         """
@@ -26,29 +40,100 @@ class Transaction:
         return 0.0
 
     def to_dict(self):
-        return {
+        data = {
             "user_id": ObjectId(self.user_id),
             "type": self.type,
-            "symbol": self.symbol,
-            "quantity": self.quantity,
-            "price": self.price,
-            "commission": self.commission,
-            "total": self.total(),
-            "timestamp": self.timestamp
+            "date": self.date
         }
+        if self.type in TRADE_TYPES:
+            data.update({
+                "symbol": self.symbol,
+                "quantity": self.quantity,
+                "price": self.price,
+                "commission": self.commission
+            })
+        if self.amount is not None:
+            data["amount"] = self.amount
+        if self.description is not None:
+            data["description"] = self.description
+        return data
+
+    def save(self):
+        """Inserts the transaction into the `transactions` collection."""
+        inserted = mongo.db.transactions.insert_one(self.to_dict())
+        self.id = str(inserted.inserted_id)
+        return self
 
     @classmethod
     def from_dict(cls, data):
         return cls(
             user_id=data["user_id"],
             type=data["type"],
-            symbol=data["symbol"],
-            quantity=data["quantity"],
-            price=data["price"],
+            symbol=data.get("symbol"),
+            quantity=data.get("quantity", 0.0),
+            price=data.get("price", 0.0),
             commission=data.get("commission", 0.0),
-            timestamp=data.get("timestamp", datetime.utcnow()),
+            amount=data.get("amount"),
+            description=data.get("description"),
+            date=data.get("date", data.get("timestamp")),
             _id=data.get("_id")
         )
 
+    @staticmethod
+    def serialize(data):
+        """Makes a stored transaction JSON-ready: `_id` becomes `id` and the date an ISO string."""
+        data['id'] = str(data.pop('_id'))
+        data['date'] = data['date'].isoformat() if isinstance(data.get('date'), datetime) else None
+        return data
+
+    @staticmethod
+    def ensure_indexes():
+        # _id breaks ties between transactions with the same date for keyset pagination
+        mongo.db.transactions.create_index([("user_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)])
+
+    @staticmethod
+    def find_by_user(user_id_str: str) -> list:
+        """Returns a user's transactions in chronological order, ready for JSON serialization."""
+        return list(mongo.db.transactions.find(
+            {"user_id": ObjectId(user_id_str)},
+            {"_id": 0, "user_id": 0}
+        ).sort("date", ASCENDING))
+
+    @staticmethod
+    def cursor_by_user(user_id_str: str, limit: int = None, before: str = None):
+        """
+        Returns a Mongo cursor over a user's transactions, newest first.
+        `before` is a pagination cursor (see utils.pagination); a malformed one raises ValueError.
+        """
+        query = {"user_id": ObjectId(user_id_str)}
+        if before:
+            query.update(before_filter("date", before))
+        cursor = mongo.db.transactions.find(query, {"user_id": 0}).sort([("date", DESCENDING), ("_id", DESCENDING)])
+        if limit:
+            cursor = cursor.limit(limit)
+        return cursor
+
+    @staticmethod
+    def totals_by_user(user_ids: list) -> dict:
+        """
+        Sums net contributions and commissions per user inside the database,
+        so callers never load the history itself. Returns {user_id_str: totals}.
+        """
+        pipeline = [
+            {"$match": {"user_id": {"$in": [ObjectId(uid) for uid in user_ids]}}},
+            {"$group": {
+                "_id": "$user_id",
+                "net_contributions": {"$sum": {"$cond": [{"$in": ["$type", CONTRIBUTION_TYPES]}, {"$ifNull": ["$amount", 0]}, 0]}},
+                "total_commissions": {"$sum": {"$cond": [{"$in": ["$type", TRADE_TYPES]}, {"$ifNull": ["$commission", 0]}, 0]}}
+            }}
+        ]
+        return {
+            str(row["_id"]): {
+                "net_contributions": row["net_contributions"],
+                "total_commissions": row["total_commissions"]
+            }
+            for row in mongo.db.transactions.aggregate(pipeline)
+        }
+
     def calculate_total_commissions(transactions):
         return round(sum(txn.get("commission", 0.0) for txn in transactions), 2)
@@ -1,9 +1,18 @@
+import logging
 from werkzeug.security import generate_password_hash, check_password_hash
-from bson import ObjectId
+from pymongo import ASCENDING
+from pymongo.collation import Collation
+from pymongo.errors import OperationFailure
 from config.extensions import mongo # Import mongo instance
 
+logger = logging.getLogger(__name__)
+
+# Usernames are compared case-insensitively; the name index uses the same collation,
+# so lookups by name are index reads (a query only uses an index with a matching collation).
+NAME_COLLATION = Collation(locale="en", strength=2)
+
 class User:
-    def __init__(self, name, email, password, balance=0.0, portfolio=None, profile_image=None, profile_image_public_id=None, is_public=True, _id=None):
+    def __init__(self, name, email, password, balance=0.0, portfolio=None, profile_image=None, profile_image_public_id=None, is_public=True, stats=None, _id=None):
         self.id = str(_id) if _id else None
         self.name = name
         self.email = email
@@ -13,46 +22,26 @@ class User:
         self.profile_image = profile_image 
         self.profile_image_public_id = profile_image_public_id
         self.is_public = is_public
+        self.stats = stats # running account totals, see services/account_stats.py
 
     @staticmethod
-    def get_user_profile_data(user_id_str: str) -> dict:
+    def ensure_indexes():
+        try:
+            mongo.db.users.create_index([("email", ASCENDING)], unique=True)
+        except OperationFailure as e:
+            # Existing duplicate emails: keep the lookup fast anyway
+            logger.error("Could not create the unique email index, creating a plain one: %s", e)
+            mongo.db.users.create_index([("email", ASCENDING)])
+        mongo.db.users.create_index([("name", ASCENDING)], collation=NAME_COLLATION)
+        mongo.db.users.create_index([("is_public", ASCENDING)])
+
+    @staticmethod
+    def find_by_name(name: str, projection=None):
         """
-        A static method to fetch and assemble all profile data for a given user ID.
-        This includes user details, portfolio, and transactions from the user document.
+        Finds a user by name, ignoring case and surrounding whitespace. Returns the raw document or None.
         """
-        user_id = ObjectId(user_id_str)
-        
-        # Fetch the main user document which contains portfolio and transactions
-        user_data = mongo.db.users.find_one({"_id": user_id})
-        if not user_data:
-            return None # Or raise an exception
-
-        # Portfolio and transactions are embedded in the user document, not separate collections.
-        portfolio = user_data.get("portfolio", [])
-        transactions = user_data.get("transactions", [])
-
-        # Clean up ObjectIDs for JSON serialization, if they exist in sub-documents
-        for item in portfolio:
-            if '_id' in item and isinstance(item['_id'], ObjectId):
-                item['_id'] = str(item['_id'])
-            if 'user_id' in item and isinstance(item['user_id'], ObjectId):
-                item['user_id'] = str(item['user_id'])
-        for item in transactions:
-            if '_id' in item and isinstance(item['_id'], ObjectId):
-                item['_id'] = str(item['_id'])
-            if 'user_id' in item and isinstance(item['user_id'], ObjectId):
-                item['user_id'] = str(item['user_id'])
-
-        return {
-            "id": str(user_data['_id']),
-            "name": user_data.get('name'),
-            "email": user_data.get('email'),
-            "balance": user_data.get('balance', 0),
-            "profile_image": user_data.get('profile_image'),
-            "portfolio": portfolio,
-            "transactions": transactions,
-            "is_public": user_data.get('is_public', True)
-        }
+        # Stored names are trimmed at registration (older ones by migration 004)
+        return mongo.db.users.find_one({"name": name.strip()}, projection, collation=NAME_COLLATION)
 
     @classmethod
     def from_dict(cls, data):
@@ -65,6 +54,7 @@ class User:
             profile_image=data.get("profile_image"),  
             profile_image_public_id=data.get("profile_image_public_id"),
             is_public=data.get("is_public", True),
+            stats=data.get("stats"),
             _id=data.get("_id")
         )
 
@@ -77,7 +67,8 @@ class User:
             "portfolio": self.portfolio,
             "profile_image": self.profile_image,
             "profile_image_public_id": self.profile_image_public_id,
-            "is_public": self.is_public
+            "is_public": self.is_public,
+            "stats": self.stats
         }
 
     def check_password(self, plain_password):
@@ -1,11 +1,13 @@
 import os
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token
+from pymongo.errors import DuplicateKeyError
 import cloudinary.uploader
 from config.config import Config
 from config.status_codes import STATUS
 from config.extensions import mongo  
 from models.user import User
+from services.account_stats import empty_stats
 import datetime
 
 auth_bp = Blueprint("auth", __name__)
@@ -14,8 +16,9 @@ auth_bp = Blueprint("auth", __name__)
 # listens for POST requests to /auth/register
 @auth_bp.route("/register", methods=["POST"])
 def register():
-    name = request.form.get("name")
-    email = request.form.get("email")
+    name = (request.form.get("name") or "").strip()
+    # Emails are stored lowercased, so the duplicate check and login ignore case
+    email = (request.form.get("email") or "").strip().lower()
     password = request.form.get("password")
     file = request.files.get("profile_image")
 
@@ -25,7 +28,7 @@ def register():
     if mongo.db.users.find_one({"email": email}):
         return jsonify({"error": "User already exists"}), 409
     
-    if mongo.db.users.find_one({"name": name}):
+    if User.find_by_name(name, {"_id": 1}):
         return jsonify({"error": "Username already exists"}), 409
 
     # Set a default image URL, which will be overwritten if a file is uploaded.
@@ -43,19 +46,24 @@ def register():
     # create user object with a starting balance
     user = User(
         name=name,
-        email=email.lower(),
+        email=email,
         password=password,
         balance=0.0,  # Give every new user a starting balance of $10,000
         portfolio=[],
         profile_image=image_url,
         profile_image_public_id=public_id,
-        is_public=True # Default new users to public
+        is_public=True, # Default new users to public
+        stats=empty_stats()
     )
     # hash the user's password before storing it in the database
     user.hash_password()
 
     # Insert the new user's data into the database.
-    inserted = mongo.db.users.insert_one(user.to_dict())
+    # The unique indexes catch a registration that raced past the checks above
+    try:
+        inserted = mongo.db.users.insert_one(user.to_dict())
+    except DuplicateKeyError:
+        return jsonify({"error": "User already exists"}), STATUS["USER_ALREADY_EXISTS"]
 
     user.id = str(inserted.inserted_id)
 
@@ -74,14 +82,14 @@ def register():
 # listens for POST requests to /auth/login
 @auth_bp.route("/login", methods=["POST"])
 def login():
-    data = request.get_json()
-    email = data.get("email").lower()
+    data = request.get_json(silent=True) or {}
+    email = data.get("email")
     password = data.get("password")
 
-    if not email or not password:
+    if not isinstance(email, str) or not email.strip() or not password:
         return jsonify({"error": "Missing email or password"}), STATUS["BAD_REQUEST"]
 
-    user_data = mongo.db.users.find_one({"email": email})
+    user_data = mongo.db.users.find_one({"email": email.strip().lower()})
     if not user_data:
         return jsonify({"error": "Invalid username or password"}), STATUS["UNAUTHORIZED"]
 
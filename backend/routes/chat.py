@@ -1,45 +1,13 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from config.extensions import mongo
-from models.chat import ChatMessage
-from datetime import datetime, timedelta
-from bson import ObjectId
-from models.user import User
-from utils.portfolio_utils import calculate_portfolio_stats, generate_profile_as_text
-import os
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.inference import ChatCompletionsClient
-import google.generativeai as genai
-import traceback
+from models.chat import ChatMessage, ChatSession
+from services import ai_context, ai_conversation, ai_models, ai_response_cache
+from utils.pagination import parse_limit, encode_cursor
+import json
+import logging
 
 chat_bp = Blueprint("chat", __name__)
-
-# --- AI Configuration ---
-AI_ENDPOINT = "https://models.github.ai/inference"
-AI_MODEL = "openai/gpt-4.1-nano"
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-GEMINI_API_KEY = os.getenv("GEMINI_FLASH_2")
-
-# Initialize the AI client only if the token is available
-ai_client = None
-if GITHUB_TOKEN:
-    try:
-        ai_client = ChatCompletionsClient(
-            endpoint=AI_ENDPOINT,
-            credential=AzureKeyCredential(GITHUB_TOKEN)
-        )
-    except Exception as e:
-        print(f"Failed to initialize AI client: {e}")
-
-# Initialize Gemini client
-if GEMINI_API_KEY:
-    try:
-        genai.configure(api_key=GEMINI_API_KEY)
-        print("Gemini client configured successfully.")
-    except Exception as e:
-        print(f"Failed to configure Gemini client: {e}")
-else:
-    print("GEMINI_FLASH_2 key not found, Gemini model will not be available.")
+logger = logging.getLogger(__name__)
 
 # listens for POST requests on /chat/send
 @chat_bp.route("/send", methods=["POST"])
@@ -63,7 +31,7 @@ def send_message():
         session_id=session_id,
         session_name=session_name
     )
-    mongo.db.chat.insert_one(chat_message.to_dict())
+    chat_message.save()
 
     return jsonify({
         "message": "Message saved",
@@ -72,33 +40,18 @@ def send_message():
     }), 200
 
 
-# # listens for GET requests on /chat/sessions
-# @chat_bp.route("/sessions", methods=["GET"])
-# @jwt_required()
-# def get_sessions():
+# listens for GET requests on /chat/sessions
+# Reads the per-session summaries in `chat_sessions` that every saved message updates.
+# message_count is the number of messages still retained (see ChatSession).
+@chat_bp.route("/sessions", methods=["GET"])
+@jwt_required()
+def get_sessions():
     user_id = get_jwt_identity()
-    one_week_ago = datetime.utcnow() - timedelta(days=7)
-
-    # use MongoDB aggregation to efficiently group messages by session
-    sessions = mongo.db.chat.aggregate([
-        {"$match": {
-            "user_id": ObjectId(user_id),
-            "timestamp": {"$gte": one_week_ago}
-        }},
-        {"$sort": {"timestamp": -1}},  # חשוב כדי לקבל את שם השיחה האחרון
-        {"$group": {
-            "_id": "$session_id",
-            "last_message_time": {"$max": "$timestamp"},
-            "session_name": {"$first": "$session_name"},
-            "message_count": {"$sum": 1}
-        }},
-        {"$sort": {"last_message_time": -1}}
-    ])
 
     session_list = []
-    for s in sessions:
+    for s in ChatSession.find_by_user(user_id):
         session_list.append({
-            "session_id": s["_id"],
+            "session_id": s["session_id"],
             "session_name": s.get("session_name", "Untitled"),
             "last_message_time": s["last_message_time"].isoformat(),
             "message_count": s["message_count"]
@@ -106,28 +59,43 @@ def send_message():
 
     return jsonify({"sessions": session_list}), 200
 
+def serialize_message(msg):
+    msg["_id"] = str(msg["_id"])
+    msg["timestamp"] = msg["timestamp"].isoformat()
+    return msg
+
 # listens for GET requests on /chat/history
+# Without query parameters other than session_id the whole retained history is returned
+# oldest-first. ?limit=N[&before=<cursor>] returns the newest N messages before the cursor,
+# oldest-first, plus `next_cursor` for the page of older messages (null when there is none).
+# Messages older than CHAT_RETENTION_DAYS are removed by the TTL index on `chat`.
 @chat_bp.route("/history", methods=["GET"])
 @jwt_required()
 def get_chat_history():
     user_id = get_jwt_identity()
     session_id = request.args.get("session_id")
+    before = request.args.get("before")
 
-    one_week_ago = datetime.utcnow() - timedelta(days=7)
-    query = {
-        "user_id": ObjectId(user_id),
-        "timestamp": {"$gte": one_week_ago}
-    }
-    if session_id:
-        query["session_id"] = session_id
+    if "limit" not in request.args and not before:
+        messages = ChatMessage.find_history(user_id, session_id)
+        return jsonify({"messages": [serialize_message(m) for m in messages]}), 200
 
-    messages = list(mongo.db.chat.find(query).sort("timestamp", 1))
-    for msg in messages:
-        msg["_id"] = str(msg["_id"])
-        msg["user_id"] = str(msg["user_id"])
-        msg["timestamp"] = msg["timestamp"].isoformat()
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        # Fetch one extra message to know whether an older page exists
+        rows = ChatMessage.find_history(user_id, session_id, limit=limit + 1, before=before)
+    except ValueError:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["timestamp"], rows[-1]["_id"])
 
-    return jsonify({"messages": messages}), 200
+    return jsonify({
+        "messages": [serialize_message(m) for m in reversed(rows)],
+        "next_cursor": next_cursor
+    }), 200
 
 # Listens for DELETE requests to /chat/sessions/<session_id>
 # This will delete all messages associated with a specific session for the logged-in user.
@@ -135,30 +103,52 @@ def get_chat_history():
 @jwt_required()
 def delete_chat_session(session_id):
     user_id = get_jwt_identity()
-    print(f"--- Deletion Request ---")
-    print(f"Attempting to delete session '{session_id}' for user '{user_id}'")
-    
+
     # We ensure the user can only delete their own sessions
     try:
-        result = mongo.db.chat.delete_many({
-            "user_id": ObjectId(user_id),
-            "session_id": session_id
-        })
-        
-        print(f"DB query complete. Messages deleted: {result.deleted_count}")
-        print(f"------------------------")
+        deleted_count = ChatMessage.delete_session(user_id, session_id)
+        ChatSession.delete(user_id, session_id)
+        logger.info("Deleted chat session", extra={"user_id": user_id, "session_id": session_id, "deleted": deleted_count})
 
-        if result.deleted_count > 0:
-            return jsonify({"message": f"Session {session_id} deleted. {result.deleted_count} messages removed."}), 200
+        if deleted_count > 0:
+            return jsonify({"message": f"Session {session_id} deleted. {deleted_count} messages removed."}), 200
         else:
             # This can happen if the session_id is wrong or doesn't belong to the user
             return jsonify({"message": "No session found to delete."}), 404
             
-    except Exception as e:
-        print(f"Error deleting session {session_id}: {e}")
+    except Exception:
+        logger.exception("Error deleting chat session", extra={"user_id": user_id, "session_id": session_id})
         return jsonify({"error": "An internal server error occurred"}), 500
 
+SYSTEM_PROMPT = """You are SmartInvest AI, a helpful and concise financial assistant.
+        The user has provided the following summary of their investment portfolio. Use this information to answer their questions accurately.
+        ---
+        {profile_context}
+        ---
+        """
+
+CONVERSATION_SUMMARY_PROMPT = """Earlier in this conversation (condensed, oldest first):
+        ---
+        {conversation_summary}
+        ---
+        """
+
+# helper function to format one Server-Sent Event
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 # listens for POST requests on /chat/ask and the function is called ask_ai
+# With "stream": true in the body (or Accept: text/event-stream) the answer is sent as
+# Server-Sent Events while the model generates it:
+#   event: start  {"session_id"}      sent immediately
+#   event: delta  {"content"}         one per chunk of the answer
+#   event: done   {"role", "content", "cached"} the whole answer, after it was saved
+#   event: error  {"error"}           the model failed; nothing is saved for the answer
+# A question asked again while nothing it depends on changed is answered from the answer
+# cache (see services/ai_response_cache.py) without calling the model, with "cached": true.
+# The body only needs the new "message": the conversation the model sees is built from the
+# session's saved messages (see services/ai_conversation.py). Clients that still send the
+# whole conversation as "messages" have only its last message used.
 @chat_bp.route("/ask", methods=["POST"])
 @jwt_required()
 def ask_ai():
@@ -166,87 +156,113 @@ def ask_ai():
     data = request.get_json()
     
     try:
-        messages_history = data["messages"] # Expecting a list of message objects
-        user_message_content = messages_history[-1]['content']
+        user_message_content = data["message"] if "message" in data else data["messages"][-1]["content"]
         session_id = data["session_id"]
         session_name = data.get("session_name", "Untitled")
         model_choice = data.get("model", "azure") # Default to azure
-    except (KeyError, IndexError):
+    except (KeyError, IndexError, TypeError):
+        return jsonify({"error": "Missing or invalid fields in request"}), 400
+    if not isinstance(user_message_content, str) or not user_message_content.strip():
         return jsonify({"error": "Missing or invalid fields in request"}), 400
+    # The conversation is read back from the session, so it must name one
+    if not isinstance(session_id, str) or not session_id.strip():
+        return jsonify({"error": "session_id must be a non-empty string"}), 400
+    stream = data.get("stream") is True or request.accept_mimetypes.best == "text/event-stream"
+
+    try:
+        ai_models.check_model(model_choice)
+    except ai_models.ModelError as e:
+        return jsonify({"error": str(e)}), e.status
 
     # 1. Save the user's message
     user_chat_message = ChatMessage(
         user_id=user_id, message=user_message_content, role='user',
         session_id=session_id, session_name=session_name
     )
-    mongo.db.chat.insert_one(user_chat_message.to_dict())
+    user_chat_message.save()
 
     try:
-        # 2. Generate AI context from user's profile
-        raw_user_data = User.get_user_profile_data(user_id)
-        live_user_data = calculate_portfolio_stats(raw_user_data)
-        profile_context = generate_profile_as_text(live_user_data)
+        portfolio_version = ai_context.get_portfolio_version(user_id)
+        if portfolio_version is None:
+            return jsonify({"error": "User not found"}), 404
 
-        system_prompt = f"""You are SmartInvest AI, a helpful and concise financial assistant.
-        The user has provided the following summary of their investment portfolio. Use this information to answer their questions accurately.
-        ---
-        {profile_context}
-        ---
-        """
-        
-        ai_message_content = ""
-
-        # 3. Call the selected AI model
-        if model_choice == 'azure':
-            if not ai_client:
-                return jsonify({"error": "Azure AI service is not configured"}), 503
-
-            api_history = [{"role": "system", "content": system_prompt}]
-            for msg in messages_history:
-                api_history.append({
-                    "role": "assistant" if msg["role"] == "ai" else msg["role"],
-                    "content": msg["content"]
-                })
-            
-            response = ai_client.complete(model=AI_MODEL, messages=api_history)
-            ai_message_content = response.choices[0].message.content or "Sorry, I couldn't process that."
+        # 2. Build the conversation: the recent messages of the session, including the one just
+        #    saved, and a summary of the older turns
+        messages_history, conversation_summary = ai_conversation.build_conversation(user_id, session_id)
 
-        elif model_choice == 'gemini':
-            if not GEMINI_API_KEY:
-                return jsonify({"error": "Gemini AI service is not configured"}), 503
-            
-            gemini_model = genai.GenerativeModel('gemini-1.5-flash')
-            
-            # Gemini has a different message format
-            gemini_history = []
-            for msg in messages_history:
-                # Gemini uses 'model' for 'assistant'
-                role = 'user' if msg['role'] == 'user' else 'model'
-                gemini_history.append({'role': role, 'parts': [msg['content']]})
-
-            # Prepend system prompt to the conversation history
-            full_prompt = [
-                {'role': 'user', 'parts': [system_prompt]},
-                {'role': 'model', 'parts': ["Understood. I am SmartInvest AI, ready to assist with the user's portfolio."]}
-            ] + gemini_history
-
-            response = gemini_model.generate_content(full_prompt)
-            ai_message_content = response.text or "Sorry, I couldn't process that with Gemini."
-        
-        else:
-            return jsonify({"error": "Invalid model selected"}), 400
+        # 3. Answer from the cache if the same question was answered after the same conversation,
+        #    for the same account and prices
+        cache_key = ai_response_cache.make_key(user_id, model_choice, portfolio_version, messages_history, conversation_summary)
+        cached_answer = ai_response_cache.get(cache_key)
+
+        def save_answer(content):
+            ai_chat_message = ChatMessage(
+                user_id=user_id, message=content, role='ai',
+                session_id=session_id, session_name=session_name
+            )
+            ai_chat_message.save()
+            # the canned answers for an empty model response are not worth reusing
+            if cached_answer is None and content not in ai_models.FALLBACK_ANSWERS.values():
+                ai_response_cache.put(cache_key, content)
+
+        if cached_answer is not None:
+            if stream:
+                return sse_response(stream_answer(model_choice, [cached_answer], session_id, save_answer, cached=True))
+            save_answer(cached_answer)
+            return jsonify({"role": "ai", "content": cached_answer, "cached": True}), 200
+
+        # 4. Get the AI context from user's profile (cached until the portfolio or quotes change)
+        profile_context = ai_context.get_profile_context(user_id, portfolio_version)
+        if profile_context is None:
+            return jsonify({"error": "User not found"}), 404
+        system_prompt = SYSTEM_PROMPT.format(profile_context=profile_context)
+        if conversation_summary:
+            system_prompt += CONVERSATION_SUMMARY_PROMPT.format(conversation_summary=conversation_summary)
+
+        if stream:
+            # ai_models.stream only calls the model once the response starts
+            chunks = ai_models.stream(model_choice, system_prompt, messages_history)
+            return sse_response(stream_answer(model_choice, chunks, session_id, save_answer))
+
+        # 5. Call the selected AI model
+        try:
+            ai_message_content = ai_models.complete(model_choice, system_prompt, messages_history)
+        except ai_models.ModelError as e:
+            return jsonify({"error": str(e)}), e.status
 
-        # 4. Save the AI's response
-        ai_chat_message = ChatMessage(
-            user_id=user_id, message=ai_message_content, role='ai',
-            session_id=session_id, session_name=session_name
-        )
-        mongo.db.chat.insert_one(ai_chat_message.to_dict())
+        # 6. Save the AI's response
+        save_answer(ai_message_content)
 
-        # 5. Return the AI's response to the frontend
-        return jsonify({"role": "ai", "content": ai_message_content}), 200
+        # 7. Return the AI's response to the frontend
+        return jsonify({"role": "ai", "content": ai_message_content, "cached": False}), 200
 
-    except Exception as e:
-        print(f"Error during AI processing: {e}")
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Error during AI processing", extra={"user_id": user_id, "model": model_choice})
         return jsonify({"error": "Failed to get response from AI"}), 500
+
+# helper function to send a generator of events as a Server-Sent Events response
+def sse_response(events):
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# generator behind the streaming mode of /chat/ask; relays the answer's `chunks` and saves
+# the answer once, when it is complete
+def stream_answer(model_choice, chunks, session_id, save_answer, cached=False):
+    # the first bytes go out before the model is called
+    yield sse_event("start", {"session_id": session_id})
+    received = []
+    try:
+        for chunk in chunks:
+            received.append(chunk)
+            yield sse_event("delta", {"content": chunk})
+    except Exception:
+        logger.exception("Error during AI streaming", extra={"model": model_choice, "session_id": session_id})
+        yield sse_event("error", {"error": "Failed to get response from AI"})
+        return
+
+    content = "".join(received).strip() or ai_models.FALLBACK_ANSWERS.get(model_choice, "")
+    save_answer(content)
+    yield sse_event("done", {"role": "ai", "content": content, "cached": cached})
@@ -0,0 +1,150 @@
+import re
+from flask import Blueprint, Response, jsonify, request
+from config.config import Config
+from services import hot_stocks, market_data, symbol_index
+from services.quotes import get_quote, get_quotes
+from services.rate_limit import KeyedRateLimiter
+from utils.pagination import parse_limit
+
+market_bp = Blueprint("market", __name__)
+
+# The market pages are public (home page, stock pages), so instead of a login every
+# client IP gets its own budget of requests; every uncached request costs Finnhub calls
+client_limiter = KeyedRateLimiter(Config.MARKET_RATE_LIMIT_PER_MINUTE, Config.MARKET_RATE_LIMIT_BURST)
+
+SYMBOL_PATTERN = re.compile(r"^[A-Z0-9.\-]{1,15}$")
+MAX_BATCH_SYMBOLS = 50
+NEWS_CATEGORIES = ("general", "forex", "crypto", "merger")
+
+@market_bp.before_request
+def limit_client_rate():
+    if not client_limiter.try_take(request.remote_addr):
+        response = jsonify({"error": "Too many requests, please slow down"})
+        response.headers["Retry-After"] = str(max(1, round(60 / Config.MARKET_RATE_LIMIT_PER_MINUTE)))
+        return response, 429
+
+# helper function to read and validate a ?q=... search query; returns it normalized
+def parse_query(value):
+    query = market_data.normalize_query(value or "")
+    if len(query) > market_data.MAX_QUERY_LENGTH:
+        raise ValueError(f"q must be at most {market_data.MAX_QUERY_LENGTH} characters")
+    return query
+
+# helper function to read and validate a ?symbols=AAPL,MSFT list
+def parse_symbols(value):
+    symbols = [s.strip().upper() for s in (value or "").split(",") if s.strip()]
+    if not symbols:
+        raise ValueError("symbols is required, e.g. ?symbols=AAPL,MSFT")
+    if len(symbols) > MAX_BATCH_SYMBOLS:
+        raise ValueError(f"At most {MAX_BATCH_SYMBOLS} symbols per request")
+    invalid = [s for s in symbols if not SYMBOL_PATTERN.match(s)]
+    if invalid:
+        raise ValueError(f"Invalid symbols: {', '.join(invalid)}")
+    return list(dict.fromkeys(symbols))
+
+# listens for GET requests on /market/quote/<symbol>
+@market_bp.route("/quote/<string:symbol>", methods=["GET"])
+def quote(symbol):
+    symbol = symbol.upper()
+    if not SYMBOL_PATTERN.match(symbol):
+        return jsonify({"error": "Invalid symbol"}), 400
+    data = get_quote(symbol)
+    if data is None:
+        return jsonify({"error": f"Quote for {symbol} is unavailable"}), 502
+    return jsonify(data), 200
+
+# listens for GET requests on /market/quotes?symbols=AAPL,MSFT
+# returns {SYMBOL: quote or null}
+@market_bp.route("/quotes", methods=["GET"])
+def quotes():
+    try:
+        symbols = parse_symbols(request.args.get("symbols"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(get_quotes(symbols)), 200
+
+# listens for GET requests on /market/profile/<symbol>
+@market_bp.route("/profile/<string:symbol>", methods=["GET"])
+def profile(symbol):
+    symbol = symbol.upper()
+    if not SYMBOL_PATTERN.match(symbol):
+        return jsonify({"error": "Invalid symbol"}), 400
+    data = market_data.get_profile(symbol)
+    if data is None:
+        return jsonify({"error": f"Profile for {symbol} is unavailable"}), 502
+    return jsonify(data), 200
+
+# listens for GET requests on /market/profiles?symbols=AAPL,MSFT
+@market_bp.route("/profiles", methods=["GET"])
+def profiles():
+    try:
+        symbols = parse_symbols(request.args.get("symbols"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(market_data.get_profiles(symbols)), 200
+
+# listens for GET requests on /market/search?q=app&limit=7
+@market_bp.route("/search", methods=["GET"])
+def search():
+    try:
+        query = parse_query(request.args.get("q"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        limit = parse_limit(request.args.get("limit"), default=7, maximum=50)
+    except ValueError:
+        return jsonify({"error": "limit must be a positive integer"}), 400
+    if not query:
+        return jsonify([]), 200
+    results = market_data.search_symbols(query, limit)
+    if results is None:
+        return jsonify({"error": "Symbol search is unavailable"}), 502
+    return jsonify(results), 200
+
+# listens for GET requests on /market/symbols?q=app&limit=7
+# typeahead served from the local symbol index; falls back to the cached Finnhub search
+# while the index is still loading
+@market_bp.route("/symbols", methods=["GET"])
+def symbols():
+    try:
+        query = parse_query(request.args.get("q"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        limit = parse_limit(request.args.get("limit"), default=7, maximum=50)
+    except ValueError:
+        return jsonify({"error": "limit must be a positive integer"}), 400
+    if not query:
+        return jsonify([]), 200
+    results = symbol_index.search(query, limit)
+    if results is None:
+        results = market_data.search_symbols(query, limit)
+    if results is None:
+        return jsonify({"error": "Symbol search is unavailable"}), 502
+    return jsonify(results), 200
+
+# listens for GET requests on /market/news?category=general&limit=15
+@market_bp.route("/news", methods=["GET"])
+def news():
+    category = request.args.get("category", "general")
+    if category not in NEWS_CATEGORIES:
+        return jsonify({"error": f"category must be one of {', '.join(NEWS_CATEGORIES)}"}), 400
+    try:
+        limit = parse_limit(request.args.get("limit"), default=15, maximum=100)
+    except ValueError:
+        return jsonify({"error": "limit must be a positive integer"}), 400
+    articles = market_data.get_news(category, limit)
+    if articles is None:
+        return jsonify({"error": "Market news is unavailable"}), 502
+    return jsonify(articles), 200
+
+# listens for GET requests on /market/hot
+# serves the precomputed hot stocks body; clients revalidate with If-None-Match and get a 304
+@market_bp.route("/hot", methods=["GET"])
+def hot():
+    body, etag = hot_stocks.get_blob()
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    max_age = int(Config.HOT_STOCKS_REFRESH_SECONDS)
+    response.headers["Cache-Control"] = f"public, max-age={max_age}, stale-while-revalidate={max_age * 5}"
+    return response.make_conditional(request)
@@ -1,11 +1,17 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from config.config import Config
 from config.extensions import mongo
-from models.user import User
+from models.transaction import Transaction
+from services import trade_engine
 from bson import ObjectId
 import datetime
+import json
+import logging
+from utils.pagination import parse_limit, encode_cursor
 
 transaction_bp = Blueprint("transaction", __name__)
+logger = logging.getLogger(__name__)
 
 # helper function to calculate the total invested amount in a portfolio.
 # this is the sum of (quantity * average_price) for each stock.
@@ -18,8 +24,6 @@ def calculate_invested_amount(portfolio):
 def buy_stock():
     user_id = get_jwt_identity()  # checks if the user is logged in
     data = request.get_json()
-    
-    print(f"[/buy] Received data: {data}")
 
     if not data:
         return jsonify({"error": "Request body is empty or not JSON"}), 400
@@ -38,52 +42,15 @@ def buy_stock():
     if quantity <= 0 or price <= 0 or commission < 0:
         return jsonify({"error": "Transaction values must be positive."}), 400
 
-    user_data = mongo.db.users.find_one({"_id": ObjectId(user_id)})
-    if not user_data:
-        return jsonify({"error": "User not found"}), 404
-
-    user = User.from_dict(user_data)
-    
-    # Round the total cost to 2 decimal places to handle floating point inaccuracies
-    total_cost = round((price * quantity) + commission, 2)
+    try:
+        result = trade_engine.execute_buy(user_id, symbol, quantity, price, commission)
+    except trade_engine.TradeError as e:
+        logger.info("Buy rejected: %s", e, extra={"user_id": user_id, "symbol": symbol})
+        return jsonify({"error": str(e)}), e.status
 
-    # --- Debug Print ---
-    # Log the balance and cost for easier debugging
-    print(f"[buy_stock_debug] Comparing Balance: {user.balance} with Total Cost: {total_cost}")
+    logger.debug("Buy executed", extra={"user_id": user_id, "symbol": symbol, "quantity": quantity, "price": price})
 
-    # Also round the user's balance for a safe comparison
-    if round(user.balance, 2) < total_cost:
-        return jsonify({"error": "Insufficient funds"}), 400
-
-    stock_in_portfolio = next((stock for stock in user.portfolio if stock["symbol"] == symbol), None)
-    
-    transaction_cost = price * quantity
-
-    if stock_in_portfolio:
-        stock_in_portfolio["quantity"] += quantity
-        stock_in_portfolio["total_cost"] = stock_in_portfolio.get("total_cost", 0) + transaction_cost
-        stock_in_portfolio["avg_price"] = stock_in_portfolio["total_cost"] / stock_in_portfolio["quantity"]
-    else:
-        user.portfolio.append({
-            "symbol": symbol, 
-            "quantity": quantity, 
-            "total_cost": transaction_cost,
-            "avg_price": price
-        })
-
-    user.balance -= total_cost
-
-    transaction = {
-        "type": "buy", "symbol": symbol, "quantity": quantity,
-        "price": price, "commission": commission, "date": datetime.datetime.utcnow()
-    }
-
-    mongo.db.users.update_one(
-        {"_id": ObjectId(user_id)},
-        {"$set": {"balance": user.balance, "portfolio": user.portfolio}, "$push": {"transactions": transaction}}
-    )
-
-    return jsonify({"message": "Stock purchased successfully", "new_balance": user.balance}), 200
+    return jsonify({"message": "Stock purchased successfully", "new_balance": result.new_balance}), 200
 
 # listens for POST requests on /transaction/sell
 @transaction_bp.route("/sell", methods=["POST"])
@@ -91,7 +58,6 @@ def buy_stock():
 def sell_stock():
     user_id = get_jwt_identity()
     data = request.get_json()
-    print(f"[/sell] Received data: {data}")
 
     if not data:
         return jsonify({"error": "Request body is empty or not JSON"}), 400
@@ -109,40 +75,77 @@ def sell_stock():
     if quantity_to_sell <= 0 or price <= 0 or commission < 0:
         return jsonify({"error": "Transaction values must be positive."}), 400
 
-    user_data = mongo.db.users.find_one({"_id": ObjectId(user_id)})
-    if not user_data:
-        return jsonify({"error": "User not found"}), 404
+    if price * quantity_to_sell - commission < 0:
+        return jsonify({"error": "Commission cannot be greater than sale value."}), 400
 
-    user = User.from_dict(user_data)
-    stock_to_sell = next((stock for stock in user.portfolio if stock["symbol"] == symbol), None)
+    try:
+        result = trade_engine.execute_sell(user_id, symbol, quantity_to_sell, price, commission)
+    except trade_engine.TradeError as e:
+        logger.info("Sell rejected: %s", e, extra={"user_id": user_id, "symbol": symbol})
+        return jsonify({"error": str(e)}), e.status
+
+    logger.debug("Sell executed", extra={"user_id": user_id, "symbol": symbol, "quantity": quantity_to_sell, "price": price})
+
+    return jsonify({"message": "Stock sold successfully", "new_balance": result.new_balance}), 200
+
+# helper function to read and validate one order of a batch; raises ValueError
+def parse_order(data):
+    if not isinstance(data, dict):
+        raise ValueError("Each order must be an object.")
+    order_type = data.get("type")
+    if order_type not in ("buy", "sell"):
+        raise ValueError("type must be 'buy' or 'sell'.")
+    try:
+        symbol = data["symbol"]
+        quantity = float(data["quantity"])
+        price = float(data["price"])
+        commission = float(data.get("commission", 0))
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Invalid or missing data. Required: type, symbol, quantity, price.")
+    if not symbol:
+        raise ValueError("Symbol cannot be empty.")
+    if quantity <= 0 or price <= 0 or commission < 0:
+        raise ValueError("Transaction values must be positive.")
+    if order_type == "sell" and price * quantity - commission < 0:
+        raise ValueError("Commission cannot be greater than sale value.")
+    return trade_engine.Order(type=order_type, symbol=symbol, quantity=quantity, price=price, commission=commission)
+
+# listens for POST requests on /transaction/batch
+# body: {"orders": [{"type": "sell", "symbol": "AAPL", "quantity": 2, "price": 190.5, "commission": 0}, ...]}
+# orders are executed in the given sequence (list sells first to fund buys) and either all
+# of them are applied or none is
+@transaction_bp.route("/batch", methods=["POST"])
+@jwt_required()
+def batch_orders():
+    user_id = get_jwt_identity()
+    data = request.get_json(silent=True)
 
-    if not stock_to_sell or stock_to_sell["quantity"] < quantity_to_sell:
-        return jsonify({"error": "Insufficient stock quantity to sell"}), 400
-    
-    total_revenue = (price * quantity_to_sell) - commission
-    if total_revenue < 0:
-        return jsonify({"error": "Commission cannot be greater than sale value."}), 400
+    orders = data.get("orders") if isinstance(data, dict) else None
+    if not isinstance(orders, list) or not orders:
+        return jsonify({"error": "Request must include a non-empty orders list"}), 400
+    if len(orders) > Config.TRADE_BATCH_MAX_ORDERS:
+        return jsonify({"error": f"At most {Config.TRADE_BATCH_MAX_ORDERS} orders per batch"}), 400
 
-    # Update total_cost before quantity
-    stock_to_sell["total_cost"] = stock_to_sell.get("total_cost", 0) - (stock_to_sell["avg_price"] * quantity_to_sell)
-    
-    user.balance += total_revenue
-    stock_to_sell["quantity"] -= quantity_to_sell
+    parsed = []
+    for number, order in enumerate(orders, start=1):
+        try:
+            parsed.append(parse_order(order))
+        except ValueError as e:
+            return jsonify({"error": f"Order {number}: {e}"}), 400
 
-    if stock_to_sell["quantity"] < 1e-6: # Using a small threshold to handle float inaccuracies
-        user.portfolio = [stock for stock in user.portfolio if stock["symbol"] != symbol]
-    
-    transaction = {
-        "type": "sell", "symbol": symbol, "quantity": quantity_to_sell,
-        "price": price, "commission": commission, "date": datetime.datetime.utcnow()
-    }
+    try:
+        result = trade_engine.execute_batch(user_id, parsed)
+    except trade_engine.TradeError as e:
+        logger.info("Batch rejected: %s", e, extra={"user_id": user_id, "orders": len(parsed)})
+        return jsonify({"error": str(e)}), e.status
 
-    mongo.db.users.update_one(
-        {"_id": ObjectId(user_id)},
-        {"$set": {"balance": user.balance, "portfolio": user.portfolio}, "$push": {"transactions": transaction}}
-    )
+    logger.debug("Batch executed", extra={"user_id": user_id, "orders": len(parsed)})
 
-    return jsonify({"message": "Stock sold successfully", "new_balance": user.balance}), 200
+    return jsonify({
+        "message": "Orders executed successfully",
+        "new_balance": result.new_balance,
+        "transaction_ids": [t.id for t in result.transactions]
+    }), 200
 
 # listens for POST requests on /transaction/deposit 
 @transaction_bp.route("/deposit", methods=["POST"])
@@ -161,41 +164,62 @@ def deposit_funds():
     except (ValueError, TypeError):
         return jsonify({"error": "Invalid amount provided"}), 400
 
-    deposit_transaction = {
-        "type": "deposit",
-        "amount": amount,
-        "date": datetime.datetime.utcnow(),
-        "description": "User deposit"
-    }
-
-    result = mongo.db.users.update_one(
-        {"_id": ObjectId(user_id)},
-        {
-            "$inc": {"balance": amount},
-            "$push": {"transactions": deposit_transaction}
-        }
-    )
-
-    if result.matched_count == 0:
-        return jsonify({"error": "User not found"}), 404
-
-    user_data = mongo.db.users.find_one({"_id": ObjectId(user_id)})
-    new_balance = user_data.get('balance')
+    try:
+        result = trade_engine.execute_deposit(user_id, amount)
+    except trade_engine.TradeError as e:
+        logger.info("Deposit rejected: %s", e, extra={"user_id": user_id})
+        return jsonify({"error": str(e)}), e.status
 
     return jsonify({
         "message": "Deposit successful",
-        "new_balance": new_balance
+        "new_balance": result.new_balance
     }), 200
 
 # listens for GET requests on /transaction/history
+# Without query parameters the full history is returned oldest-first, as before.
+# ?limit=N[&before=<cursor>] returns one page, newest-first, plus the cursor of the next page.
+# ?stream=1 writes rows as NDJSON straight from the Mongo cursor, newest-first. With limit it
+# writes at most `limit` rows and, if older rows exist, ends with a {"next_cursor": ...} line
+# to pass as `before`; without limit it writes every row (older than `before`, if given).
 @transaction_bp.route("/history", methods=["GET"])
 @jwt_required()
 def get_transaction_history():
     user_id = get_jwt_identity()
-    user_data = mongo.db.users.find_one({"_id": ObjectId(user_id)}, {"transactions": 1, "_id": 0})
-    if not user_data or "transactions" not in user_data:
-        return jsonify([]), 200
-    transactions = user_data.get("transactions", [])
-    for t in transactions:
-        t['date'] = t['date'].isoformat() if isinstance(t.get('date'), datetime.datetime) else None
-    return jsonify(transactions), 200
+    stream = request.args.get("stream", "").lower() in ("1", "true")
+    before = request.args.get("before")
+
+    if not stream and "limit" not in request.args and not before:
+        transactions = Transaction.find_by_user(user_id)
+        for t in transactions:
+            t['date'] = t['date'].isoformat() if isinstance(t.get('date'), datetime.datetime) else None
+        return jsonify(transactions), 200
+
+    try:
+        limit = parse_limit(request.args.get("limit")) if (not stream or "limit" in request.args) else None
+        # Fetch one extra row to know whether another page exists
+        cursor = Transaction.cursor_by_user(user_id, limit=limit + 1 if limit else None, before=before)
+    except ValueError:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+
+    if stream:
+        def generate():
+            last = None
+            for count, t in enumerate(cursor):
+                if limit is not None and count == limit:
+                    # The extra row only tells that another page exists
+                    yield json.dumps({"next_cursor": encode_cursor(*last)}) + "\n"
+                    return
+                last = (t['date'], t['_id'])
+                yield json.dumps(Transaction.serialize(t)) + "\n"
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    rows = list(cursor)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['date'], rows[-1]['_id'])
+
+    return jsonify({
+        "transactions": [Transaction.serialize(t) for t in rows],
+        "next_cursor": next_cursor
+    }), 200
@@ -1,30 +1,31 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from config.config import Config
 from config.extensions import mongo
 from models.user import User
+from models.transaction import Transaction
 from bson import ObjectId
 import cloudinary.uploader
-import requests # Import requests for Finnhub API
-import os
-import datetime # Import datetime for transaction timestamp
+from services.quotes import get_prices, get_price_array
+from services.valuation import value_portfolio
+from services import account_stats, equity_history, leaderboard, trade_engine
+from utils.pagination import encode_cursor
+import datetime
+import logging
 
 user_bp = Blueprint("user", __name__)
+logger = logging.getLogger(__name__)
 
-FINNHUB_API_KEY = os.environ.get("FINNHUB_API_KEY")
-FINNHUB_BASE_URL = 'https://finnhub.io/api/v1'
-
-def get_stock_quote(symbol):
-    """Helper function to get live stock price from Finnhub."""
-    if not FINNHUB_API_KEY:
-        print("Warning: Finnhub API key is not set. Using average price for current value.")
-        return None
-    try:
-        response = requests.get(f"{FINNHUB_BASE_URL}/quote", params={"symbol": symbol, "token": FINNHUB_API_KEY})
-        response.raise_for_status()
-        return response.json().get('c', 0) # 'c' is the current price
-    except requests.RequestException as e:
-        print(f"Error fetching quote for {symbol}: {e}")
-        return None
+def build_profile_response(user, valuation):
+    """The profile fields shared by the private and the public profile endpoints."""
+    return {
+        "id": str(user.id),
+        "name": user.name,
+        "profile_image": user.profile_image,
+        "is_public": user.is_public,
+        "portfolio": valuation.enhanced_portfolio(user.portfolio),
+        **valuation.summary()
+    }
 
 # Listens for GET requests to /user/profile.
 # This is a protected route that requires a valid JWT.
@@ -43,96 +44,62 @@ def get_user_profile():
     kept_holdings = []
     dust_value_to_liquidate = 0
     dust_symbols_liquidated = []
+    dust_cost_basis = 0
 
-    for stock in portfolio:
-        current_price = get_stock_quote(stock['symbol']) or stock.get('avg_price', 0)
-        current_value = stock.get('quantity', 0) * current_price
-        
-        if current_value < 1.00:
-            dust_value_to_liquidate += current_value
+    # Fetch every quote the portfolio needs in one concurrent batch
+    prices = get_prices(stock['symbol'] for stock in portfolio)
+
+    for stock, holding in zip(portfolio, value_portfolio(portfolio, prices).holdings):
+        if holding.current_value < 1.00:
+            dust_value_to_liquidate += holding.current_value
+            dust_cost_basis += stock.get('total_cost', 0)
             dust_symbols_liquidated.append(stock['symbol'])
         else:
             kept_holdings.append(stock)
 
     if dust_value_to_liquidate > 0:
-        dust_transaction = {
-            "type": "liquidation",
-            "amount": round(dust_value_to_liquidate, 2),
-            "date": datetime.datetime.utcnow(),
-            "description": f"Auto-liquidation of small holdings: {', '.join(dust_symbols_liquidated)}"
-        }
-        mongo.db.users.update_one(
-            {"_id": ObjectId(user_id)},
+        account_stats.ensure_stats(mongo.db, user_id)
+        liquidation = Transaction(
+            user_id=user_id,
+            type="liquidation",
+            amount=round(dust_value_to_liquidate, 2),
+            description=f"Auto-liquidation of small holdings: {', '.join(dust_symbols_liquidated)}"
+        )
+        # Only applied to the portfolio the dust was found in; if a trade changed it in the
+        # meantime the liquidation is left for the next profile load
+        trade_engine.commit_account_update(
             {
-                "$set": {"portfolio": kept_holdings},
-                "$inc": {"balance": round(dust_value_to_liquidate, 2)},
-                "$push": {"transactions": dust_transaction}
-            }
+                "_id": ObjectId(user_id),
+                "portfolio_version": account_stats.version_match(user_data.get("portfolio_version", 0)),
+                **account_stats.STATS_COMPLETE
+            },
+            account_stats.merge_updates(
+                {
+                    "$set": {"portfolio": kept_holdings},
+                    "$inc": {"balance": round(dust_value_to_liquidate, 2)}
+                },
+                account_stats.liquidation_update(round(dust_value_to_liquidate, 2), dust_cost_basis),
+                trade_engine.VERSION_BUMP
+            ),
+            [liquidation.to_dict()]
         )
         # Re-fetch user data after update to ensure consistency
         user_data = mongo.db.users.find_one({"_id": ObjectId(user_id)})
 
     user = User.from_dict(user_data)
-    
-    # --- Portfolio and P&L Calculations ---
-    
-    # 1. Enhance portfolio with total invested and current value
-    total_portfolio_value = 0
-    total_invested_amount = 0
-    enhanced_portfolio = []
-    for stock in user.portfolio:
-        # The 'total_invested' is now the 'total_cost' stored with the holding.
-        total_invested = round(stock.get('total_cost', 0), 2)
-        total_invested_amount += total_invested
-        
-        current_price = get_stock_quote(stock['symbol'])
-        # Fallback to average price if live price is unavailable
-        if current_price is None:
-            current_price = stock.get('avg_price', 0)
-            
-        current_value = round(stock.get('quantity', 0) * current_price, 2)
-        
-        enhanced_portfolio.append({
-            **stock,
-            "total_invested": total_invested,
-            "current_value": current_value,
-            "unrealized_pl": round(current_value - total_invested, 2)
-        })
-        total_portfolio_value += current_value
-
-    # 2. Calculate overall Profit & Loss
-    transactions = user_data.get('transactions', [])
-    net_contributions = sum(t.get('amount', 0) for t in transactions if t.get('type') in ['deposit', 'liquidation'])
-    # In the future, we can add withdrawals:
-    # net_contributions -= sum(t.get('amount', 0) for t in transactions if t.get('type') == 'withdrawal')
+    stats = account_stats.get_stats(mongo.db, user_data)
+    valuation = value_portfolio(user.portfolio, prices, user.balance, stats)
 
-    total_equity = user.balance + total_portfolio_value
-    
-    overall_pl = round(total_equity - net_contributions, 2)
-    overall_pl_percentage = 0
-    # Only calculate percentage if there have been contributions, to avoid division by zero
-    # and to show 0% P/L for brand new accounts.
-    if net_contributions > 0:
-        overall_pl_percentage = round((overall_pl / net_contributions) * 100, 2)
-    # If there are no contributions, P/L must be 0
-    else:
-        overall_pl = 0
+    # Only the newest transactions; the full history is paged via /transaction/history
+    limit = Config.PROFILE_RECENT_TRANSACTIONS
+    recent = list(Transaction.cursor_by_user(user_id, limit=limit + 1))
+    next_cursor = encode_cursor(recent[limit - 1]['date'], recent[limit - 1]['_id']) if len(recent) > limit else None
 
     return jsonify({
-        "id": str(user.id),
-        "name": user.name,
+        **build_profile_response(user, valuation),
         "email": user.email,
-        "balance": round(user.balance, 2),
-        "profile_image": user.profile_image,
-        "is_public": user.is_public,
-        "portfolio": enhanced_portfolio,
-        "transactions": transactions,
-        "invested_amount": round(total_invested_amount, 2),
-        "total_portfolio_value": round(total_portfolio_value, 2),
-        "net_contributions": round(net_contributions, 2),
-        "total_equity": round(total_equity, 2),
-        "overall_pl": overall_pl,
-        "overall_pl_percentage": overall_pl_percentage
+        "transactions": [Transaction.serialize(t) for t in recent[:limit]],
+        "transactions_next_cursor": next_cursor
     }), 200
 
 
@@ -180,7 +147,7 @@ def update_profile_image():
             cloudinary.uploader.destroy(user.profile_image_public_id)
         except Exception as e:
             # Log the error but don't block the upload process
-            print(f"Could not delete old image {user.profile_image_public_id}: {e}")
+            logger.warning("Could not delete old image %s: %s", user.profile_image_public_id, e)
 
     # Upload the new image
     try:
@@ -208,8 +175,8 @@ def update_profile_image():
 # listens for GET requests to /user/users/<username>/profile
 @user_bp.route("/users/<string:username>/profile", methods=["GET"])
 def public_user_profile(username):
-    # Case-insensitive search for username, ignoring leading/trailing whitespace
-    user_data = mongo.db.users.find_one({"name": {"$regex": f"^\\s*{username.strip()}\\s*$", "$options": "i"}})
+    # Case-insensitive match on the trimmed name, served by the collated name index
+    user_data = User.find_by_name(username)
 
     if not user_data:
         return jsonify({"error": "User not found"}), 404
@@ -219,140 +186,64 @@ def public_user_profile(username):
         return jsonify({"error": "This user's profile is private."}), 403
 
     user = User.from_dict(user_data)
-    
-    # --- Portfolio and P&L Calculations ---
-    
-    # 1. Enhance portfolio with total invested and current value
-    total_portfolio_value = 0
-    total_invested_amount = 0
-    enhanced_portfolio = []
-    for stock in user.portfolio:
-        # The 'total_invested' is now the 'total_cost' stored with the holding.
-        total_invested = round(stock.get('total_cost', 0), 2)
-        total_invested_amount += total_invested
-        
-        current_price = get_stock_quote(stock['symbol'])
-        # Fallback to average price if live price is unavailable
-        if current_price is None:
-            current_price = stock.get('avg_price', 0)
-            
-        current_value = round(stock.get('quantity', 0) * current_price, 2)
-        
-        enhanced_portfolio.append({
-            **stock,
-            "total_invested": total_invested,
-            "current_value": current_value,
-            "unrealized_pl": round(current_value - total_invested, 2)
-        })
-        total_portfolio_value += current_value
-
-    # 2. Calculate overall Profit & Loss
-    transactions = user_data.get('transactions', [])
-    net_contributions = sum(t.get('amount', 0) for t in transactions if t.get('type') in ['deposit', 'liquidation'])
-    # In the future, we can add withdrawals:
-    # net_contributions -= sum(t.get('amount', 0) for t in transactions if t.get('type') == 'withdrawal')
-
-    total_equity = user.balance + total_portfolio_value
-    
-    overall_pl = round(total_equity - net_contributions, 2)
-    overall_pl_percentage = 0
-    # Only calculate percentage if there have been contributions, to avoid division by zero
-    # and to show 0% P/L for brand new accounts.
-    if net_contributions > 0:
-        overall_pl_percentage = round((overall_pl / net_contributions) * 100, 2)
-    # If there are no contributions, P/L must be 0
-    else:
-        overall_pl = 0
-
-    return jsonify({
-        "id": str(user.id),
-        "name": user.name,
-        "email": user.email,
-        "balance": round(user.balance, 2),
-        "profile_image": user.profile_image,
-        "is_public": user.is_public,
-        "portfolio": enhanced_portfolio,
-        "transactions": transactions,
-        "invested_amount": round(total_invested_amount, 2),
-        "total_portfolio_value": round(total_portfolio_value, 2),
-        "net_contributions": round(net_contributions, 2),
-        "total_equity": round(total_equity, 2),
-        "overall_pl": overall_pl,
-        "overall_pl_percentage": overall_pl_percentage
-    }), 200
+    prices = get_price_array([stock['symbol'] for stock in user.portfolio])
+    stats = account_stats.get_stats(mongo.db, user_data)
+    valuation = value_portfolio(user.portfolio, prices, user.balance, stats)
+
+    return jsonify({**build_profile_response(user, valuation), "email": user.email}), 200
+
+# Chart ranges for the performance endpoints, in days (None = since the first snapshot)
+PERFORMANCE_RANGES = {"1w": 7, "1m": 30, "3m": 90, "6m": 182, "1y": 365, "all": None}
+
+def build_performance_response(user_id, range_key):
+    """Daily equity points over a chart range plus the contribution-adjusted return over it."""
+    days = PERFORMANCE_RANGES[range_key]
+    start = datetime.datetime.utcnow() - datetime.timedelta(days=days) if days else None
+    points = equity_history.load_points(user_id, start=start)
+
+    pl, pl_percentage = 0.0, 0.0
+    if points:
+        first, last = points[0], points[-1]
+        pl, pl_percentage = equity_history.period_return(
+            last["equity"], last["net_contributions"], first["equity"], first["net_contributions"]
+        )
+    return {
+        "range": range_key,
+        "points": [{**point, "date": point["date"].isoformat()} for point in points],
+        "pl": pl,
+        "pl_percentage": pl_percentage
+    }
+
+# listens for GET requests to /user/profile/performance?range=1m
+# serves the daily equity history behind the profile performance chart
+@user_bp.route("/profile/performance", methods=["GET"])
+@jwt_required()
+def get_profile_performance():
+    range_key = request.args.get('range', '1m')
+    if range_key not in PERFORMANCE_RANGES:
+        return jsonify({"error": f"range must be one of {', '.join(PERFORMANCE_RANGES)}"}), 400
+    return jsonify(build_performance_response(get_jwt_identity(), range_key)), 200
 
 # listens for GET requests to /user/top
-# fetches the top users by total P/L
+# serves the top users by total P/L from the precomputed leaderboard
 @user_bp.route("/top", methods=["GET"])
 def get_top_users():
     """
-    Fetches and ranks all users by performance metrics.
-    Supports sorting by overall P/L amount or percentage.
+    Returns the top ranked public users by performance metrics.
+    Supports sorting by overall P/L amount or percentage, over all time or over a
+    timeframe (24h, week/7d, month/1m). Rankings are refreshed periodically by the
+    leaderboard job, so this does not scale with user count.
     """
     try:
         limit = int(request.args.get('limit', 3))
         sort_by = request.args.get('sortBy', 'overall_pl')
-        
-        # Only fetch users who have set their profile to public
-        all_users = list(mongo.db.users.find({"is_public": True}))
-        
-        all_user_stats = []
-
-        for user_data in all_users:
-            user = User.from_dict(user_data)
-            
-            # --- Perform Calculations for each user ---
-            total_portfolio_value = 0
-            total_invested_amount = 0
-            unrealized_pl = 0
-            
-            for stock in user.portfolio:
-                total_invested = round(stock.get('total_cost', 0), 2)
-                total_invested_amount += total_invested
-                
-                current_price = get_stock_quote(stock['symbol']) or stock.get('avg_price', 0)
-                current_value = round(stock.get('quantity', 0) * current_price, 2)
-                stock_unrealized_pl = round(current_value - total_invested, 2)
-                
-                total_portfolio_value += current_value
-                unrealized_pl += stock_unrealized_pl
+        try:
+            period = equity_history.parse_timeframe(request.args.get('timeframe'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-            transactions = user_data.get('transactions', [])
-            net_contributions = sum(t.get('amount', 0) for t in transactions if t.get('type') in ['deposit', 'liquidation'])
-            total_commissions = sum(t.get('commission', 0) for t in transactions if t.get('type') in ['buy', 'sell'])
-            
-            total_equity = user.balance + total_portfolio_value
-            overall_pl = round(total_equity - net_contributions, 2)
-            realized_pl = round(overall_pl - unrealized_pl, 2)
-            
-            overall_pl_percentage = 0
-            if net_contributions > 0:
-                overall_pl_percentage = round((overall_pl / net_contributions) * 100, 2)
-            
-            all_user_stats.append({
-                "id": str(user.id),
-                "name": user.name,
-                "profile_image": user.profile_image,
-                "balance": round(user.balance, 2),
-                "net_contributions": round(net_contributions, 2),
-                "total_equity": round(total_equity, 2),
-                "overall_pl": overall_pl,
-                "overall_pl_percentage": overall_pl_percentage,
-                "unrealized_pl": round(unrealized_pl, 2),
-                "realized_pl": realized_pl,
-                "total_commissions": round(total_commissions, 2),
-                "portfolio": user.portfolio,
-                "transactions": transactions,
-            })
+        return jsonify(leaderboard.get_top(limit, sort_by, period)), 200
 
-        # Sort by the specified key, default to 'overall_pl'
-        if sort_by not in ['overall_pl', 'overall_pl_percentage']:
-            sort_by = 'overall_pl'
-            
-        all_user_stats.sort(key=lambda x: x[sort_by], reverse=True)
-        
-        return jsonify(all_user_stats[:limit]), 200
-
-    except Exception as e:
-        print(f"Error in get_top_users: {e}")
+    except Exception:
+        logger.exception("Error in get_top_users")
         return jsonify({"error": "An internal error occurred"}), 500
@@ -0,0 +1,87 @@
+import os
+import sys
+import argparse
+from pymongo import MongoClient
+
+# Allow running this file directly from the repository root or the backend directory.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.account_stats import compute_stats_from_history, find_drift, version_match
+
+# This script requires the MONGO_URI to be passed as an environment variable.
+# Example: MONGO_URI="..." python3 backend/scripts/reconcile_account_stats.py [--fix]
+MONGO_URI = os.environ.get("MONGO_URI")
+
+def run_reconciliation(fix=False):
+    """
+    Recomputes every account's running totals (`users.stats`) from its transaction
+    history and reports any drift from the stored values. With --fix, drifting or
+    missing totals are overwritten with the recomputed ones, unless the account changed
+    (its portfolio_version moved) while it was being checked; run it again for those.
+    Run it with --fix once after deploying running totals to backfill existing accounts.
+    """
+    if not MONGO_URI:
+        print("Error: The MONGO_URI environment variable is not set.")
+        print("Please run the script like this:")
+        print('MONGO_URI="your_connection_string" python3 backend/scripts/reconcile_account_stats.py [--fix]')
+        return
+
+    try:
+        print(f"Attempting to connect to MongoDB using the provided MONGO_URI...")
+        client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+        client.admin.command('ping')
+        print("Successfully connected to the database.")
+    except Exception as e:
+        print(f"Error connecting to the database: {e}")
+        return
+
+    try:
+        db = client.get_database()
+        checked = 0
+        drifted = 0
+        fixed = 0
+        skipped = 0
+        for user in db.users.find({}, {"name": 1, "balance": 1, "portfolio": 1, "stats": 1, "portfolio_version": 1}):
+            checked += 1
+            expected = compute_stats_from_history(db, user)
+            stored = user.get("stats")
+            drift = find_drift(stored, expected) if stored is not None else {"stats": (None, "missing")}
+            if not drift:
+                continue
+
+            drifted += 1
+            print(f"{user.get('name')} ({user['_id']}):")
+            for field, (stored_value, expected_value) in drift.items():
+                print(f"    {field}: stored={stored_value} expected={expected_value}")
+
+            if fix:
+                # A trade or deposit in between already $inc-ed the stored totals; leave them
+                result = db.users.update_one(
+                    {"_id": user["_id"], "portfolio_version": version_match(user.get("portfolio_version", 0))},
+                    {"$set": {"stats": expected}}
+                )
+                if result.modified_count:
+                    fixed += 1
+                else:
+                    skipped += 1
+                    print("    changed during the check, not fixed")
+
+        print("-" * 30)
+        print("Reconciliation completed.")
+        print(f"Accounts checked:    {checked}")
+        print(f"Accounts drifting:   {drifted}")
+        print(f"Accounts fixed:      {fixed}")
+        print(f"Accounts skipped:    {skipped}")
+        print("-" * 30)
+    except Exception as e:
+        print(f"An error occurred during reconciliation: {e}")
+    finally:
+        client.close()
+        print("Database connection closed.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile running account totals against transaction history.")
+    parser.add_argument("--fix", action="store_true", help="overwrite drifting totals with the recomputed values")
+    args = parser.parse_args()
+    run_reconciliation(fix=args.fix)
@@ -0,0 +1,141 @@
+from bson import ObjectId
+from models.transaction import CONTRIBUTION_TYPES, TRADE_TYPES
+
+# Running per-account aggregates, kept on the user document under `stats` and updated
+# with $inc by every write that changes them. Valuation then costs O(holdings) instead
+# of re-scanning the whole transaction history on every request.
+#
+# realized_pl follows the same definition the P/L screens use
+# (overall P/L minus unrealized P/L), which works out to:
+#     realized_pl = balance + sum(holding.total_cost) - net_contributions
+# so a buy lowers it by its commission, a sell moves it by (price - avg_price) * qty - commission,
+# and a dust liquidation lowers it by the cost basis of the liquidated holdings.
+#
+# Accounts created before running totals have no `stats`, and $inc on them would create a
+# partial subdocument that looks complete. So every write that $inc-s stats.* matches only
+# accounts whose stats are complete (STATS_COMPLETE), and calls ensure_stats() first to
+# initialise them from history.
+
+STATS_FIELDS = ("net_contributions", "total_commissions", "realized_pl", "trade_count")
+# Query clauses matching accounts that do / do not have every running total
+STATS_COMPLETE = {f"stats.{field}": {"$exists": True} for field in STATS_FIELDS}
+STATS_INCOMPLETE = {"$or": [{f"stats.{field}": {"$exists": False}} for field in STATS_FIELDS]}
+
+def empty_stats():
+    # last_trade_at is only set once the account has traded
+    return {"net_contributions": 0.0, "total_commissions": 0.0, "realized_pl": 0.0, "trade_count": 0}
+
+def deposit_update(amount):
+    return {"$inc": {"stats.net_contributions": amount}}
+
+def buy_update(commission, date):
+    return {
+        "$inc": {"stats.total_commissions": commission, "stats.realized_pl": -commission, "stats.trade_count": 1},
+        "$max": {"stats.last_trade_at": date}
+    }
+
+def sell_update(price, quantity, avg_price, commission, date):
+    return {
+        "$inc": {
+            "stats.total_commissions": commission,
+            "stats.realized_pl": (price - avg_price) * quantity - commission,
+            "stats.trade_count": 1
+        },
+        "$max": {"stats.last_trade_at": date}
+    }
+
+def liquidation_update(amount, cost_basis):
+    return {"$inc": {"stats.net_contributions": amount, "stats.realized_pl": -cost_basis}}
+
+def merge_updates(*updates):
+    """Merges several update documents ({"$inc": ..., "$set": ...}) into one."""
+    merged = {}
+    for update in updates:
+        for operator, fields in update.items():
+            merged.setdefault(operator, {}).update(fields)
+    return merged
+
+def sum_updates(*updates):
+    """
+    Combines the updates of several events on the same account into one:
+    $inc amounts add up and $max keeps the largest value.
+    """
+    combined = {}
+    for update in updates:
+        for operator, fields in update.items():
+            target = combined.setdefault(operator, {})
+            for field, value in fields.items():
+                if operator == "$inc":
+                    target[field] = target.get(field, 0) + value
+                elif operator == "$max" and field in target:
+                    target[field] = max(target[field], value)
+                else:
+                    target[field] = value
+    return combined
+
+def compute_stats_from_history(db, user_data):
+    """
+    Recomputes an account's aggregates from its transaction history and current holdings.
+    Used for reconciliation and as a fallback for accounts that have no `stats` yet.
+    """
+    pipeline = [
+        {"$match": {"user_id": ObjectId(user_data["_id"])}},
+        {"$group": {
+            "_id": None,
+            "net_contributions": {"$sum": {"$cond": [{"$in": ["$type", CONTRIBUTION_TYPES]}, {"$ifNull": ["$amount", 0]}, 0]}},
+            "total_commissions": {"$sum": {"$cond": [{"$in": ["$type", TRADE_TYPES]}, {"$ifNull": ["$commission", 0]}, 0]}},
+            "trade_count": {"$sum": {"$cond": [{"$in": ["$type", TRADE_TYPES]}, 1, 0]}},
+            "last_trade_at": {"$max": {"$cond": [{"$in": ["$type", TRADE_TYPES]}, "$date", None]}}
+        }}
+    ]
+    totals = next(db.transactions.aggregate(pipeline), None) or {}
+    stats = empty_stats()
+    for field in ("net_contributions", "total_commissions", "trade_count", "last_trade_at"):
+        if totals.get(field) is not None:
+            stats[field] = totals[field]
+    total_cost = sum(stock.get("total_cost", 0) for stock in user_data.get("portfolio", []))
+    stats["realized_pl"] = user_data.get("balance", 0) + total_cost - stats["net_contributions"]
+    return stats
+
+def version_match(version):
+    """Query value matching `portfolio_version` == version; accounts that never changed have no field yet."""
+    return version if version else {"$in": [0, None]}
+
+def get_stats(db, user_data):
+    """Returns the account's running aggregates, computing them from history if they were never (fully) stored."""
+    stats = user_data.get("stats")
+    if stats is None or any(field not in stats for field in STATS_FIELDS):
+        return compute_stats_from_history(db, user_data)
+    return {**empty_stats(), **stats}
+
+def ensure_stats(db, user_id):
+    """
+    Initialises the running totals of an account that has none (or only some) from its
+    history, so the $inc of the write that follows starts from the right values. Costs one
+    read by _id when the totals exist. Returns whether it stored new totals.
+    """
+    user_data = db.users.find_one(
+        {"_id": ObjectId(user_id), **STATS_INCOMPLETE},
+        {"balance": 1, "portfolio": 1, "portfolio_version": 1}
+    )
+    if user_data is None:
+        return False
+    stats = compute_stats_from_history(db, user_data)
+    # Only if nothing changed the account meanwhile; otherwise the next write retries
+    result = db.users.update_one(
+        {"_id": user_data["_id"], "portfolio_version": version_match(user_data.get("portfolio_version", 0)), **STATS_INCOMPLETE},
+        {"$set": {"stats": stats}}
+    )
+    return result.modified_count > 0
+
+def find_drift(stored, expected, tolerance=0.01):
+    """Returns {field: (stored, expected)} for every aggregate that differs by more than `tolerance`."""
+    drift = {}
+    for field in STATS_FIELDS:
+        stored_value = (stored or {}).get(field, 0) or 0
+        if abs(stored_value - expected[field]) > tolerance:
+            drift[field] = (stored_value, expected[field])
+    stored_last = (stored or {}).get("last_trade_at")
+    if stored_last != expected.get("last_trade_at"):
+        drift["last_trade_at"] = (stored_last, expected.get("last_trade_at"))
+    return drift
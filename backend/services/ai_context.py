@@ -0,0 +1,206 @@
+import time
+from typing import Callable, List, Optional
+from bson import ObjectId
+from config.config import Config
+from config.extensions import mongo
+from models.transaction import CONTRIBUTION_TYPES, TRADE_TYPES, Transaction
+from services import account_stats
+from services.cache import SWRCache
+from services.quotes import get_price_array
+from services.valuation import value_portfolio
+from utils.portfolio_utils import format_currency
+
+# The portfolio summary the AI chat gets as its system context.
+#
+# Rendering it needs the account, live quotes for every holding and the trade history, so
+# the text is cached per (user, portfolio_version, quote epoch): it is rebuilt after the
+# account changes or when the quote epoch (AI_CONTEXT_QUOTE_EPOCH_SECONDS) rolls over, and
+# every chat turn in between reuses it.
+#
+# The history is not listed trade by trade: Mongo aggregates it per symbol and only the
+# most recent transactions are shown individually. Every section is cut to the token
+# budget (AI_CONTEXT_MAX_TOKENS), so the prompt stays bounded however long the account lives.
+
+# Rough size of a token for English text and numbers, good enough for budgeting
+CHARS_PER_TOKEN = 4
+# Share of the budget left after the overview that the holdings may use, then the share of
+# what is left after them for the recent transactions; the history summary gets the rest
+HOLDINGS_BUDGET_SHARE = 0.5
+RECENT_BUDGET_SHARE = 0.5
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def quote_epoch(now: float = None) -> int:
+    """The current quote epoch; cached contexts are rebuilt with fresh prices when it changes."""
+    return int((time.time() if now is None else now) // Config.AI_CONTEXT_QUOTE_EPOCH_SECONDS)
+
+
+def fit_lines(lines: List[str], budget: int, overflow: Callable[[int], str]) -> List[str]:
+    """
+    Takes `lines` in order while they fit in `budget` tokens. If some do not fit, the
+    last kept lines make room for `overflow(first_dropped_index)`, which summarizes the rest.
+    """
+    kept, used = [], 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    else:
+        return kept
+    while kept:
+        summary = overflow(len(kept))
+        if used + estimate_tokens(summary) + 1 <= budget:
+            return kept + [summary]
+        used -= estimate_tokens(kept.pop()) + 1
+    summary = overflow(0)
+    return [summary] if estimate_tokens(summary) + 1 <= budget else []
+
+
+def load_history_summary(user_id: str) -> List[dict]:
+    """Per-symbol aggregates of the user's whole history, newest activity first; cash events are grouped under symbol None."""
+    pipeline = [
+        {"$match": {"user_id": ObjectId(user_id)}},
+        {"$group": {
+            "_id": "$symbol",
+            "trades": {"$sum": {"$cond": [{"$in": ["$type", TRADE_TYPES]}, 1, 0]}},
+            "bought": {"$sum": {"$cond": [{"$eq": ["$type", "buy"]}, "$quantity", 0]}},
+            "sold": {"$sum": {"$cond": [{"$eq": ["$type", "sell"]}, "$quantity", 0]}},
+            "buy_value": {"$sum": {"$cond": [{"$eq": ["$type", "buy"]}, {"$multiply": ["$price", "$quantity"]}, 0]}},
+            "sell_value": {"$sum": {"$cond": [{"$eq": ["$type", "sell"]}, {"$multiply": ["$price", "$quantity"]}, 0]}},
+            "cash_in": {"$sum": {"$cond": [{"$in": ["$type", CONTRIBUTION_TYPES]}, {"$ifNull": ["$amount", 0]}, 0]}},
+            "first": {"$min": "$date"},
+            "last": {"$max": "$date"}
+        }},
+        {"$sort": {"last": -1}}
+    ]
+    return list(mongo.db.transactions.aggregate(pipeline))
+
+
+def _format_date(value) -> str:
+    return value.strftime("%Y-%m-%d") if value else "N/A"
+
+
+def _holding_lines(valuation):
+    holdings = sorted(valuation.holdings, key=lambda h: h.current_value, reverse=True)
+    lines = [
+        f"{h.symbol}: {h.quantity:.2f} shares, Current Value: {format_currency(h.current_value)}, "
+        f"Unrealized P/L: {format_currency(h.unrealized_pl)}"
+        for h in holdings
+    ]
+
+    def overflow(kept):
+        rest = holdings[kept:]
+        return (f"... and {len(rest)} smaller holdings worth {format_currency(sum(h.current_value for h in rest))} "
+                f"(Unrealized P/L: {format_currency(sum(h.unrealized_pl for h in rest))})")
+    return lines, overflow
+
+
+def _recent_lines(transactions):
+    lines = []
+    for t in transactions:
+        if t.get("type") in TRADE_TYPES:
+            lines.append(f"{_format_date(t.get('date'))} {t['type'].upper()} {t.get('symbol', '')}: "
+                         f"{t.get('quantity', 0):.2f} shares at {format_currency(t.get('price', 0))}")
+        else:
+            lines.append(f"{_format_date(t.get('date'))} {t.get('type', '').upper()}: {format_currency(t.get('amount') or 0)}")
+    return lines, lambda kept: f"... and {len(transactions) - kept} earlier transactions"
+
+
+def _history_lines(history):
+    cash = next((row for row in history if row["_id"] is None), None)
+    symbols = [row for row in history if row["_id"] is not None and row["trades"]]
+    lines = []
+    if symbols:
+        first = min(row["first"] for row in symbols)
+        lines.append(f"{sum(row['trades'] for row in symbols)} trades in {len(symbols)} symbols since {_format_date(first)}")
+    if cash:
+        lines.append(f"Deposits: {format_currency(cash['cash_in'])}")
+    for row in symbols:
+        line = f"{row['_id']}: {row['trades']} trades"
+        if row["bought"]:
+            line += f", bought {row['bought']:.2f} at avg {format_currency(row['buy_value'] / row['bought'])}"
+        if row["sold"]:
+            line += f", sold {row['sold']:.2f} at avg {format_currency(row['sell_value'] / row['sold'])}"
+        lines.append(f"{line}, last {_format_date(row['last'])}")
+    header = len(lines) - len(symbols)
+    return lines, lambda kept: f"... and {len(lines) - max(kept, header)} less recently traded symbols"
+
+
+def render_context(user_data, valuation, recent, history, max_tokens) -> str:
+    """Renders the summary, cutting holdings, recent transactions and history to the token budget."""
+    sections = [
+        f"User Profile Summary for {user_data.get('name', 'N/A')}:",
+        "",
+        "--- Financial Overview ---",
+        f"Total Equity: {format_currency(valuation.total_equity)}",
+        f"Portfolio Value: {format_currency(valuation.total_portfolio_value)}",
+        f"Cash Balance: {format_currency(valuation.balance)}",
+        f"Unrealized P/L: {format_currency(valuation.unrealized_pl)}",
+        f"Realized P/L: {format_currency(valuation.realized_pl)}",
+        f"Total Commissions Paid: {format_currency(valuation.total_commissions)}",
+        "",
+    ]
+    remaining = max_tokens - estimate_tokens("\n".join(sections))
+
+    lines, overflow = _holding_lines(valuation)
+    header = f"--- Current Holdings ({len(lines)}) ---"
+    body = fit_lines(lines, int(remaining * HOLDINGS_BUDGET_SHARE), overflow) if lines else ["No holdings in the portfolio."]
+    sections += [header, *body, ""]
+    remaining = max_tokens - estimate_tokens("\n".join(sections))
+
+    lines, overflow = _recent_lines(recent)
+    body = fit_lines(lines, int(remaining * RECENT_BUDGET_SHARE), overflow) if lines else ["No transaction history."]
+    sections += ["--- Recent Transactions ---", *body, ""]
+    remaining = max_tokens - estimate_tokens("\n".join(sections))
+
+    lines, overflow = _history_lines(history)
+    header = "--- Trading History Summary ---"
+    if lines:
+        sections += [header, *fit_lines(lines, remaining - estimate_tokens(header) - 1, overflow)]
+    return "\n".join(sections).rstrip() + "\n"
+
+
+def build_context(user_id: str) -> Optional[str]:
+    """Loads everything the summary needs and renders it. Returns None if the user does not exist."""
+    user_data = mongo.db.users.find_one(
+        {"_id": ObjectId(user_id)}, {"name": 1, "balance": 1, "portfolio": 1, "stats": 1}
+    )
+    if not user_data:
+        return None
+    portfolio = user_data.get("portfolio", [])
+    prices = get_price_array([stock.get("symbol") for stock in portfolio])
+    valuation = value_portfolio(portfolio, prices, user_data.get("balance", 0), account_stats.get_stats(mongo.db, user_data))
+    recent = list(Transaction.cursor_by_user(user_id, limit=Config.AI_CONTEXT_RECENT_TRANSACTIONS))
+    return render_context(user_data, valuation, recent, load_history_summary(user_id), Config.AI_CONTEXT_MAX_TOKENS)
+
+
+context_cache = SWRCache(
+    fetch=lambda key: build_context(key[0]),
+    ttl=Config.AI_CONTEXT_QUOTE_EPOCH_SECONDS,
+    max_size=Config.AI_CONTEXT_CACHE_SIZE
+)
+
+
+def get_portfolio_version(user_id: str) -> Optional[int]:
+    """The account's portfolio_version, bumped by every write that changes it. None if the user does not exist."""
+    user_data = mongo.db.users.find_one({"_id": ObjectId(user_id)}, {"portfolio_version": 1})
+    if not user_data:
+        return None
+    return user_data.get("portfolio_version", 0)
+
+
+def get_profile_context(user_id: str, portfolio_version: int = None) -> Optional[str]:
+    """
+    The user's portfolio summary for the AI, from the cache unless the account or the quote
+    epoch changed. Pass `portfolio_version` if the caller already read it.
+    """
+    if portfolio_version is None:
+        portfolio_version = get_portfolio_version(user_id)
+        if portfolio_version is None:
+            return None
+    return context_cache.get((user_id, portfolio_version, quote_epoch()))
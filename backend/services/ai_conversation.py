@@ -0,0 +1,120 @@
+from typing import Dict, List, Optional, Tuple
+from config.config import Config
+from models.chat import ChatMessage, ChatSession
+from services.ai_context import estimate_tokens, fit_lines
+from utils.pagination import encode_cursor
+
+# The conversation /chat/ask sends to the model, built from the session's saved messages
+# instead of whatever the client sends.
+#
+# The model gets the most recent messages of the session verbatim, at most
+# AI_CONVERSATION_RECENT_MESSAGES of them within AI_CONVERSATION_MAX_TOKENS. Older turns are
+# folded into a rolling summary kept on the session in `chat_sessions`, together with the
+# cursor of the last message it covers; every turn then only reads the messages after that
+# cursor.
+#
+# The summary has one line per exchange, the question with an excerpt of its answer
+# ("User: ... -> AI: ..."). To stay within AI_CONVERSATION_SUMMARY_MAX_TOKENS the oldest
+# exchanges are first condensed to their question ("User asked: ..."), so a long session
+# keeps what was discussed; only if that is not enough are the oldest lines dropped.
+
+# Longest excerpts of an exchange kept in the summary, and of a condensed question
+QUESTION_CHARS = 200
+ANSWER_CHARS = 300
+CONDENSED_QUESTION_CHARS = 100
+ANSWER_SEPARATOR = " -> AI: "
+CONDENSED_PREFIX = "User asked: "
+# First line of a summary that had to drop its oldest lines
+OMITTED_LINE = "(earlier turns omitted)"
+
+
+def excerpt(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def exchange_lines(messages: List[dict]) -> List[str]:
+    """One line per question with its answer; answers without a question (and the reverse) get a line of their own."""
+    lines = []
+    question, answers = None, []
+
+    def flush():
+        answer = excerpt(" ".join(answers), ANSWER_CHARS)
+        if question is not None:
+            lines.append(f"User: {question}" + (f"{ANSWER_SEPARATOR}{answer}" if answers else ""))
+        elif answers:
+            lines.append(f"AI: {answer}")
+
+    for message in messages:
+        if message["role"] == "user":
+            flush()
+            question, answers = excerpt(message.get("message", ""), QUESTION_CHARS), []
+        else:
+            answers.append(message.get("message", ""))
+    flush()
+    return lines
+
+
+def condense(line: str) -> str:
+    """The line of an exchange cut down to its question; other lines are kept as they are."""
+    if not line.startswith("User: "):
+        return line
+    question = line[len("User: "):].split(ANSWER_SEPARATOR, 1)[0]
+    return CONDENSED_PREFIX + excerpt(question, CONDENSED_QUESTION_CHARS)
+
+
+def fold_summary(summary: Optional[str], messages: List[dict], max_tokens: int) -> str:
+    """
+    Appends a line per exchange of `messages` to `summary`. If that exceeds `max_tokens`, the
+    oldest exchanges are condensed to their questions, then the oldest lines are dropped.
+    """
+    lines = (summary.split("\n") if summary else []) + exchange_lines(messages)
+    if lines and lines[0] == OMITTED_LINE:
+        lines = lines[1:]
+    used = sum(estimate_tokens(line) + 1 for line in lines)
+    for i, line in enumerate(lines):
+        if used <= max_tokens:
+            break
+        lines[i] = condense(line)
+        used -= estimate_tokens(line) - estimate_tokens(lines[i])
+    newest_first = fit_lines(lines[::-1], max_tokens, lambda kept: OMITTED_LINE)
+    return "\n".join(newest_first[::-1])
+
+
+def split_window(messages: List[dict], max_messages: int, max_tokens: int) -> int:
+    """
+    Returns the index where the recent window starts: the newest messages that fit both
+    limits, starting with a user message. The newest message is always in the window.
+    """
+    start, used = len(messages), 0
+    while start > 0 and len(messages) - start < max_messages:
+        cost = estimate_tokens(messages[start - 1].get("message", ""))
+        if start < len(messages) and used + cost > max_tokens:
+            break
+        start -= 1
+        used += cost
+    # The window must open with a user turn; a leading answer goes to the summary
+    while start < len(messages) - 1 and messages[start]["role"] != "user":
+        start += 1
+    return start
+
+
+def build_conversation(user_id: str, session_id: str) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Returns (history, summary) for the session: the recent messages as {"role", "content"}
+    for the model, and the summary of the older turns (None if there are none yet).
+    """
+    summary, through = ChatSession.get_summary(user_id, session_id)
+    messages = ChatMessage.find_session_after(user_id, session_id, through)
+    start = split_window(messages, Config.AI_CONVERSATION_RECENT_MESSAGES, Config.AI_CONVERSATION_MAX_TOKENS)
+
+    if start > 0:
+        folded = messages[:start]
+        summary = fold_summary(summary, folded, Config.AI_CONVERSATION_SUMMARY_MAX_TOKENS)
+        # If another request folded these turns first its summary is as good; use ours for this turn
+        ChatSession.save_summary(
+            user_id, session_id, through, summary, encode_cursor(folded[-1]["timestamp"], folded[-1]["_id"])
+        )
+
+    history = [{"role": m["role"], "content": m["message"]} for m in messages[start:]]
+    return history, summary
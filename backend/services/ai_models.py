@@ -0,0 +1,350 @@
+import abc
+import asyncio
+import concurrent.futures
+import logging
+import os
+import queue
+import threading
+from typing import AsyncIterator, Dict, List
+# Transport of the async Azure client; imported here so a missing install fails at startup, not on the first question
+import aiohttp  # noqa: F401
+from azure.ai.inference.aio import ChatCompletionsClient
+from azure.core.credentials import AzureKeyCredential
+import google.generativeai as genai
+from config.config import Config
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+# The chat models /chat/ask can use, behind one provider interface. Each provider can
+# answer in one piece (`complete`) or stream the answer as text chunks (`stream`).
+#
+# All model I/O runs on one asyncio event loop in a daemon thread, with async SDK clients
+# that are created on first use and then reused, so connections stay pooled per provider.
+# Request threads only wait for the result, never longer than the provider's deadline
+# (AI_TIMEOUT_*_SECONDS; for streams, the longest wait for the next chunk).
+#
+# With AI_HEDGE_ENABLED, a request that has not been answered after AI_HEDGE_DELAY_SECONDS
+# is also sent to the provider's fallback (AI_HEDGE_FALLBACKS) and the first answer wins;
+# for streams, the first provider to produce a chunk wins. The loser is cancelled.
+#
+# "fake" is a local model for tests and development: it streams a canned answer chunk by
+# chunk without any network call. It is only available with AI_FAKE_MODEL_ENABLED.
+
+AI_ENDPOINT = "https://models.github.ai/inference"
+AI_MODEL = "openai/gpt-4.1-nano"
+GEMINI_MODEL = "gemini-1.5-flash"
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+GEMINI_API_KEY = os.getenv("GEMINI_FLASH_2")
+
+FALLBACK_ANSWERS = {
+    "azure": "Sorry, I couldn't process that.",
+    "gemini": "Sorry, I couldn't process that with Gemini.",
+}
+
+
+class ModelError(Exception):
+    """The requested model cannot be used; `status` is the HTTP status the routes answer with."""
+    status = 400
+
+
+class ModelUnavailable(ModelError):
+    status = 503
+
+
+class ModelTimeout(ModelError):
+    status = 504
+
+
+# --- providers ---
+
+def _azure_messages(system_prompt: str, history: List[Dict]) -> List[Dict]:
+    api_history = [{"role": "system", "content": system_prompt}]
+    for msg in history:
+        api_history.append({
+            "role": "assistant" if msg["role"] == "ai" else msg["role"],
+            "content": msg["content"]
+        })
+    return api_history
+
+
+def _gemini_prompt(system_prompt: str, history: List[Dict]) -> List[Dict]:
+    # Gemini has a different message format and uses 'model' for 'assistant'
+    gemini_history = [
+        {'role': 'user' if msg['role'] == 'user' else 'model', 'parts': [msg['content']]}
+        for msg in history
+    ]
+    # Prepend system prompt to the conversation history
+    return [
+        {'role': 'user', 'parts': [system_prompt]},
+        {'role': 'model', 'parts': ["Understood. I am SmartInvest AI, ready to assist with the user's portfolio."]}
+    ] + gemini_history
+
+
+class Provider(abc.ABC):
+    """
+    One chat model. Subclasses implement `complete` and `stream` as coroutines on the AI
+    event loop and create their SDK client lazily there, on first use.
+    """
+    name = None
+    unavailable_message = "AI service is not configured"
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self._client = None
+
+    def available(self) -> bool:
+        return True
+
+    @abc.abstractmethod
+    async def complete(self, system_prompt: str, history: List[Dict]) -> str:
+        """The whole answer."""
+
+    @abc.abstractmethod
+    def stream(self, system_prompt: str, history: List[Dict]) -> AsyncIterator[str]:
+        """The answer as an async iterator of text chunks."""
+
+
+class AzureProvider(Provider):
+    name = "azure"
+    unavailable_message = "Azure AI service is not configured"
+
+    def available(self):
+        return bool(GITHUB_TOKEN)
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = ChatCompletionsClient(endpoint=AI_ENDPOINT, credential=AzureKeyCredential(GITHUB_TOKEN))
+        return self._client
+
+    async def complete(self, system_prompt, history):
+        response = await self._get_client().complete(model=AI_MODEL, messages=_azure_messages(system_prompt, history))
+        return response.choices[0].message.content or FALLBACK_ANSWERS["azure"]
+
+    async def stream(self, system_prompt, history):
+        updates = await self._get_client().complete(model=AI_MODEL, messages=_azure_messages(system_prompt, history), stream=True)
+        async for update in updates:
+            if update.choices and update.choices[0].delta and update.choices[0].delta.content:
+                yield update.choices[0].delta.content
+
+
+class GeminiProvider(Provider):
+    name = "gemini"
+    unavailable_message = "Gemini AI service is not configured"
+
+    def available(self):
+        return bool(GEMINI_API_KEY)
+
+    def _get_client(self):
+        if self._client is None:
+            genai.configure(api_key=GEMINI_API_KEY)
+            self._client = genai.GenerativeModel(GEMINI_MODEL)
+        return self._client
+
+    async def complete(self, system_prompt, history):
+        response = await self._get_client().generate_content_async(_gemini_prompt(system_prompt, history))
+        return response.text or FALLBACK_ANSWERS["gemini"]
+
+    async def stream(self, system_prompt, history):
+        response = await self._get_client().generate_content_async(_gemini_prompt(system_prompt, history), stream=True)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+class FakeProvider(Provider):
+    name = "fake"
+
+    def __init__(self, timeout, chunk_delay, first_chunk_delay=0.0):
+        super().__init__(timeout)
+        self.chunk_delay = chunk_delay
+        self.first_chunk_delay = first_chunk_delay
+
+    async def complete(self, system_prompt, history):
+        return "".join([chunk async for chunk in self.stream(system_prompt, history)]).strip()
+
+    async def stream(self, system_prompt, history):
+        question = history[-1]["content"] if history else ""
+        await asyncio.sleep(self.first_chunk_delay)
+        for word in f"This is a streamed test answer to: {question}".split(" "):
+            await asyncio.sleep(self.chunk_delay)
+            yield word + " "
+
+
+PROVIDERS: Dict[str, Provider] = {
+    "azure": AzureProvider(timeout=Config.AI_TIMEOUT_AZURE_SECONDS),
+    "gemini": GeminiProvider(timeout=Config.AI_TIMEOUT_GEMINI_SECONDS),
+}
+if Config.AI_FAKE_MODEL_ENABLED:
+    PROVIDERS["fake"] = FakeProvider(timeout=Config.AI_TIMEOUT_SECONDS, chunk_delay=Config.AI_FAKE_MODEL_CHUNK_DELAY)
+
+if not GEMINI_API_KEY:
+    logger.warning("GEMINI_FLASH_2 key not found, Gemini model will not be available.")
+
+
+def check_model(model_choice: str) -> Provider:
+    """Returns the provider for `model_choice`, or raises a ModelError if it is unknown or not configured."""
+    provider = PROVIDERS.get(model_choice)
+    if provider is None:
+        raise ModelError("Invalid model selected")
+    if not provider.available():
+        raise ModelUnavailable(provider.unavailable_message)
+    return provider
+
+
+def _providers_for(model_choice: str) -> List[Provider]:
+    """The selected provider, followed by its hedge fallback when hedging is on and the fallback is usable."""
+    providers = [check_model(model_choice)]
+    if Config.AI_HEDGE_ENABLED:
+        fallback = PROVIDERS.get(Config.AI_HEDGE_FALLBACKS.get(model_choice))
+        if fallback is not None and fallback is not providers[0] and fallback.available():
+            providers.append(fallback)
+    return providers
+
+
+# --- event loop ---
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="ai-loop", daemon=True).start()
+    return _loop
+
+
+async def _race(starters, hedge_delay, discard=None):
+    """
+    Starts starters[0](); whenever nothing has finished for `hedge_delay` seconds (or the
+    running attempts failed) the next starter is started too. Returns the first successful
+    result and cancels the other attempts; `discard` is called with any other result that
+    completed at the same time. Raises the last error if every attempt fails.
+    """
+    pending = set()
+    waiting = list(starters)
+    last_error = None
+    while True:
+        if waiting and not pending:
+            pending.add(asyncio.ensure_future(waiting.pop(0)()))
+        done, pending = await asyncio.wait(
+            pending, timeout=hedge_delay if waiting else None, return_when=asyncio.FIRST_COMPLETED
+        )
+        winner = None
+        for task in done:
+            if task.exception() is not None:
+                last_error = task.exception()
+            elif winner is None:
+                winner = task
+            elif discard:
+                await discard(task.result())
+        if winner is not None:
+            for task in pending:
+                task.cancel()
+            return winner.result()
+        if not done and waiting:
+            # The running attempts are too slow: hedge with the next provider
+            pending.add(asyncio.ensure_future(waiting.pop(0)()))
+        if not pending and not waiting:
+            raise last_error
+
+
+def _deadline_error(provider):
+    return ModelTimeout(f"{provider.name} did not answer within {provider.timeout:g}s")
+
+
+async def _complete_with(provider, system_prompt, history):
+    with metrics.timed("ai", provider.name):
+        try:
+            return await asyncio.wait_for(provider.complete(system_prompt, history), provider.timeout)
+        except asyncio.TimeoutError:
+            raise _deadline_error(provider)
+
+
+async def _open_stream(provider, system_prompt, history):
+    """Starts a provider's stream and waits for its first chunk ("" if the answer is empty)."""
+    chunks = provider.stream(system_prompt, history)
+    try:
+        first = await asyncio.wait_for(chunks.__anext__(), provider.timeout)
+    except StopAsyncIteration:
+        return provider, None, ""
+    except asyncio.TimeoutError:
+        await chunks.aclose()
+        raise _deadline_error(provider)
+    except BaseException:
+        await chunks.aclose()
+        raise
+    return provider, chunks, first
+
+
+async def _close_stream(opened):
+    _, chunks, _ = opened
+    if chunks is not None:
+        await chunks.aclose()
+
+
+async def _pump_stream(providers, system_prompt, history, out):
+    """Relays the winning provider's chunks to `out` as ("chunk", text), then ("end", None) or ("error", exc)."""
+    chunks = None
+    try:
+        provider, chunks, first = await _race(
+            [lambda p=p: _open_stream(p, system_prompt, history) for p in providers],
+            Config.AI_HEDGE_DELAY_SECONDS, discard=_close_stream
+        )
+        with metrics.timed("ai", f"{provider.name}_stream"):
+            if first:
+                out.put(("chunk", first))
+            while chunks is not None:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), provider.timeout)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise _deadline_error(provider)
+                out.put(("chunk", chunk))
+        out.put(("end", None))
+    except Exception as e:
+        out.put(("error", e))
+    finally:
+        if chunks is not None:
+            await chunks.aclose()
+
+
+# --- blocking API for the routes ---
+
+def complete(model_choice: str, system_prompt: str, history: List[Dict]) -> str:
+    """Returns the model's whole answer to the conversation `history`."""
+    providers = _providers_for(model_choice)
+    future = asyncio.run_coroutine_threadsafe(
+        _race([lambda p=p: _complete_with(p, system_prompt, history) for p in providers], Config.AI_HEDGE_DELAY_SECONDS),
+        _get_loop()
+    )
+    with metrics.timed("ai"):
+        try:
+            # Every attempt has its own deadline; this only guards against a stuck loop
+            return future.result(timeout=Config.AI_HEDGE_DELAY_SECONDS + sum(p.timeout for p in providers))
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise _deadline_error(providers[0])
+
+
+def stream(model_choice: str, system_prompt: str, history: List[Dict]):
+    """Yields the model's answer as text chunks while it is generated."""
+    providers = _providers_for(model_choice)
+    out = queue.Queue()
+    future = asyncio.run_coroutine_threadsafe(_pump_stream(providers, system_prompt, history, out), _get_loop())
+    try:
+        while True:
+            kind, value = out.get()
+            if kind == "chunk":
+                yield value
+            elif kind == "error":
+                raise value
+            else:
+                return
+    finally:
+        # Also stops the upstream stream when the client disconnects
+        future.cancel()
@@ -0,0 +1,71 @@
+import hashlib
+import json
+import re
+import unicodedata
+from typing import Dict, List, Optional
+from config.config import Config
+from services import metrics
+from services.ai_context import quote_epoch
+from services.cache import TTLCache
+
+# Answers of /chat/ask, reused when a user asks the same question again and the model would
+# be sent the same prompt: the key holds the user, the model, the normalized question, a
+# fingerprint of the conversation before it (recent messages and rolling summary), the
+# portfolio_version and the same quote epoch the portfolio context is cached for
+# (services.ai_context), so an answer never outlives the context it was built from. A
+# follow-up like "why?" therefore only hits after the same conversation; opening questions
+# are shared across sessions. Questions are compared after normalization ("How's my
+# portfolio doing?" = "how is my portfolio doing"), and entries are bounded by
+# AI_RESPONSE_CACHE_TTL_SECONDS and AI_RESPONSE_CACHE_SIZE (LRU).
+#
+# Lookups are counted in the smartinvest_ai_response_cache_lookups_total metric.
+
+CONTRACTIONS = {
+    "what's": "what is", "whats": "what is", "how's": "how is", "hows": "how is",
+    "where's": "where is", "who's": "who is", "it's": "it is", "i'm": "i am",
+    "don't": "do not", "doesn't": "does not", "isn't": "is not", "aren't": "are not",
+}
+# Words that do not change what is being asked
+FILLER_WORDS = {"please", "pls", "hey", "hi", "hello", "thanks", "the", "a", "an", "just", "ok", "okay"}
+
+answer_cache = TTLCache(ttl=Config.AI_RESPONSE_CACHE_TTL_SECONDS, max_size=Config.AI_RESPONSE_CACHE_SIZE)
+
+
+def normalize_question(text: str) -> str:
+    """Lowercases the question, expands contractions and drops punctuation and filler words."""
+    text = unicodedata.normalize("NFKC", text).lower().replace("’", "'")
+    words = []
+    for word in re.findall(r"[\w']+", text):
+        word = CONTRACTIONS.get(word, word).replace("'", "")
+        words.extend(w for w in word.split() if w not in FILLER_WORDS)
+    return " ".join(words)
+
+
+def conversation_fingerprint(history: List[Dict], summary: Optional[str]) -> str:
+    """A digest of everything the model sees before the question ("" for a question that opens the session)."""
+    earlier = history[:-1]
+    if not earlier and not summary:
+        return ""
+    payload = json.dumps([summary, [(m["role"], m["content"]) for m in earlier]])
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def make_key(user_id: str, model_choice: str, portfolio_version: int, history: List[Dict], summary: Optional[str]):
+    """The cache key of the last message of `history`; None if it is empty once normalized."""
+    question = normalize_question(history[-1]["content"])
+    if not question:
+        return None
+    return user_id, model_choice, portfolio_version, quote_epoch(), conversation_fingerprint(history, summary), question
+
+
+def get(key) -> Optional[str]:
+    if key is None or not Config.AI_RESPONSE_CACHE_ENABLED:
+        return None
+    answer = answer_cache.get(key)
+    metrics.ai_response_cache_lookups.inc(("hit" if answer is not None else "miss",))
+    return answer
+
+
+def put(key, answer: str):
+    if key is not None and Config.AI_RESPONSE_CACHE_ENABLED:
+        answer_cache.put(key, answer)
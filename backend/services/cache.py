@@ -0,0 +1,251 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Runs the background revalidations of caches that were not given an executor of their own
+_revalidation_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-revalidate")
+
+
+class TTLCache:
+    """
+    A thread-safe, size-bounded LRU cache whose values expire `ttl` seconds after they
+    were stored. Unlike SWRCache it never fetches: callers `put` what they computed.
+    """
+
+    def __init__(self, ttl, max_size=1024, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the value stored for `key`, or None if there is none or it expired."""
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            return None
+
+    def put(self, key, value):
+        if value is None:
+            return
+        with self._lock:
+            self._entries[key] = (value, self._clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SWRCache:
+    """
+    A thread-safe, size-bounded LRU cache with per-key TTL, stale-while-revalidate
+    and single-flight fetching.
+
+    - A value younger than `ttl` is served straight from memory.
+    - A value older than `ttl` but younger than `ttl + stale_ttl` is served as-is
+      while one background refresh replaces it. Background refreshes run on `executor`
+      (a bounded pool), never on threads of their own.
+    - Anything older (or missing) is fetched in the calling thread. Concurrent
+      callers asking for the same key wait for that one fetch instead of
+      starting their own.
+
+    Every key has at most one fetch in flight, a Future that all callers waiting for
+    that key share.
+
+    `fetch` takes a key and returns the value, or None when the upstream call failed.
+    Failures are never cached; if an expired value is still around it is served instead.
+    """
+
+    def __init__(self, fetch, ttl, stale_ttl=0, max_size=1024, executor=None):
+        self._fetch = fetch
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_size = max_size
+        self._executor = executor or _revalidation_pool
+        self._entries = OrderedDict()  # key -> (value, fetched_at)
+        self._inflight = {}  # key -> Future of the value
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = now - fetched_at
+                if age < self.ttl:
+                    self.hits += 1
+                    return value
+                if age < self.ttl + self.stale_ttl:
+                    self.stale_hits += 1
+                    self._start_fetch(key, background=True)
+                    return value
+            self.misses += 1
+            call, is_leader = self._start_fetch(key)
+
+        if is_leader:
+            self._run_fetch(key, call)
+        value = call.result()
+
+        if value is None and entry is not None:
+            # Serve the last known value rather than nothing when upstream is down.
+            return entry[0]
+        return value
+
+    def get_many(self, keys, executor=None):
+        """
+        Looks up several keys at once and returns a {key: value} dict (None for failures).
+        Duplicate keys are collapsed, and every key that needs an upstream fetch is
+        fetched concurrently on `executor` (the cache's own by default) instead of one after the other.
+        """
+        now = time.monotonic()
+        results = {}
+        fallbacks = {}
+        waiting = {}
+        leaders = []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                entry = self._get_entry(key)
+                if entry is not None:
+                    value, fetched_at = entry
+                    age = now - fetched_at
+                    if age < self.ttl:
+                        self.hits += 1
+                        results[key] = value
+                        continue
+                    if age < self.ttl + self.stale_ttl:
+                        self.stale_hits += 1
+                        self._start_fetch(key, background=True)
+                        results[key] = value
+                        continue
+                    fallbacks[key] = value
+                self.misses += 1
+                call, is_leader = self._start_fetch(key)
+                waiting[key] = call
+                if is_leader:
+                    leaders.append((key, call))
+
+        self._run_fetches(leaders, executor)
+
+        for key, call in waiting.items():
+            value = call.result()
+            results[key] = value if value is not None else fallbacks.get(key)
+        return results
+
+    def peek(self, key):
+        """Returns the cached value (fresh or not) without fetching or touching LRU order."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry else None
+
+    def age(self, key):
+        """Seconds since `key` was last fetched, or None if it is not cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return time.monotonic() - entry[1] if entry else None
+
+    def refresh_many(self, keys, executor=None):
+        """
+        Re-fetches `keys` regardless of their age and stores the results, so readers find
+        them fresh. Keys that already have a fetch in flight are skipped. Returns how many
+        keys were refreshed successfully.
+        """
+        calls = []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                if key in self._inflight:
+                    continue
+                call, _ = self._start_fetch(key)
+                calls.append((key, call))
+
+        self._run_fetches(calls, executor)
+        return sum(call.result() is not None for _, call in calls)
+
+    def put(self, key, value):
+        if value is None:
+            return
+        with self._lock:
+            self._put_entry(key, value, time.monotonic())
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "inflight": len(self._inflight),
+            }
+
+    # --- internals (callers hold self._lock) ---
+
+    def _get_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _put_entry(self, key, value, fetched_at):
+        self._entries[key] = (value, fetched_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _start_fetch(self, key, background=False):
+        """Registers a fetch for `key` unless one is already running. Returns (call, is_leader)."""
+        call = self._inflight.get(key)
+        if call is not None:
+            return call, False
+        call = Future()
+        self._inflight[key] = call
+        if background:
+            self._executor.submit(self._run_fetch, key, call)
+        return call, True
+
+    def _run_fetches(self, calls, executor=None):
+        """Runs the fetches of [(key, call)], concurrently on the executor when there are several."""
+        if len(calls) > 1:
+            executor = executor or self._executor
+            for key, call in calls:
+                executor.submit(self._run_fetch, key, call)
+        else:
+            for key, call in calls:
+                self._run_fetch(key, call)
+
+    def _run_fetch(self, key, call):
+        value = None
+        try:
+            value = self._fetch(key)
+        except Exception as e:
+            logger.warning("Cache fetch failed for %s: %s", key, e)
+        finally:
+            with self._lock:
+                if value is not None:
+                    self._put_entry(key, value, time.monotonic())
+                self._inflight.pop(key, None)
+            call.set_result(value)
@@ -0,0 +1,141 @@
+import datetime
+from typing import Dict, Iterable, List, Optional
+from bson import ObjectId
+from pymongo import ASCENDING, UpdateOne
+from config.extensions import mongo
+
+# Daily per-account equity, stored compactly in `equity_history` as one bucket document
+# per (user_id, month):
+#     {user_id, month: <first day of the month>, equity: [31 slots], net_contributions: [31 slots]}
+# Slot i holds the value for day i + 1 of the month (null when no snapshot was taken),
+# so a year of history is 12 small documents read through the (user_id, month) index.
+# Returns over a period are contribution-adjusted:
+#     pl = (equity_now - equity_then) - (contributions_now - contributions_then)
+
+SLOTS = 31
+
+# Accepted `timeframe` values mapped to their period (and its length in days)
+TIMEFRAMES = {"24h": "1d", "1d": "1d", "day": "1d", "7d": "7d", "1w": "7d", "week": "7d", "1m": "30d", "30d": "30d", "month": "30d"}
+PERIOD_DAYS = {"1d": 1, "7d": 7, "30d": 30}
+
+
+def ensure_indexes():
+    mongo.db.equity_history.create_index([("user_id", ASCENDING), ("month", ASCENDING)], unique=True)
+
+
+def parse_timeframe(value: Optional[str]) -> Optional[str]:
+    """Maps a timeframe query value to a period key; None (or 'all') means all time. Raises ValueError if unknown."""
+    if value is None or value.lower() in ("", "all"):
+        return None
+    try:
+        return TIMEFRAMES[value.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown timeframe '{value}'")
+
+
+def month_start(date: datetime.datetime) -> datetime.datetime:
+    return datetime.datetime(date.year, date.month, 1)
+
+
+def record_day(user_ids: List, date: datetime.datetime, equity: List[float], net_contributions: List[float], batch_size: int = 5000):
+    """
+    Writes one day's equity for many accounts. Re-running for the same day overwrites it.
+    Buckets are only created (in a second pass) for accounts that have none for the month yet.
+    """
+    month = month_start(date)
+    slot = date.day - 1
+
+    def write(start, end, upsert_missing):
+        ops = [
+            UpdateOne(
+                {"user_id": user_ids[i], "month": month},
+                {"$set": {f"equity.{slot}": equity[i], f"net_contributions.{slot}": net_contributions[i]}}
+            )
+            for i in range(start, end)
+        ]
+        result = mongo.db.equity_history.bulk_write(ops, ordered=False)
+        if result.matched_count < len(ops) and upsert_missing:
+            # First snapshot of the month (or new accounts): create the empty buckets, then write again
+            mongo.db.equity_history.bulk_write([
+                UpdateOne(
+                    {"user_id": user_ids[i], "month": month},
+                    {"$setOnInsert": {"equity": [None] * SLOTS, "net_contributions": [None] * SLOTS}},
+                    upsert=True
+                )
+                for i in range(start, end)
+            ], ordered=False)
+            write(start, end, upsert_missing=False)
+
+    for start in range(0, len(user_ids), batch_size):
+        write(start, min(start + batch_size, len(user_ids)), upsert_missing=True)
+
+
+def _points(bucket):
+    month = bucket["month"]
+    for slot, (equity, contributions) in enumerate(zip(bucket.get("equity") or [], bucket.get("net_contributions") or [])):
+        if equity is None:
+            continue
+        try:
+            date = month.replace(day=slot + 1)
+        except ValueError:
+            continue  # slot past the end of a short month
+        yield date, equity, contributions or 0
+
+
+def load_points(user_id, start: Optional[datetime.datetime] = None, end: Optional[datetime.datetime] = None) -> List[Dict]:
+    """Returns one account's daily points between `start` and `end` (inclusive), oldest first."""
+    query = {"user_id": ObjectId(user_id)}
+    month_range = {}
+    if start:
+        month_range["$gte"] = month_start(start)
+    if end:
+        month_range["$lte"] = end
+    if month_range:
+        query["month"] = month_range
+
+    points = []
+    for bucket in mongo.db.equity_history.find(query, {"_id": 0, "user_id": 0}).sort("month", ASCENDING):
+        for date, equity, contributions in _points(bucket):
+            if (start and date < start) or (end and date > end):
+                continue
+            points.append({"date": date, "equity": equity, "net_contributions": contributions})
+    return points
+
+
+def period_return(equity_now, contributions_now, equity_then, contributions_then):
+    """Contribution-adjusted P/L and return (%) between two points."""
+    deposited = contributions_now - contributions_then
+    pl = round((equity_now - equity_then) - deposited, 2)
+    base = equity_then + max(deposited, 0)
+    return pl, round(pl / base * 100, 2) if base > 0 else 0.0
+
+
+def period_baselines(user_ids: Iterable, today: datetime.datetime) -> Dict[str, Dict[str, tuple]]:
+    """
+    Returns {period: {user_id_str: (equity, net_contributions)}} with, for every period, the
+    latest point on or before its start, or the account's first point inside the period if
+    it is younger than that. Accounts without any history are left out.
+    """
+    user_ids = [ObjectId(uid) for uid in user_ids]
+    if not user_ids:
+        return {period: {} for period in PERIOD_DAYS}
+    longest = max(PERIOD_DAYS.values())
+    # One month of look-back before the longest period is enough to find its baseline
+    earliest = month_start(today - datetime.timedelta(days=longest + SLOTS))
+
+    history = {}
+    cursor = mongo.db.equity_history.find(
+        {"user_id": {"$in": user_ids}, "month": {"$gte": earliest}},
+        {"_id": 0}
+    ).sort([("user_id", ASCENDING), ("month", ASCENDING)])
+    for bucket in cursor:
+        history.setdefault(str(bucket["user_id"]), []).extend(_points(bucket))
+
+    baselines = {period: {} for period in PERIOD_DAYS}
+    for uid, points in history.items():
+        for period, days in PERIOD_DAYS.items():
+            start = today - datetime.timedelta(days=days)
+            before = [point for point in points if point[0] <= start]
+            baseline = before[-1] if before else points[0]
+            baselines[period][uid] = (baseline[1], baseline[2])
+    return baselines
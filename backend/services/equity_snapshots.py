@@ -0,0 +1,134 @@
+import datetime
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List
+import numpy as np
+from config.config import Config
+from config.extensions import mongo
+from models.transaction import Transaction
+from services import equity_history
+from services.quotes import get_price_array
+from services.scheduler import start_daily_job
+from services.valuation import value_columns
+
+# Nightly equity snapshot of every account, appended to the daily time series in
+# services.equity_history. The whole user base is valued in one columnar pass:
+#   1. stream `users` with only the fields valuation needs
+#   2. flatten every holding into flat arrays, with `owner` pointing back at the account
+#   3. look up one quote per distinct symbol and scatter it back through the symbol codes
+#   4. sum holdings per account with np.bincount (services.valuation.value_columns)
+
+ACCOUNT_PROJECTION = {
+    "balance": 1,
+    "portfolio.symbol": 1,
+    "portfolio.quantity": 1,
+    "portfolio.total_cost": 1,
+    "portfolio.avg_price": 1,
+    "stats.net_contributions": 1,
+    "stats.total_commissions": 1,
+}
+
+
+@dataclass
+class AccountColumns:
+    """Every account and every holding as flat arrays; holdings point at their account via `owner`."""
+    user_ids: List
+    balance: np.ndarray
+    net_contributions: np.ndarray
+    total_commissions: np.ndarray
+    missing_stats: np.ndarray  # indices of accounts without running totals
+    symbols: List[str]  # distinct symbols; holdings refer to them by position in `symbol_code`
+    symbol_code: np.ndarray
+    quantity: np.ndarray
+    cost: np.ndarray
+    avg_price: np.ndarray
+    owner: np.ndarray
+
+
+def flatten_accounts(accounts: Iterable[Dict]) -> AccountColumns:
+    """Flattens user documents (projected with ACCOUNT_PROJECTION) into columnar arrays."""
+    user_ids, balance, net_contributions, total_commissions, missing = [], [], [], [], []
+    codes, symbol_code, quantity, cost, avg_price, owner = {}, [], [], [], [], []
+
+    for index, account in enumerate(accounts):
+        user_ids.append(account["_id"])
+        balance.append(account.get("balance", 0) or 0)
+        stats = account.get("stats")
+        if not stats:
+            missing.append(index)
+            stats = {}
+        net_contributions.append(stats.get("net_contributions", 0) or 0)
+        total_commissions.append(stats.get("total_commissions", 0) or 0)
+        for stock in account.get("portfolio") or []:
+            symbol = (stock.get("symbol") or "").upper()
+            symbol_code.append(codes.setdefault(symbol, len(codes)))
+            quantity.append(stock.get("quantity", 0) or 0)
+            cost.append(stock.get("total_cost", 0) or 0)
+            avg_price.append(stock.get("avg_price", 0) or 0)
+            owner.append(index)
+
+    return AccountColumns(
+        user_ids=user_ids,
+        balance=np.array(balance, dtype=np.float64),
+        net_contributions=np.array(net_contributions, dtype=np.float64),
+        total_commissions=np.array(total_commissions, dtype=np.float64),
+        missing_stats=np.array(missing, dtype=np.int64),
+        symbols=list(codes),
+        symbol_code=np.array(symbol_code, dtype=np.int64),
+        quantity=np.array(quantity, dtype=np.float64),
+        cost=np.array(cost, dtype=np.float64),
+        avg_price=np.array(avg_price, dtype=np.float64),
+        owner=np.array(owner, dtype=np.int64),
+    )
+
+
+def value_accounts(columns: AccountColumns, price_lookup: Callable[[List[str]], np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Values every account in `columns`. `price_lookup` receives the distinct symbols once
+    and returns their prices as an aligned array (services.quotes.get_price_array).
+    """
+    quote_vector = price_lookup(columns.symbols)
+    return value_columns(
+        columns.quantity, columns.cost, columns.avg_price, quote_vector[columns.symbol_code], columns.owner,
+        columns.balance, columns.net_contributions, columns.total_commissions,
+    )
+
+
+def _backfill_missing_stats(columns: AccountColumns):
+    # Accounts that were never reconciled have no running totals; sum their history instead.
+    if not len(columns.missing_stats):
+        return
+    totals = Transaction.totals_by_user([columns.user_ids[i] for i in columns.missing_stats])
+    for i in columns.missing_stats:
+        row = totals.get(str(columns.user_ids[i]), {})
+        columns.net_contributions[i] = row.get("net_contributions", 0)
+        columns.total_commissions[i] = row.get("total_commissions", 0)
+
+
+def snapshot_date(now=None) -> datetime.datetime:
+    now = now or datetime.datetime.utcnow()
+    return datetime.datetime(now.year, now.month, now.day)
+
+
+def take_equity_snapshots(date=None) -> int:
+    """
+    Values every account and records its equity for `date` (UTC midnight, today by default).
+    Re-running on the same day overwrites that day's snapshot. Returns the number of accounts.
+    """
+    date = date or snapshot_date()
+    cursor = mongo.db.users.find({}, ACCOUNT_PROJECTION, batch_size=Config.EQUITY_SNAPSHOT_BATCH_SIZE)
+    columns = flatten_accounts(cursor)
+    if not columns.user_ids:
+        return 0
+    _backfill_missing_stats(columns)
+
+    totals = value_accounts(columns, get_price_array)
+    equity_history.record_day(
+        columns.user_ids, date,
+        totals["total_equity"].tolist(), totals["net_contributions"].tolist(),
+        batch_size=Config.EQUITY_SNAPSHOT_BATCH_SIZE
+    )
+    return len(columns.user_ids)
+
+
+def start_equity_snapshot_job(app):
+    start_daily_job(app, "equity_snapshots", Config.EQUITY_SNAPSHOT_HOUR_UTC, take_equity_snapshots)
@@ -0,0 +1,65 @@
+import datetime
+import hashlib
+import json
+import threading
+from config.config import Config
+from services import market_data
+from services.quotes import get_quotes
+from services.scheduler import start_periodic_job
+
+# The home page "hot stocks" list: the biggest daily movers among a fixed set of popular
+# symbols. It is computed by a background job and kept as one serialized JSON body with
+# its ETag, so a request costs no upstream calls and unchanged lists are answered with 304.
+
+POPULAR_SYMBOLS = [
+    'AAPL', 'MSFT', 'GOOGL', 'AMZN', 'NVDA', 'TSLA', 'META', 'ADBE', 'CRM', 'INTC',
+    'JPM', 'BAC', 'WFC', 'GS', 'MS', 'V', 'MA',
+    'JNJ', 'UNH', 'PFE', 'MRK', 'ABBV',
+    'HD', 'MCD', 'NKE', 'SBUX', 'WMT', 'COST',
+    'BA', 'CAT', 'XOM', 'CVX', 'DIS'
+]
+HOT_STOCKS_COUNT = 6
+
+_blob = {"body": None, "etag": None, "computed_at": None}
+_refresh_lock = threading.Lock()
+
+
+def compute_hot_stocks():
+    """Returns the top movers, with one batched quote lookup and one batched profile lookup."""
+    quotes = get_quotes(POPULAR_SYMBOLS)
+    profiles = market_data.get_profiles(POPULAR_SYMBOLS)
+    stocks = []
+    for symbol in POPULAR_SYMBOLS:
+        quote = quotes.get(symbol)
+        if not quote or not quote.get("pc"):
+            continue
+        company = profiles.get(symbol) or {}
+        stocks.append({
+            "symbol": symbol,
+            "currentPrice": quote["c"],
+            "dailyChange": (quote["c"] - quote["pc"]) / quote["pc"] * 100,
+            "companyName": company.get("name") or symbol,
+            "logo": company.get("logo"),
+        })
+    stocks.sort(key=lambda stock: stock["dailyChange"], reverse=True)
+    return stocks[:HOT_STOCKS_COUNT]
+
+
+def refresh_hot_stocks():
+    """Recomputes the list and swaps in its serialized body and ETag."""
+    with _refresh_lock:
+        body = json.dumps(compute_hot_stocks(), separators=(",", ":")).encode()
+        etag = hashlib.sha1(body).hexdigest()
+        _blob.update(body=body, etag=etag, computed_at=datetime.datetime.utcnow())
+        return etag
+
+
+def get_blob():
+    """Returns (body, etag), computing the list on the first call if the job has not run yet."""
+    if _blob["body"] is None:
+        refresh_hot_stocks()
+    return _blob["body"], _blob["etag"]
+
+
+def start_hot_stocks_refresher(app):
+    start_periodic_job(app, "hot-stocks", Config.HOT_STOCKS_REFRESH_SECONDS, refresh_hot_stocks)
@@ -0,0 +1,53 @@
+import math
+import threading
+import time
+from typing import Dict, Iterable
+
+# The set of symbols worth keeping warm in the quote cache, with a priority per symbol:
+#   - held symbols count once per account holding them (reloaded from the database)
+#   - requested symbols gain 1 per request and decay exponentially with `half_life`,
+#     so a ticker someone looked up once drops out after a while
+
+
+class HotSymbols:
+    def __init__(self, half_life, min_score=0.05):
+        self.half_life = half_life
+        self.min_score = min_score
+        self._held = {}  # symbol -> number of accounts holding it
+        self._requested = {}  # symbol -> (score, scored_at)
+        self._lock = threading.Lock()
+
+    def _decayed(self, score, scored_at, now):
+        return score * math.pow(0.5, (now - scored_at) / self.half_life)
+
+    def touch(self, symbols: Iterable[str], weight: float = 1.0):
+        """Records a request for each symbol."""
+        now = time.monotonic()
+        with self._lock:
+            for symbol in symbols:
+                if not symbol:
+                    continue
+                score, scored_at = self._requested.get(symbol, (0.0, now))
+                self._requested[symbol] = (self._decayed(score, scored_at, now) + weight, now)
+
+    def set_held(self, held: Dict[str, int]):
+        """Replaces the held reference counts ({symbol: holders})."""
+        with self._lock:
+            self._held = dict(held)
+
+    def priorities(self) -> Dict[str, float]:
+        """Returns {symbol: priority} for every hot symbol and forgets fully decayed requests."""
+        now = time.monotonic()
+        with self._lock:
+            result = dict(self._held)
+            for symbol, (score, scored_at) in list(self._requested.items()):
+                score = self._decayed(score, scored_at, now)
+                if score < self.min_score:
+                    del self._requested[symbol]
+                    continue
+                result[symbol] = result.get(symbol, 0) + score
+            return result
+
+    def __len__(self):
+        with self._lock:
+            return len(set(self._held) | set(self._requested))
@@ -0,0 +1,139 @@
+import datetime
+import heapq
+import threading
+from pymongo import DESCENDING, ReplaceOne
+from config.config import Config
+from config.extensions import mongo
+from models.transaction import Transaction
+from services import equity_history
+from services.equity_snapshots import snapshot_date
+from services.quotes import get_prices
+from services.scheduler import start_periodic_job
+from services.valuation import value_portfolios
+
+# The leaderboard is precomputed by a background job instead of being built on every
+# /user/top request. Each refresh values the distinct set of held symbols once, writes
+# per-user metrics to the `leaderboard` collection, and keeps a small in-memory top-K
+# per sort key so the common request (top 3) is served without touching the database.
+#
+# Rows also carry P/L over the periods in services.equity_history (e.g. overall_pl_7d),
+# measured against the equity history. Those baselines only change once a day, so they
+# are cached per day and only looked up for accounts not seen yet that day.
+
+BASE_SORT_KEYS = ("overall_pl", "overall_pl_percentage")
+SORT_KEYS = BASE_SORT_KEYS + tuple(f"{key}_{period}" for period in equity_history.PERIOD_DAYS for key in BASE_SORT_KEYS)
+
+_snapshot = {"top": {}, "refreshed_at": None}
+_baselines = {"date": None, "seen": set(), "values": {period: {} for period in equity_history.PERIOD_DAYS}}
+_refresh_lock = threading.Lock()
+
+
+def ensure_indexes():
+    for key in SORT_KEYS:
+        mongo.db.leaderboard.create_index([(key, DESCENDING)])
+
+
+def build_rows(users, prices):
+    """Values every user document in one vectorized pass and returns their leaderboard rows."""
+    valuations = value_portfolios(users, prices)
+    return [
+        {
+            "id": str(user_data['_id']),
+            "name": user_data.get('name'),
+            "profile_image": user_data.get('profile_image'),
+            **valuation.summary(),
+            "portfolio": user_data.get('portfolio', []),
+        }
+        for user_data, valuation in zip(users, valuations)
+    ]
+
+
+def _get_baselines(user_ids, now):
+    today = snapshot_date(now)
+    if _baselines["date"] != today:
+        _baselines.update(date=today, seen=set(), values={period: {} for period in equity_history.PERIOD_DAYS})
+    missing = [uid for uid in user_ids if uid not in _baselines["seen"]]
+    if missing:
+        for period, values in equity_history.period_baselines(missing, today).items():
+            _baselines["values"][period].update(values)
+        _baselines["seen"].update(missing)
+    return _baselines["values"]
+
+
+def add_period_returns(rows, baselines):
+    """Adds overall_pl_<period> and overall_pl_percentage_<period> to every row (0 without history)."""
+    for row in rows:
+        for period, values in baselines.items():
+            baseline = values.get(row["id"])
+            pl, pl_percentage = 0.0, 0.0
+            if baseline:
+                pl, pl_percentage = equity_history.period_return(row["total_equity"], row["net_contributions"], *baseline)
+            row[f"overall_pl_{period}"] = pl
+            row[f"overall_pl_percentage_{period}"] = pl_percentage
+
+
+def refresh_leaderboard():
+    """Recomputes every public user's metrics and replaces the leaderboard snapshot."""
+    with _refresh_lock:
+        started_at = datetime.datetime.utcnow()
+        users = list(mongo.db.users.find(
+            {"is_public": True},
+            {"name": 1, "profile_image": 1, "balance": 1, "portfolio": 1, "stats": 1}
+        ))
+        # Running totals live on the account; only accounts that were never reconciled
+        # fall back to summing their history.
+        missing = [user_data for user_data in users if not user_data.get('stats')]
+        if missing:
+            totals = Transaction.totals_by_user([user_data['_id'] for user_data in missing])
+            for user_data in missing:
+                user_data['stats'] = totals.get(str(user_data['_id']), {})
+
+        # One batch quote lookup for the distinct set of held symbols
+        prices = get_prices(stock['symbol'] for user_data in users for stock in user_data.get('portfolio', []))
+        rows = build_rows(users, prices)
+        add_period_returns(rows, _get_baselines([row["id"] for row in rows], started_at))
+
+        if rows:
+            mongo.db.leaderboard.bulk_write([
+                ReplaceOne({"_id": row["id"]}, {**row, "updated_at": started_at}, upsert=True)
+                for row in rows
+            ], ordered=False)
+        # Drop users that went private or were deleted since the last refresh
+        mongo.db.leaderboard.delete_many({"updated_at": {"$lt": started_at}})
+
+        size = Config.LEADERBOARD_SNAPSHOT_SIZE
+        _snapshot["top"] = {key: heapq.nlargest(size, rows, key=lambda row: row[key]) for key in SORT_KEYS}
+        _snapshot["refreshed_at"] = started_at
+        return len(rows)
+
+
+def get_top(limit, sort_by, period=None):
+    """
+    Returns the top `limit` leaderboard rows ordered by `sort_by` (descending).
+    With a `period` (see equity_history.parse_timeframe) rows are ranked by their P/L over
+    that period, which is also returned as period_pl / period_pl_percentage.
+    """
+    if sort_by not in BASE_SORT_KEYS:
+        sort_by = 'overall_pl'
+    if period:
+        sort_by = f"{sort_by}_{period}"
+    if _snapshot["refreshed_at"] is None:
+        # First request before the background job has run
+        refresh_leaderboard()
+
+    if limit <= Config.LEADERBOARD_SNAPSHOT_SIZE:
+        rows = _snapshot["top"][sort_by][:limit]
+    else:
+        cursor = mongo.db.leaderboard.find({}, {"updated_at": 0}).sort(sort_by, DESCENDING).limit(limit)
+        rows = [{k: v for k, v in row.items() if k != "_id"} for row in cursor]
+
+    if period:
+        rows = [
+            {**row, "period_pl": row[f"overall_pl_{period}"], "period_pl_percentage": row[f"overall_pl_percentage_{period}"]}
+            for row in rows
+        ]
+    return rows
+
+
+def start_leaderboard_refresher(app):
+    start_periodic_job(app, "leaderboard", Config.LEADERBOARD_REFRESH_SECONDS, refresh_leaderboard)
@@ -0,0 +1,69 @@
+from typing import Dict, Iterable, List, Optional
+from config.config import Config
+from services import metrics
+from services.cache import SWRCache
+from services.quotes import finnhub_get, fetch_pool
+
+# Server-side caches for the market data the frontend used to fetch from Finnhub in
+# every browser. Each endpoint has its own TTL: profiles are cached for days, searches
+# for a day and news for minutes (quotes live in services.quotes). Every cache is
+# single-flight, so N users opening the same page cost one upstream call.
+
+# Longest search query passed upstream; every distinct query is a cache entry
+MAX_QUERY_LENGTH = 50
+
+
+def _fetch_profile(symbol: str) -> Optional[Dict]:
+    # Finnhub answers {} for unknown symbols; that is cached like any other profile
+    return finnhub_get("/stock/profile2", symbol=symbol)
+
+
+def _fetch_search(query: str) -> Optional[List[Dict]]:
+    data = finnhub_get("/search", q=query)
+    if data is None:
+        return None
+    # Only primary US listings (no exchange suffix such as BRK.B or 7203.T)
+    return [item for item in data.get("result", []) if "." not in item.get("symbol", "")]
+
+
+def _fetch_news(category: str) -> Optional[List[Dict]]:
+    data = finnhub_get("/news", category=category)
+    if data is None:
+        return None
+    # The news feed design needs an image for every article
+    return [article for article in data if article.get("image")]
+
+
+profile_cache = SWRCache(fetch=_fetch_profile, ttl=Config.MARKET_PROFILE_TTL, stale_ttl=7 * 24 * 3600, max_size=5000, executor=fetch_pool)
+search_cache = SWRCache(fetch=_fetch_search, ttl=Config.MARKET_SEARCH_TTL, stale_ttl=7 * 24 * 3600, max_size=5000, executor=fetch_pool)
+news_cache = SWRCache(fetch=_fetch_news, ttl=Config.MARKET_NEWS_TTL, stale_ttl=900, max_size=16, executor=fetch_pool)
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases a search query and collapses its whitespace, so equivalent queries share a cache entry."""
+    return " ".join(query.split()).lower()
+
+
+def get_profile(symbol: str) -> Optional[Dict]:
+    """Returns the Finnhub company profile for a symbol ({} if unknown), or None if unavailable."""
+    return profile_cache.get(symbol.upper())
+
+
+def get_profiles(symbols: Iterable[str]) -> Dict[str, Optional[Dict]]:
+    unique = [s.upper() for s in dict.fromkeys(symbols) if s]
+    with metrics.timed("finnhub"):
+        return profile_cache.get_many(unique)
+
+
+def search_symbols(query: str, limit: int = 7) -> Optional[List[Dict]]:
+    """Searches Finnhub for `query`, cut to MAX_QUERY_LENGTH characters once normalized."""
+    query = normalize_query(query)[:MAX_QUERY_LENGTH]
+    if not query:
+        return []
+    results = search_cache.get(query)
+    return results[:limit] if results is not None else None
+
+
+def get_news(category: str = "general", limit: int = 15) -> Optional[List[Dict]]:
+    articles = news_cache.get(category)
+    return articles[:limit] if articles is not None else None
@@ -0,0 +1,264 @@
+import cProfile
+import datetime
+import hmac
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from flask import Response, g, request
+from pymongo import monitoring
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Request instrumentation, exported on /metrics in the Prometheus text format.
+#
+# Every request records its latency per endpoint, and the time it spent in the three
+# things that dominate our latency: Mongo commands, Finnhub HTTP calls and AI model calls.
+# Those are timed with `timed(component, operation)` (Mongo through a command listener)
+# and summed per request on the request thread. Work done on other threads, like quote
+# fetches on the shared fetch pool, counts towards the request only where the request
+# thread waits for it inside a `timed(component)` block.
+#
+# /metrics and profiling are only available with a METRICS_TOKEN: scrapers send it as a
+# bearer token, and with PROFILING_ENABLED a request sent with an `X-Profile-Token: <token>`
+# header runs under cProfile and its stats are written to PROFILE_DIR.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COMPONENTS = ("mongo", "finnhub", "ai")
+PROFILE_TOP_FUNCTIONS = 30
+
+_local = threading.local()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, label_names):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_number(value)}")
+        return lines
+
+
+class Histogram:
+    """A labelled histogram with fixed buckets, like prometheus_client's, without the dependency."""
+
+    def __init__(self, name, help, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, ('le', bound))} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, ('le', '+Inf'))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_number(series[-2])}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {series[-1]}")
+        return lines
+
+
+requests_total = Counter(
+    "smartinvest_http_requests_total", "HTTP requests by endpoint, method and status.",
+    ("endpoint", "method", "status")
+)
+request_duration = Histogram(
+    "smartinvest_http_request_duration_seconds", "Time to handle a request, by endpoint.",
+    ("endpoint", "method")
+)
+request_component_duration = Histogram(
+    "smartinvest_http_request_component_seconds", "Time a request spent in Mongo, Finnhub and AI calls.",
+    ("endpoint", "component")
+)
+call_duration = Histogram(
+    "smartinvest_external_call_duration_seconds", "Latency of single Mongo commands, Finnhub calls and AI calls.",
+    ("component", "operation")
+)
+
+ai_response_cache_lookups = Counter(
+    "smartinvest_ai_response_cache_lookups_total", "Lookups in the AI answer cache, by result (hit or miss).",
+    ("result",)
+)
+
+METRICS = [requests_total, request_duration, request_component_duration, call_duration, ai_response_cache_lookups]
+
+
+def _add_to_request(component, seconds):
+    timings = getattr(_local, "timings", None)
+    if timings is not None:
+        timings[component] += seconds
+
+
+@contextmanager
+def timed(component, operation=None):
+    """
+    Times a block as `component` time of the current request. With `operation`, the block
+    is also observed as one call in the external call histogram. Nested blocks of the same
+    component on the same thread count towards the request only once.
+    """
+    active = getattr(_local, "active", None)
+    outermost = active is not None and component not in active
+    if outermost:
+        active.add(component)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if operation:
+            call_duration.observe((component, operation), elapsed)
+        if outermost:
+            active.discard(component)
+            _add_to_request(component, elapsed)
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Records the duration of every Mongo command; pymongo calls it on the thread that ran the command."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event)
+
+    def _record(self, event):
+        seconds = event.duration_micros / 1e6
+        call_duration.observe(("mongo", event.command_name), seconds)
+        if "mongo" not in (getattr(_local, "active", None) or ()):
+            _add_to_request("mongo", seconds)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- request hooks ---
+
+def _token_matches(value):
+    return bool(Config.METRICS_TOKEN) and hmac.compare_digest(value or "", Config.METRICS_TOKEN)
+
+
+def _profile_requested():
+    # A separate header, as the Authorization header carries the user's JWT
+    return Config.PROFILING_ENABLED and _token_matches(request.headers.get("X-Profile-Token"))
+
+
+def _dump_profile(profiler, endpoint):
+    os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+    stamp = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    path = os.path.join(Config.PROFILE_DIR, f"{stamp}-{endpoint.replace('.', '_')}.prof")
+    profiler.dump_stats(path)
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+    logger.info("Profiled %s %s -> %s\n%s", request.method, request.path, path, summary.getvalue())
+    return path
+
+
+def _before_request():
+    _local.timings = dict.fromkeys(COMPONENTS, 0.0)
+    _local.active = set()
+    g.metrics_started = time.perf_counter()
+    if _profile_requested():
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+def _after_request(response):
+    started = g.pop("metrics_started", None)
+    timings = getattr(_local, "timings", None)
+    if started is None or timings is None:
+        return response
+    endpoint = request.endpoint or "unmatched"
+    elapsed = time.perf_counter() - started
+
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        response.headers["X-Profile-File"] = os.path.basename(_dump_profile(profiler, endpoint))
+
+    requests_total.inc((endpoint, request.method, str(response.status_code)))
+    request_duration.observe((endpoint, request.method), elapsed)
+    for component, seconds in timings.items():
+        request_component_duration.observe((endpoint, component), seconds)
+    # The same breakdown for the browser's network panel
+    response.headers["Server-Timing"] = ", ".join(
+        [f"{component};dur={seconds * 1000:.1f}" for component, seconds in timings.items()]
+        + [f"total;dur={elapsed * 1000:.1f}"]
+    )
+    return response
+
+
+def _teardown_request(exc):
+    _local.timings = None
+    _local.active = None
+
+
+def metrics_view():
+    if not Config.METRICS_TOKEN:
+        return Response("Not Found\n", status=404, mimetype="text/plain")
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme != "Bearer" or not _token_matches(token):
+        return Response("Unauthorized\n", status=401, mimetype="text/plain")
+    return Response(render(), mimetype="text/plain; version=0.0.4")
+
+
+def init_app(app):
+    """Registers the request hooks and the /metrics endpoint."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view, methods=["GET"])
+    if not Config.METRICS_TOKEN:
+        logger.info("METRICS_TOKEN is not set: /metrics and request profiling are disabled")
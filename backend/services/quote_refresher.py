@@ -0,0 +1,59 @@
+import logging
+from config.config import Config
+from config.extensions import mongo
+from services import quotes
+from services.scheduler import start_periodic_job
+
+logger = logging.getLogger(__name__)
+
+# Keeps the hot symbol set (services.quotes.hot_symbols) fresh in the quote cache, so
+# request handlers are served from memory instead of waiting on Finnhub.
+#
+# Every cycle refreshes the highest-priority symbols whose cached quote is about to
+# expire, using at most QUOTE_REFRESH_BUDGET_SHARE of the Finnhub rate budget that is
+# currently available (services.quotes.finnhub_budget), so on-demand fetches of cold
+# symbols by request handlers still find tokens left.
+
+
+def load_held_symbols():
+    """Reloads how many accounts hold each symbol."""
+    pipeline = [
+        {"$project": {"portfolio.symbol": 1}},
+        {"$unwind": "$portfolio"},
+        {"$group": {"_id": {"$toUpper": "$portfolio.symbol"}, "holders": {"$sum": 1}}}
+    ]
+    held = {row["_id"]: row["holders"] for row in mongo.db.users.aggregate(pipeline) if row["_id"]}
+    quotes.hot_symbols.set_held(held)
+    return len(held)
+
+
+def pick_symbols(priorities, budget, refresh_age):
+    """Symbols to refresh this cycle: due ones (missing or older than `refresh_age`), by priority."""
+    due = []
+    for symbol, priority in priorities.items():
+        age = quotes.quote_cache.age(symbol)
+        if age is None or age >= refresh_age:
+            due.append((priority, age if age is not None else float("inf"), symbol))
+    due.sort(reverse=True)
+    return [symbol for _, _, symbol in due[:budget]]
+
+
+def refresh_hot_quotes():
+    """One refresh cycle. Returns the number of quotes refreshed."""
+    budget = int(quotes.finnhub_budget.available() * Config.QUOTE_REFRESH_BUDGET_SHARE)
+    if budget <= 0:
+        return 0
+    # Refresh a little before the TTL so readers keep hitting fresh entries
+    symbols = pick_symbols(quotes.hot_symbols.priorities(), budget, refresh_age=Config.QUOTE_CACHE_TTL * 0.8)
+    if not symbols:
+        return 0
+    # every fetch takes its token from the budget in finnhub_get
+    return quotes.quote_cache.refresh_many(symbols)
+
+
+def start_quote_refresher(app):
+    if not Config.FINNHUB_API_KEY:
+        logger.warning("Finnhub API key is not set. The quote refresher is disabled.")
+        return
+    start_periodic_job(app, "held-symbols", Config.QUOTE_HELD_SYMBOLS_REFRESH_SECONDS, load_held_symbols)
+    start_periodic_job(app, "quote-refresher", Config.QUOTE_REFRESH_INTERVAL, refresh_hot_quotes)
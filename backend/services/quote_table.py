@@ -0,0 +1,121 @@
+import time
+import numpy as np
+from typing import Dict, List, Optional
+from services.cache import SWRCache
+
+# Quote storage for the quote cache. Instead of one Finnhub JSON dict per symbol, symbols
+# are interned to integer slots and every field lives in a preallocated NumPy column, so a
+# cached quote costs 64 bytes of column data (plus its slot in the symbol dict) and the
+# prices of a whole portfolio are gathered with one fancy index.
+#
+# Only the raw fields are stored; `d` and `dp` (change and change %) are derived from
+# `c` and `pc` when a quote is read back as a dict.
+
+QUOTE_FIELDS = ("c", "h", "l", "o", "pc", "t")
+# Share of the table evicted at once (least recently read first) when it is full
+EVICT_FRACTION = 0.1
+
+
+class QuoteTable(SWRCache):
+    """An SWRCache whose entries are stored column-wise; see SWRCache for the caching behaviour."""
+
+    def __init__(self, fetch, ttl, stale_ttl=0, max_size=1024, executor=None):
+        super().__init__(fetch, ttl, stale_ttl=stale_ttl, max_size=max_size, executor=executor)
+        self._entries = None  # unused; storage is the columns below
+        self._slots = {}  # symbol -> slot
+        self._symbols: List[Optional[str]] = [None] * max_size  # slot -> symbol
+        self._free = list(range(max_size - 1, -1, -1))
+        self._columns = {name: np.full(max_size, np.nan) for name in QUOTE_FIELDS}
+        self._fetched_at = np.zeros(max_size)
+        self._last_access = np.zeros(max_size)
+
+    # --- storage internals (callers hold self._lock) ---
+
+    def _read(self, slot) -> Dict:
+        quote = {name: float(self._columns[name][slot]) for name in QUOTE_FIELDS}
+        quote["t"] = int(quote["t"])
+        change = quote["c"] - quote["pc"]
+        quote["d"] = round(change, 4)
+        quote["dp"] = round(change / quote["pc"] * 100, 4) if quote["pc"] else 0.0
+        return quote
+
+    def _get_entry(self, key):
+        slot = self._slots.get(key)
+        if slot is None:
+            return None
+        self._last_access[slot] = time.monotonic()
+        return self._read(slot), float(self._fetched_at[slot])
+
+    def _put_entry(self, key, value, fetched_at):
+        slot = self._slots.get(key)
+        if slot is None:
+            if not self._free:
+                self._evict()
+            slot = self._free.pop()
+            self._slots[key] = slot
+            self._symbols[slot] = key
+        for name in QUOTE_FIELDS:
+            self._columns[name][slot] = value.get(name) or 0.0
+        self._fetched_at[slot] = fetched_at
+        self._last_access[slot] = time.monotonic()
+
+    def _release(self, slot):
+        del self._slots[self._symbols[slot]]
+        self._symbols[slot] = None
+        for column in self._columns.values():
+            column[slot] = np.nan
+        self._free.append(slot)
+
+    def _evict(self):
+        count = max(1, int(self.max_size * EVICT_FRACTION))
+        for slot in np.argpartition(self._last_access, count - 1)[:count]:
+            if self._symbols[slot] is not None:
+                self._release(int(slot))
+
+    # --- public API ---
+
+    def peek(self, key):
+        with self._lock:
+            slot = self._slots.get(key)
+            return self._read(slot) if slot is not None else None
+
+    def age(self, key):
+        with self._lock:
+            slot = self._slots.get(key)
+            return time.monotonic() - self._fetched_at[slot] if slot is not None else None
+
+    def invalidate(self, key):
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is not None:
+                self._release(slot)
+
+    def clear(self):
+        with self._lock:
+            for slot in list(self._slots.values()):
+                self._release(slot)
+
+    def gather(self, keys: List[str], field: str = "c") -> np.ndarray:
+        """
+        Returns `field` for every key as one float array (NaN where nothing is cached),
+        without fetching. Marks the keys as recently used.
+        """
+        with self._lock:
+            slots = np.fromiter((self._slots.get(key, -1) for key in keys), dtype=np.int64, count=len(keys))
+            present = slots >= 0
+            values = np.full(len(keys), np.nan)
+            values[present] = self._columns[field][slots[present]]
+            self._last_access[slots[present]] = time.monotonic()
+            return values
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._slots),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "inflight": len(self._inflight),
+                "column_bytes_per_entry": 8 * (len(QUOTE_FIELDS) + 2),
+            }
@@ -0,0 +1,116 @@
+import logging
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Dict, Iterable, Optional, Sequence
+from config.config import Config
+import numpy as np
+from services import metrics
+from services.quote_table import QuoteTable
+from services.hot_symbols import HotSymbols
+from services.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# One quote cache for the whole process. Every route that needs a live price goes
+# through here, so popular tickers cost one Finnhub call per TTL instead of one per request.
+
+# A single pooled HTTP session and a bounded worker pool shared by all batch lookups,
+# so a portfolio of N symbols costs about one round-trip instead of N. Other Finnhub caches
+# (services.market_data) run their fetches on the same `fetch_pool`.
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=Config.QUOTE_FETCH_WORKERS))
+fetch_pool = ThreadPoolExecutor(max_workers=Config.QUOTE_FETCH_WORKERS, thread_name_prefix="quote-fetch")
+
+# Every Finnhub call of the process takes a token: on-demand quotes, revalidations, the
+# refresher, the /market caches and the symbol list download
+finnhub_budget = TokenBucket(Config.FINNHUB_RATE_BUDGET_PER_MINUTE, capacity=Config.FINNHUB_RATE_BURST)
+
+
+def finnhub_get(path: str, **params):
+    """
+    GETs a Finnhub endpoint and returns the decoded JSON. Returns None if the key is
+    missing, the rate budget is used up or the call fails.
+    """
+    if not Config.FINNHUB_API_KEY:
+        logger.warning("Finnhub API key is not set. Market data is unavailable.")
+        return None
+    if not finnhub_budget.try_take():
+        # Callers serve what they have cached; stale entries are retried on their next read
+        logger.info("Finnhub rate budget used up, skipping %s", path, extra={"sample_rate": 0.1})
+        return None
+    try:
+        with metrics.timed("finnhub", path):
+            response = _session.get(
+                f"{Config.FINNHUB_BASE_URL}{path}",
+                params={**params, "token": Config.FINNHUB_API_KEY},
+                timeout=5
+            )
+            response.raise_for_status()
+            return response.json()
+    except (requests.RequestException, ValueError) as e:
+        logger.warning("Error calling Finnhub %s with %s: %s", path, params, e)
+        return None
+
+
+def fetch_quote_from_finnhub(symbol: str) -> Optional[Dict]:
+    """Fetches a raw quote from Finnhub. Returns None if the key is missing or the call fails."""
+    return finnhub_get("/quote", symbol=symbol)
+
+
+quote_cache = QuoteTable(
+    fetch=fetch_quote_from_finnhub,
+    ttl=Config.QUOTE_CACHE_TTL,
+    stale_ttl=Config.QUOTE_CACHE_STALE_TTL,
+    max_size=Config.QUOTE_CACHE_MAX_SIZE,
+    # stale quotes are revalidated on the same bounded pool as batch misses
+    executor=fetch_pool
+)
+
+# Symbols requested through this module, kept warm by services.quote_refresher
+hot_symbols = HotSymbols(half_life=Config.QUOTE_HOT_HALF_LIFE)
+
+
+def get_quote(symbol: str) -> Optional[Dict]:
+    """Returns the full Finnhub quote for a symbol (c, d, dp, h, l, o, pc, t), or None."""
+    if not symbol:
+        return None
+    hot_symbols.touch([symbol.upper()])
+    return quote_cache.get(symbol.upper())
+
+
+def get_price(symbol: str) -> Optional[float]:
+    """Returns the current price for a symbol, or None if no quote is available."""
+    quote = get_quote(symbol)
+    if quote is None:
+        return None
+    return quote.get("c", 0)  # 'c' is the current price
+
+
+def get_quotes(symbols: Iterable[str]) -> Dict[str, Optional[Dict]]:
+    """
+    Batch version of get_quote. Duplicate symbols are collapsed and every symbol that
+    is not cached is fetched concurrently. Returns {SYMBOL: quote or None}.
+    """
+    unique = [s.upper() for s in dict.fromkeys(symbols) if s]
+    hot_symbols.touch(unique)
+    # Misses are fetched on the pool; the wait counts as the request's Finnhub time
+    with metrics.timed("finnhub"):
+        return quote_cache.get_many(unique)
+
+
+def get_price_array(symbols: Sequence[str]) -> np.ndarray:
+    """
+    Current prices for `symbols` as one float array in the same order (duplicates allowed),
+    NaN where no quote is available. Missing quotes are fetched first, in one batch.
+    """
+    upper = [(s or "").upper() for s in symbols]
+    get_quotes(upper)
+    return quote_cache.gather(upper, "c")
+
+
+def get_prices(symbols: Iterable[str]) -> Dict[str, Optional[float]]:
+    """Batch version of get_price. Returns {SYMBOL: current price or None}."""
+    unique = [s.upper() for s in dict.fromkeys(symbols) if s]
+    prices = get_price_array(unique)
+    return {symbol: (None if np.isnan(price) else float(price)) for symbol, price in zip(unique, prices)}
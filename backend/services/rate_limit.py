@@ -0,0 +1,58 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """Allows `rate_per_minute` calls per minute, with bursts of up to `capacity` calls. Thread-safe."""
+
+    def __init__(self, rate_per_minute, capacity):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def available(self) -> int:
+        with self._lock:
+            self._refill()
+            return int(self.tokens)
+
+    def try_take(self, count=1) -> bool:
+        """Takes `count` tokens if they are available. Returns whether it did."""
+        with self._lock:
+            self._refill()
+            if self.tokens < count:
+                return False
+            self.tokens -= count
+            return True
+
+
+class KeyedRateLimiter:
+    """
+    A TokenBucket per key (e.g. per client IP). Buckets of the least recently seen keys are
+    dropped beyond `max_keys`, which only resets their limit. Thread-safe.
+    """
+
+    def __init__(self, rate_per_minute, capacity, max_keys=10000):
+        self.rate_per_minute = rate_per_minute
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def try_take(self, key, count=1) -> bool:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate_per_minute, self.capacity)
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+        return bucket.try_take(count)
@@ -0,0 +1,107 @@
+import datetime
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Background jobs run on daemon threads inside the API process. Each job gets its own
+# thread and runs inside an application context, so it can use `mongo` like a route does.
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def should_start_jobs(app) -> bool:
+    """
+    Background jobs are skipped in the parent process of the Flask debug reloader,
+    otherwise every job would run twice during local development.
+    """
+    if not app.config.get("ENABLE_BACKGROUND_JOBS", True):
+        return False
+    if app.debug and os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+        return False
+    return True
+
+
+def start_periodic_job(app, name, interval, job, run_immediately=True):
+    """
+    Runs `job()` every `interval` seconds on a daemon thread.
+    A job name can only be started once per process; later calls are ignored.
+    """
+    with _jobs_lock:
+        if name in _jobs:
+            return _jobs[name]
+
+        def loop():
+            if not run_immediately:
+                time.sleep(interval)
+            while True:
+                started = time.monotonic()
+                try:
+                    with app.app_context():
+                        job()
+                except Exception:
+                    logger.exception("Background job '%s' failed", name)
+                time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+        thread = threading.Thread(target=loop, name=f"job-{name}", daemon=True)
+        _jobs[name] = thread
+        thread.start()
+        return thread
+
+
+def seconds_until(hour_utc, now=None) -> float:
+    """Seconds from `now` until the next occurrence of `hour_utc`:00 UTC."""
+    now = now or datetime.datetime.utcnow()
+    target = now.replace(hour=hour_utc, minute=0, second=0, microsecond=0)
+    if target <= now:
+        target += datetime.timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+def start_daily_job(app, name, hour_utc, job):
+    """Runs `job()` once a day at `hour_utc`:00 UTC on a daemon thread."""
+    with _jobs_lock:
+        if name in _jobs:
+            return _jobs[name]
+
+        def loop():
+            while True:
+                time.sleep(seconds_until(hour_utc))
+                try:
+                    with app.app_context():
+                        job()
+                except Exception:
+                    logger.exception("Background job '%s' failed", name)
+
+        thread = threading.Thread(target=loop, name=f"job-{name}", daemon=True)
+        _jobs[name] = thread
+        thread.start()
+        return thread
+
+
+def start_retrying_job(app, name, interval, job):
+    """
+    Runs `job()` once on a daemon thread, retrying every `interval` seconds until it succeeds.
+    For startup work that needs the database, so an unreachable database does not delay startup.
+    """
+    with _jobs_lock:
+        if name in _jobs:
+            return _jobs[name]
+
+        def loop():
+            while True:
+                try:
+                    with app.app_context():
+                        job()
+                    return
+                except Exception:
+                    logger.exception("Background job '%s' failed, retrying in %ss", name, interval)
+                time.sleep(interval)
+
+        thread = threading.Thread(target=loop, name=f"job-{name}", daemon=True)
+        _jobs[name] = thread
+        thread.start()
+        return thread
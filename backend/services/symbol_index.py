@@ -0,0 +1,254 @@
+import bisect
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+from config.config import Config
+from services.quotes import finnhub_get
+from services.scheduler import start_periodic_job
+
+logger = logging.getLogger(__name__)
+
+# In-memory typeahead over the US symbol list, so symbol search never calls Finnhub.
+#
+# The list comes from a JSON file (Finnhub's /stock/symbol?exchange=US format). When the
+# file is missing it is downloaded once and written out, and it is re-downloaded on a
+# schedule. The built index can be saved as a JSON snapshot next to it, so a restart
+# skips most of the build.
+#
+# Lookups combine three structures:
+#   - sorted tickers and sorted full names, searched with bisect for prefix matches
+#   - sorted (word, id) pairs for "word starts with" matches inside company names
+#   - a trigram index over ticker + name for infix and slightly misspelled queries
+
+SNAPSHOT_VERSION = 2
+_NON_ALNUM = re.compile(r"[^A-Z0-9]+")
+# Bounds on how many candidates each structure contributes, so a one-letter query stays fast
+MAX_PREFIX_CANDIDATES = 200
+MAX_TRIGRAM_CANDIDATES = 2000
+
+
+def normalize(text: str) -> str:
+    return _NON_ALNUM.sub(" ", (text or "").upper()).strip()
+
+
+def trigrams(text: str) -> set:
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SymbolIndex:
+    def __init__(self, entries: List[Dict]):
+        # Keep one entry per ticker, in a stable order
+        unique = {}
+        for entry in entries:
+            symbol = (entry.get("symbol") or "").upper()
+            if symbol and symbol not in unique:
+                unique[symbol] = {
+                    "symbol": symbol,
+                    "displaySymbol": entry.get("displaySymbol") or symbol,
+                    "description": entry.get("description") or "",
+                    "type": entry.get("type") or "",
+                }
+        self.entries = list(unique.values())
+        names = [normalize(entry["description"]) for entry in self.entries]
+
+        self._tickers = sorted((entry["symbol"], i) for i, entry in enumerate(self.entries))
+        self._names = sorted((name, i) for i, name in enumerate(names) if name)
+        self._words = sorted({(word, i) for i, name in enumerate(names) for word in name.split()})
+        self._entry_trigrams = []
+        postings = defaultdict(list)
+        for i, entry in enumerate(self.entries):
+            grams = trigrams(entry["symbol"]) | trigrams(names[i])
+            self._entry_trigrams.append(frozenset(grams))
+            for gram in grams:
+                postings[gram].append(i)
+        self._postings = dict(postings)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def to_snapshot(self) -> Dict:
+        """The built structures as plain JSON data; see from_snapshot."""
+        return {
+            "version": SNAPSHOT_VERSION,
+            "entries": self.entries,
+            "tickers": self._tickers,
+            "names": self._names,
+            "words": self._words,
+            "postings": self._postings,
+            # every trigram is 3 characters, so an entry's set is stored as one string
+            "entry_trigrams": ["".join(grams) for grams in self._entry_trigrams],
+        }
+
+    @classmethod
+    def from_snapshot(cls, data: Dict) -> "SymbolIndex":
+        """Rebuilds an index from to_snapshot() data. Raises KeyError, TypeError or ValueError if it is malformed."""
+        if data["version"] != SNAPSHOT_VERSION:
+            raise ValueError("Unsupported snapshot version")
+        index = cls.__new__(cls)
+        index.entries = data["entries"]
+        # JSON turns the (key, id) tuples into lists; bisect needs tuples to compare with
+        index._tickers = list(map(tuple, data["tickers"]))
+        index._names = list(map(tuple, data["names"]))
+        index._words = list(map(tuple, data["words"]))
+        index._postings = data["postings"]
+        index._entry_trigrams = [frozenset(grams[k:k + 3] for k in range(0, len(grams), 3)) for grams in data["entry_trigrams"]]
+        return index
+
+    @staticmethod
+    def _prefix_range(pairs, prefix):
+        start = bisect.bisect_left(pairs, (prefix,))
+        for k in range(start, min(start + MAX_PREFIX_CANDIDATES, len(pairs))):
+            key, i = pairs[k]
+            if not key.startswith(prefix):
+                break
+            yield key, i
+
+    def search(self, query: str, limit: int = 7) -> List[Dict]:
+        """Returns up to `limit` entries ranked by how well they match `query`."""
+        q = normalize(query)
+        if not q:
+            return []
+        scores = {}
+
+        def score(i, value):
+            if value > scores.get(i, 0):
+                scores[i] = value
+
+        compact = q.replace(" ", "")
+        for ticker, i in self._prefix_range(self._tickers, compact):
+            score(i, 1000 if ticker == compact else 800 - 10 * (len(ticker) - len(compact)))
+        for name, i in self._prefix_range(self._names, q):
+            score(i, 600 - min(len(name) - len(q), 100))
+        if compact != q:
+            # "micro soft" should still find MICROSOFT
+            for _, i in self._prefix_range(self._words, compact):
+                score(i, 450)
+        last_word = q.split()[-1]
+        for _, i in self._prefix_range(self._words, last_word):
+            score(i, 400)
+
+        if len(scores) < limit:
+            # Infix / fuzzy matches: candidates come from the rarest query trigrams that
+            # occur at all (a typo makes up trigrams no entry has), scored by the share of
+            # query trigrams they contain.
+            grams = trigrams(q)
+            lists = sorted((self._postings[gram] for gram in grams if gram in self._postings), key=len)
+            candidates = set()
+            for postings in lists[:2]:
+                candidates.update(postings[:MAX_TRIGRAM_CANDIDATES])
+            for i in candidates:
+                overlap = len(grams & self._entry_trigrams[i]) / len(grams)
+                if overlap >= 0.5:
+                    score(i, int(300 * overlap))
+
+        ranked = sorted(scores, key=lambda i: (-scores[i], len(self.entries[i]["symbol"]), self.entries[i]["symbol"]))
+        return [self.entries[i] for i in ranked[:limit]]
+
+
+_index: Optional[SymbolIndex] = None
+# Guards the loader state only, so search() never waits for a build
+_load_lock = threading.Lock()
+# Held while the index is downloaded and built, so two loads do not build at once
+_build_lock = threading.Lock()
+_loader = {"thread": None, "started_at": None}
+# How long to wait before retrying a failed background load
+LOAD_RETRY_SECONDS = 300
+
+
+def get_index() -> Optional[SymbolIndex]:
+    """The loaded index, or None while it is still being built."""
+    return _index
+
+
+def search(query: str, limit: int = 7) -> Optional[List[Dict]]:
+    """Ranked typeahead results, or None if the index is not loaded yet (loading then starts in the background)."""
+    index = _index
+    if index is None:
+        _start_background_load()
+        return None
+    return index.search(query, limit)
+
+
+def _start_background_load():
+    now = time.monotonic()
+    with _load_lock:
+        thread, started_at = _loader["thread"], _loader["started_at"]
+        if thread is not None and (thread.is_alive() or now - started_at < LOAD_RETRY_SECONDS):
+            return
+        thread = threading.Thread(target=load_index, name="symbol-index-load", daemon=True)
+        _loader.update(thread=thread, started_at=now)
+    thread.start()
+
+
+def download_symbol_list(path: str) -> bool:
+    """Downloads the US symbol list from Finnhub and writes it to `path`. Returns False on failure."""
+    data = finnhub_get("/stock/symbol", exchange="US")
+    if not data:
+        return False
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+    return True
+
+
+def _load_snapshot(path, list_mtime):
+    try:
+        if os.path.getmtime(path) < list_mtime:
+            return None
+        with open(path) as f:
+            return SymbolIndex.from_snapshot(json.load(f))
+    except (OSError, KeyError, TypeError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _save_snapshot(path, index):
+    try:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index.to_snapshot(), f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning("Could not write the symbol index snapshot: %s", e)
+
+
+def load_index(force_download=False) -> int:
+    """
+    Loads (or reloads) the index from the snapshot or the symbol list file, downloading
+    the list first if it is missing or `force_download` is set. Returns the number of symbols.
+    """
+    global _index
+    list_path = Config.SYMBOL_LIST_PATH
+    snapshot_path = Config.SYMBOL_INDEX_SNAPSHOT_PATH
+    with _build_lock:
+        if force_download or not os.path.exists(list_path):
+            if not download_symbol_list(list_path) and not os.path.exists(list_path):
+                logger.warning("Symbol list is unavailable; symbol search falls back to Finnhub.")
+                return 0
+
+        index = _load_snapshot(snapshot_path, os.path.getmtime(list_path)) if snapshot_path else None
+        if index is None:
+            with open(list_path) as f:
+                index = SymbolIndex(json.load(f))
+            if snapshot_path:
+                _save_snapshot(snapshot_path, index)
+        _index = index  # swapped in one assignment, readers never see a half-built index
+        return len(index)
+
+
+def refresh_index():
+    """Periodic job: downloads a fresh symbol list and rebuilds the index."""
+    load_index(force_download=True)
+
+
+def start_symbol_index_refresher(app):
+    # Build (or load the snapshot) in the background right away; the job only refreshes
+    _start_background_load()
+    start_periodic_job(app, "symbol-index", Config.SYMBOL_LIST_REFRESH_SECONDS, refresh_index, run_immediately=False)
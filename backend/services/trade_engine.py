@@ -0,0 +1,345 @@
+import datetime
+import random
+import time
+from dataclasses import dataclass
+from typing import List
+from bson import ObjectId
+from pymongo import ReturnDocument
+from config.config import Config
+from config.extensions import mongo
+from models.transaction import Transaction
+from services import account_stats
+
+# Buys and sells as conditional single-document updates on the user, instead of
+# read-modify-write of the whole balance and portfolio:
+#   - the balance is only debited if it still covers the cost ({balance: {$gte: cost}})
+#   - a holding is changed in place with positional $inc ("portfolio.$.quantity"), guarded by
+#     an $elemMatch on the values the new avg_price was computed from (holdings stored before
+#     total_cost existed are matched on its absence and get it $set from avg_price)
+#   - new holdings are $push-ed (only if the symbol is not held yet), closed ones $pull-ed
+# If the guard fails because another trade changed the account in between, the trade is
+# re-read and retried. Every change bumps `portfolio_version`, which caches key on.
+#
+# A batch of orders is validated against one read of the account and written as a single
+# update guarded by that `portfolio_version`, so it is applied entirely or not at all.
+
+MAX_ATTEMPTS = 5
+# Balances are compared at cent precision, like the rounded comparison used before
+BALANCE_TOLERANCE = 0.005
+# Holdings below this quantity are considered closed (float inaccuracies)
+DUST_QUANTITY = 1e-6
+
+VERSION_BUMP = {"$inc": {"portfolio_version": 1}}
+
+
+class TradeError(Exception):
+    """A trade that cannot be executed; `status` is the HTTP status the routes answer with."""
+    status = 400
+
+
+class UserNotFound(TradeError):
+    status = 404
+
+
+class InsufficientFunds(TradeError):
+    pass
+
+
+class InsufficientQuantity(TradeError):
+    pass
+
+
+class TradeConflict(TradeError):
+    status = 409
+
+
+@dataclass
+class TradeResult:
+    new_balance: float
+    transaction: Transaction
+
+
+@dataclass
+class Order:
+    type: str  # 'buy' or 'sell'
+    symbol: str
+    quantity: float
+    price: float
+    commission: float = 0.0
+
+
+@dataclass
+class BatchResult:
+    new_balance: float
+    transactions: List[Transaction]
+
+
+def _load_holding(user_id, symbol):
+    """Returns the user's balance and their holding of `symbol` (or None)."""
+    user_data = mongo.db.users.find_one(
+        {"_id": ObjectId(user_id)},
+        {"balance": 1, "portfolio": {"$elemMatch": {"symbol": symbol}}}
+    )
+    if not user_data:
+        raise UserNotFound("User not found")
+    holdings = user_data.get("portfolio") or []
+    return user_data.get("balance", 0), (holdings[0] if holdings else None)
+
+
+def _backoff(attempt):
+    time.sleep(random.uniform(0, 0.005 * (2 ** attempt)))
+
+
+def _apply(query, update, session=None):
+    """Runs one guarded update and returns the new balance, or None if the guard failed."""
+    updated = mongo.db.users.find_one_and_update(
+        query, update, projection={"balance": 1}, return_document=ReturnDocument.AFTER, session=session
+    )
+    return updated.get("balance", 0) if updated else None
+
+
+def holding_total_cost(holding):
+    """A holding's cost basis; holdings stored before total_cost existed only have avg_price."""
+    if "total_cost" in holding:
+        return holding["total_cost"]
+    return holding.get("avg_price", 0) * holding["quantity"]
+
+
+def _cost_guard(holding):
+    """Matches the holding's stored total_cost, or its absence for holdings that predate it."""
+    return holding["total_cost"] if "total_cost" in holding else {"$exists": False}
+
+
+def buy_plan(user_id, symbol, quantity, price, commission, date, holding):
+    """The guarded (query, update) that applies a buy to the account state it was read from."""
+    total_cost = round(price * quantity + commission, 2)
+    transaction_cost = price * quantity
+    query = {"_id": ObjectId(user_id), "balance": {"$gte": total_cost - BALANCE_TOLERANCE}, **account_stats.STATS_COMPLETE}
+    stats_update = account_stats.buy_update(commission, date)
+
+    if holding:
+        new_quantity = holding["quantity"] + quantity
+        new_total_cost = holding_total_cost(holding) + transaction_cost
+        # The cost basis is $set from the values read, so it must still be those values
+        query["portfolio"] = {"$elemMatch": {
+            "symbol": symbol,
+            "quantity": holding["quantity"],
+            "total_cost": _cost_guard(holding)
+        }}
+        update = account_stats.merge_updates(
+            {
+                "$inc": {"balance": -total_cost, "portfolio.$.quantity": quantity},
+                "$set": {"portfolio.$.total_cost": new_total_cost, "portfolio.$.avg_price": new_total_cost / new_quantity}
+            },
+            stats_update, VERSION_BUMP
+        )
+    else:
+        query["portfolio.symbol"] = {"$ne": symbol}
+        update = account_stats.merge_updates(
+            {
+                "$inc": {"balance": -total_cost},
+                "$push": {"portfolio": {"symbol": symbol, "quantity": quantity, "total_cost": transaction_cost, "avg_price": price}}
+            },
+            stats_update, VERSION_BUMP
+        )
+    return query, update
+
+
+def sell_plan(user_id, symbol, quantity, price, commission, date, holding):
+    """The guarded (query, update) that applies a sell to the holding it was read from."""
+    avg_price = holding["avg_price"]
+    revenue = price * quantity - commission
+    stats_update = account_stats.sell_update(price, quantity, avg_price, commission, date)
+    query = {"_id": ObjectId(user_id), **account_stats.STATS_COMPLETE}
+
+    if holding["quantity"] - quantity < DUST_QUANTITY:
+        # Closing the position: only if nothing was bought or sold in between
+        query["portfolio"] = {"$elemMatch": {"symbol": symbol, "quantity": holding["quantity"], "avg_price": avg_price}}
+        update = account_stats.merge_updates(
+            {"$inc": {"balance": revenue}, "$pull": {"portfolio": {"symbol": symbol}}},
+            stats_update, VERSION_BUMP
+        )
+    elif "total_cost" in holding:
+        # Concurrent sells do not conflict as long as shares are left over and avg_price is unchanged;
+        # a sell that would empty the holding conflicts and is retried as a closing sell, which $pulls it
+        query["portfolio"] = {"$elemMatch": {"symbol": symbol, "quantity": {"$gte": quantity + DUST_QUANTITY}, "avg_price": avg_price}}
+        update = account_stats.merge_updates(
+            {"$inc": {"balance": revenue, "portfolio.$.quantity": -quantity, "portfolio.$.total_cost": -(avg_price * quantity)}},
+            stats_update, VERSION_BUMP
+        )
+    else:
+        # A holding without total_cost gets it $set from the quantity read, so that must not change
+        query["portfolio"] = {"$elemMatch": {
+            "symbol": symbol, "quantity": holding["quantity"], "avg_price": avg_price, "total_cost": {"$exists": False}
+        }}
+        update = account_stats.merge_updates(
+            {
+                "$inc": {"balance": revenue, "portfolio.$.quantity": -quantity},
+                "$set": {"portfolio.$.total_cost": avg_price * (holding["quantity"] - quantity)}
+            },
+            stats_update, VERSION_BUMP
+        )
+    return query, update
+
+
+def execute_buy(user_id, symbol, quantity, price, commission=0.0) -> TradeResult:
+    """Buys `quantity` shares and records the transaction. Raises a TradeError if it cannot be executed."""
+    date = datetime.datetime.utcnow()
+    total_cost = round(price * quantity + commission, 2)
+    for attempt in range(MAX_ATTEMPTS):
+        account_stats.ensure_stats(mongo.db, user_id)
+        balance, holding = _load_holding(user_id, symbol)
+        if round(balance, 2) < total_cost:
+            raise InsufficientFunds("Insufficient funds")
+        new_balance = _apply(*buy_plan(user_id, symbol, quantity, price, commission, date, holding))
+        if new_balance is not None:
+            transaction = Transaction(
+                user_id=user_id, type="buy", symbol=symbol, quantity=quantity,
+                price=price, commission=commission, date=date
+            ).save()
+            return TradeResult(new_balance=new_balance, transaction=transaction)
+        _backoff(attempt)
+    raise TradeConflict("The account changed during the trade, please try again")
+
+
+def execute_sell(user_id, symbol, quantity, price, commission=0.0) -> TradeResult:
+    """Sells `quantity` shares and records the transaction. Raises a TradeError if it cannot be executed."""
+    date = datetime.datetime.utcnow()
+    for attempt in range(MAX_ATTEMPTS):
+        account_stats.ensure_stats(mongo.db, user_id)
+        _, holding = _load_holding(user_id, symbol)
+        if not holding or holding["quantity"] < quantity:
+            raise InsufficientQuantity("Insufficient stock quantity to sell")
+        new_balance = _apply(*sell_plan(user_id, symbol, quantity, price, commission, date, holding))
+        if new_balance is not None:
+            transaction = Transaction(
+                user_id=user_id, type="sell", symbol=symbol, quantity=quantity,
+                price=price, commission=commission, date=date
+            ).save()
+            return TradeResult(new_balance=new_balance, transaction=transaction)
+        _backoff(attempt)
+    raise TradeConflict("The account changed during the trade, please try again")
+
+
+def execute_deposit(user_id, amount) -> TradeResult:
+    """
+    Credits `amount` to the balance and records the deposit. The $inc of the running totals
+    only applies once they are complete, so a legacy account whose initialisation lost a
+    race with another write is retried like a trade.
+    """
+    for attempt in range(MAX_ATTEMPTS):
+        account_stats.ensure_stats(mongo.db, user_id)
+        new_balance = _apply(
+            {"_id": ObjectId(user_id), **account_stats.STATS_COMPLETE},
+            account_stats.merge_updates({"$inc": {"balance": amount}}, account_stats.deposit_update(amount), VERSION_BUMP)
+        )
+        if new_balance is not None:
+            transaction = Transaction(user_id=user_id, type="deposit", amount=amount, description="User deposit").save()
+            return TradeResult(new_balance=new_balance, transaction=transaction)
+        if mongo.db.users.count_documents({"_id": ObjectId(user_id)}, limit=1) == 0:
+            raise UserNotFound("User not found")
+        _backoff(attempt)
+    raise TradeConflict("The account changed during the deposit, please try again")
+
+
+def plan_batch(user_data, orders, date):
+    """
+    Applies `orders` in sequence to an in-memory copy of the account. Returns the balance
+    change, the resulting portfolio and the combined stats update, or raises a TradeError
+    naming the first order that cannot be executed.
+    """
+    balance = user_data.get("balance", 0)
+    holdings = {holding["symbol"]: dict(holding) for holding in user_data.get("portfolio", [])}
+    stats_updates = []
+
+    for number, order in enumerate(orders, start=1):
+        holding = holdings.get(order.symbol)
+        if order.type == "buy":
+            total_cost = round(order.price * order.quantity + order.commission, 2)
+            if round(balance, 2) < total_cost:
+                raise InsufficientFunds(f"Order {number} ({order.symbol}): Insufficient funds")
+            balance -= total_cost
+            if holding is None:
+                holding = holdings[order.symbol] = {"symbol": order.symbol, "quantity": 0.0, "total_cost": 0.0}
+            holding["total_cost"] = holding_total_cost(holding) + order.price * order.quantity
+            holding["quantity"] += order.quantity
+            holding["avg_price"] = holding["total_cost"] / holding["quantity"]
+            stats_updates.append(account_stats.buy_update(order.commission, date))
+        else:
+            if not holding or holding["quantity"] < order.quantity:
+                raise InsufficientQuantity(f"Order {number} ({order.symbol}): Insufficient stock quantity to sell")
+            avg_price = holding["avg_price"]
+            balance += order.price * order.quantity - order.commission
+            holding["total_cost"] = holding_total_cost(holding) - avg_price * order.quantity
+            holding["quantity"] -= order.quantity
+            if holding["quantity"] < DUST_QUANTITY:
+                del holdings[order.symbol]
+            stats_updates.append(account_stats.sell_update(order.price, order.quantity, avg_price, order.commission, date))
+
+    return balance - user_data.get("balance", 0), list(holdings.values()), account_stats.sum_updates(*stats_updates)
+
+
+def commit_account_update(query, update, documents):
+    """
+    Writes a guarded account update and inserts its transactions. Returns (new_balance, inserted_ids),
+    or None if the guard failed. With TRADE_BATCH_USE_TRANSACTIONS both writes run in one
+    multi-document transaction (requires a replica set); otherwise the account is updated
+    first and the history inserted afterwards, like single trades.
+    """
+    if not Config.TRADE_BATCH_USE_TRANSACTIONS:
+        new_balance = _apply(query, update)
+        if new_balance is None:
+            return None
+        return new_balance, mongo.db.transactions.insert_many(documents).inserted_ids
+
+    def run(session):
+        new_balance = _apply(query, update, session=session)
+        if new_balance is None:
+            return None
+        return new_balance, mongo.db.transactions.insert_many(documents, session=session).inserted_ids
+
+    with mongo.cx.start_session() as session:
+        return session.with_transaction(run)
+
+
+def execute_batch(user_id, orders: List[Order]) -> BatchResult:
+    """
+    Executes all `orders` in the given sequence with one account write, or none of them.
+    Raises a TradeError if any order cannot be executed.
+    """
+    date = datetime.datetime.utcnow()
+    for attempt in range(MAX_ATTEMPTS):
+        account_stats.ensure_stats(mongo.db, user_id)
+        user_data = mongo.db.users.find_one(
+            {"_id": ObjectId(user_id)}, {"balance": 1, "portfolio": 1, "portfolio_version": 1}
+        )
+        if not user_data:
+            raise UserNotFound("User not found")
+        balance_change, portfolio, stats_update = plan_batch(user_data, orders, date)
+
+        version = user_data.get("portfolio_version", 0)
+        query = {
+            "_id": ObjectId(user_id),
+            "portfolio_version": account_stats.version_match(version),
+            "balance": {"$gte": -balance_change - BALANCE_TOLERANCE},
+            **account_stats.STATS_COMPLETE
+        }
+        update = account_stats.merge_updates(
+            {"$inc": {"balance": balance_change}, "$set": {"portfolio": portfolio}},
+            stats_update, VERSION_BUMP
+        )
+        transactions = [
+            Transaction(
+                user_id=user_id, type=order.type, symbol=order.symbol, quantity=order.quantity,
+                price=order.price, commission=order.commission, date=date
+            )
+            for order in orders
+        ]
+        committed = commit_account_update(query, update, [t.to_dict() for t in transactions])
+        if committed is not None:
+            new_balance, inserted_ids = committed
+            for transaction, inserted_id in zip(transactions, inserted_ids):
+                transaction.id = str(inserted_id)
+            return BatchResult(new_balance=new_balance, transactions=transactions)
+        _backoff(attempt)
+    raise TradeConflict("The account changed during the trade, please try again")
@@ -0,0 +1,200 @@
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional, Union
+import numpy as np
+
+# The one place portfolio valuation happens. Routes, the leaderboard and the AI context
+# all call into here, so rounding and missing-quote handling are the same everywhere:
+#   - a holding without a usable live price (missing, or not positive) is valued at its avg_price
+#   - per-holding values are rounded to cents before they are summed
+#   - an account without contributions reports 0 P/L and 0%
+#   - realized P/L is the running total kept in the account's stats (services.account_stats);
+#     accounts without one fall back to overall P/L minus unrealized P/L
+# Holdings are valued as NumPy arrays over quantity, cost and price, and many accounts
+# can be valued in one pass with value_portfolios().
+
+
+@dataclass
+class HoldingValuation:
+    symbol: str
+    quantity: float
+    avg_price: float
+    current_price: float
+    total_invested: float
+    current_value: float
+    unrealized_pl: float
+    has_live_price: bool
+
+
+@dataclass
+class PortfolioValuation:
+    balance: float
+    invested_amount: float
+    total_portfolio_value: float
+    total_equity: float
+    net_contributions: float
+    total_commissions: float
+    unrealized_pl: float
+    realized_pl: float
+    overall_pl: float
+    overall_pl_percentage: float
+    holdings: List[HoldingValuation] = field(default_factory=list)
+
+    def summary(self) -> Dict:
+        """The account-level figures, without the per-holding breakdown."""
+        data = asdict(self)
+        data.pop("holdings")
+        return data
+
+    def enhanced_portfolio(self, portfolio: List[Dict]) -> List[Dict]:
+        """Returns the stored holdings merged with their live valuation, in the same order."""
+        return [
+            {
+                **stock,
+                "current_price": holding.current_price,
+                "total_invested": holding.total_invested,
+                "current_value": holding.current_value,
+                "unrealized_pl": holding.unrealized_pl,
+            }
+            for stock, holding in zip(portfolio, self.holdings)
+        ]
+
+
+def _holding_arrays(portfolio: List[Dict], prices: Union[Dict[str, Optional[float]], np.ndarray]):
+    n = len(portfolio)
+    quantity = np.fromiter((stock.get("quantity", 0) for stock in portfolio), dtype=np.float64, count=n)
+    cost = np.fromiter((stock.get("total_cost", 0) for stock in portfolio), dtype=np.float64, count=n)
+    avg_price = np.fromiter((stock.get("avg_price", 0) for stock in portfolio), dtype=np.float64, count=n)
+    if isinstance(prices, np.ndarray):
+        live = prices  # already aligned with the holdings
+    else:
+        live = np.fromiter(
+            (prices.get((stock.get("symbol") or "").upper()) or np.nan for stock in portfolio),
+            dtype=np.float64, count=n
+        )
+    return quantity, cost, avg_price, live
+
+
+def _price_and_value(quantity, cost, avg_price, live):
+    has_live = live > 0  # NaN compares False
+    price = np.where(has_live, live, avg_price)
+    current_value = np.round(quantity * price, 2)
+    invested = np.round(cost, 2)
+    unrealized = np.round(current_value - invested, 2)
+    return price, has_live, current_value, invested, unrealized
+
+
+def _stored_realized_pl(aggregates_list) -> np.ndarray:
+    """The stored realized P/L of each account, NaN where it has none."""
+    return np.fromiter(
+        (np.nan if aggregates.get("realized_pl") is None else aggregates["realized_pl"] for aggregates in aggregates_list),
+        dtype=np.float64, count=len(aggregates_list)
+    )
+
+
+def _account_totals(balance, invested, portfolio_value, unrealized, net_contributions, total_commissions, stored_realized_pl=None):
+    """
+    Vectorized account-level P/L. Every argument is an array with one entry per account;
+    `stored_realized_pl` uses NaN for accounts without a running total.
+    """
+    total_equity = balance + portfolio_value
+    has_contributions = net_contributions > 0
+    overall_pl = np.where(has_contributions, np.round(total_equity - net_contributions, 2), 0.0)
+    safe_contributions = np.where(has_contributions, net_contributions, 1.0)
+    overall_pl_percentage = np.where(has_contributions, np.round(overall_pl / safe_contributions * 100, 2), 0.0)
+    realized_pl = np.round(overall_pl - unrealized, 2)
+    if stored_realized_pl is not None:
+        realized_pl = np.where(np.isnan(stored_realized_pl), realized_pl, np.round(stored_realized_pl, 2))
+    return {
+        "balance": np.round(balance, 2),
+        "invested_amount": np.round(invested, 2),
+        "total_portfolio_value": np.round(portfolio_value, 2),
+        "total_equity": np.round(total_equity, 2),
+        "net_contributions": np.round(net_contributions, 2),
+        "total_commissions": np.round(total_commissions, 2),
+        "unrealized_pl": np.round(unrealized, 2),
+        "realized_pl": realized_pl,
+        "overall_pl": overall_pl,
+        "overall_pl_percentage": overall_pl_percentage,
+    }
+
+
+def value_columns(quantity, cost, avg_price, live_price, owner, balance, net_contributions, total_commissions, realized_pl=None) -> Dict[str, np.ndarray]:
+    """
+    Columnar valuation of many accounts at once.
+    The first four arrays have one entry per holding and `owner` maps each holding to
+    its account index; the rest have one entry per account. `live_price` uses NaN
+    for symbols without a quote, `realized_pl` for accounts without a stored total.
+    Returns {field: array with one entry per account}.
+    """
+    n = len(balance)
+    _, _, current_value, invested, unrealized = _price_and_value(quantity, cost, avg_price, live_price)
+    return _account_totals(
+        balance,
+        np.bincount(owner, weights=invested, minlength=n),
+        np.bincount(owner, weights=current_value, minlength=n),
+        np.bincount(owner, weights=unrealized, minlength=n),
+        net_contributions,
+        total_commissions,
+        realized_pl,
+    )
+
+
+def value_portfolio(portfolio: List[Dict], prices: Union[Dict[str, Optional[float]], np.ndarray], balance: float = 0.0, aggregates: Optional[Dict] = None) -> PortfolioValuation:
+    """
+    Values one account.
+    `prices` maps upper-case symbols to live prices (services.quotes.get_prices), or is an
+    array of prices aligned with `portfolio` (services.quotes.get_price_array);
+    `aggregates` holds the account's running totals (net_contributions, total_commissions, realized_pl).
+    """
+    aggregates = aggregates or {}
+    quantity, cost, avg_price, live = _holding_arrays(portfolio, prices)
+    price, has_live, current_value, invested, unrealized = _price_and_value(quantity, cost, avg_price, live)
+
+    totals = _account_totals(
+        np.array([balance], dtype=np.float64),
+        np.array([invested.sum()]),
+        np.array([current_value.sum()]),
+        np.array([unrealized.sum()]),
+        np.array([aggregates.get("net_contributions", 0) or 0], dtype=np.float64),
+        np.array([aggregates.get("total_commissions", 0) or 0], dtype=np.float64),
+        _stored_realized_pl([aggregates]),
+    )
+
+    holdings = [
+        HoldingValuation(
+            symbol=stock.get("symbol"),
+            quantity=float(quantity[i]),
+            avg_price=float(avg_price[i]),
+            current_price=float(price[i]),
+            total_invested=float(invested[i]),
+            current_value=float(current_value[i]),
+            unrealized_pl=float(unrealized[i]),
+            has_live_price=bool(has_live[i]),
+        )
+        for i, stock in enumerate(portfolio)
+    ]
+    return PortfolioValuation(**{key: float(values[0]) for key, values in totals.items()}, holdings=holdings)
+
+
+def value_portfolios(accounts: List[Dict], prices: Dict[str, Optional[float]]) -> List[PortfolioValuation]:
+    """
+    Values many accounts in a single vectorized pass (no per-holding breakdown).
+    Each account is a dict with `portfolio`, `balance` and optionally `stats`.
+    """
+    counts = np.fromiter((len(account.get("portfolio") or []) for account in accounts), dtype=np.int64, count=len(accounts))
+    holdings = [stock for account in accounts for stock in (account.get("portfolio") or [])]
+    owner = np.repeat(np.arange(len(accounts)), counts)
+
+    quantity, cost, avg_price, live = _holding_arrays(holdings, prices)
+
+    n = len(accounts)
+    stats = [account.get("stats") or {} for account in accounts]
+    totals = value_columns(
+        quantity, cost, avg_price, live, owner,
+        np.fromiter((account.get("balance", 0) or 0 for account in accounts), dtype=np.float64, count=n),
+        np.fromiter((s.get("net_contributions", 0) or 0 for s in stats), dtype=np.float64, count=n),
+        np.fromiter((s.get("total_commissions", 0) or 0 for s in stats), dtype=np.float64, count=n),
+        _stored_realized_pl(stats),
+    )
+    columns = {key: values.tolist() for key, values in totals.items()}
+    return [PortfolioValuation(**{key: columns[key][i] for key in columns}) for i in range(n)]
@@ -0,0 +1,138 @@
+import os
+import sys
+
+# The app reads its configuration at import time
+os.environ.update(
+    MONGO_URI="mongodb://localhost:27017/smartinvest_test",
+    SECRET_KEY="test-secret-key-of-at-least-32-bytes",
+    ENABLE_BACKGROUND_JOBS="false",
+    AI_FAKE_MODEL_ENABLED="true",
+    AI_FAKE_MODEL_CHUNK_DELAY="0",
+)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mongomock
+import flask_pymongo
+import pytest
+from flask_jwt_extended import create_access_token
+from pymongo import ReturnDocument, operations
+
+# Tests run against mongomock instead of a MongoDB server
+flask_pymongo.MongoClient = mongomock.MongoClient
+
+
+# mongomock's bulk_write does not accept the operation objects of this pymongo version;
+# apply them one by one
+class _BulkWriteResult:
+    def __init__(self):
+        self.matched_count = 0
+        self.modified_count = 0
+
+
+def _bulk_write(self, requests, ordered=True, **kwargs):
+    result = _BulkWriteResult()
+    for op in requests:
+        if isinstance(op, operations.ReplaceOne):
+            self.replace_one(op._filter, op._doc, upsert=op._upsert)
+        elif isinstance(op, operations.UpdateOne):
+            updated = self.update_one(op._filter, op._doc, upsert=op._upsert, array_filters=op._array_filters)
+            result.matched_count += updated.matched_count
+            result.modified_count += updated.modified_count
+        elif isinstance(op, operations.UpdateMany):
+            self.update_many(op._filter, op._doc, upsert=op._upsert)
+        elif isinstance(op, operations.InsertOne):
+            self.insert_one(op._doc)
+        elif isinstance(op, operations.DeleteOne):
+            self.delete_one(op._filter)
+        elif isinstance(op, operations.DeleteMany):
+            self.delete_many(op._filter)
+    return result
+
+
+# mongomock's find_one_and_update applies a positional "$" update to the wrong array
+# element; update_one gets it right
+def _find_one_and_update(self, filter, update, projection=None, return_document=ReturnDocument.BEFORE, **kwargs):
+    before = self.find_one(filter)
+    if before is None:
+        return None
+    self.update_one(filter, update)
+    return self.find_one({"_id": before["_id"]}, projection) if return_document == ReturnDocument.AFTER else before
+
+
+mongomock.collection.Collection.bulk_write = _bulk_write
+mongomock.collection.Collection.find_one_and_update = _find_one_and_update
+
+import app as app_module
+from config.extensions import mongo
+from routes import market_routes
+from services import ai_context, ai_response_cache, quotes, scheduler
+from services.rate_limit import KeyedRateLimiter
+
+
+@pytest.fixture(scope="session")
+def app():
+    app = app_module.create_app()
+    app.config["TESTING"] = True
+    # Indexes are created in the background; the unique email index matters to the tests
+    scheduler._jobs["ensure-indexes"].join()
+    return app
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    # Every test client comes from 127.0.0.1; give each test a fresh /market rate budget
+    monkeypatch.setattr(market_routes, "client_limiter", KeyedRateLimiter(
+        market_routes.Config.MARKET_RATE_LIMIT_PER_MINUTE, market_routes.Config.MARKET_RATE_LIMIT_BURST
+    ))
+    return app.test_client()
+
+
+@pytest.fixture
+def db(app):
+    with app.app_context():
+        yield mongo.db
+        for name in mongo.db.list_collection_names():
+            mongo.db[name].delete_many({})
+    ai_response_cache.answer_cache.clear()
+    ai_context.context_cache.clear()
+
+
+@pytest.fixture
+def prices(monkeypatch):
+    """Quotes served by the quote cache, {symbol: price}; unknown symbols have no quote."""
+    prices = {}
+
+    def fetch(symbol):
+        price = prices.get(symbol)
+        return {"c": price, "pc": price} if price is not None else None
+
+    monkeypatch.setattr(quotes.quote_cache, "_fetch", fetch)
+    quotes.quote_cache.clear()
+    yield prices
+    quotes.quote_cache.clear()
+
+
+@pytest.fixture
+def make_user(db):
+    """Inserts a user and returns its id as a string."""
+    count = [0]
+
+    def make_user(**fields):
+        count[0] += 1
+        document = {
+            "name": f"user{count[0]}", "email": f"user{count[0]}@example.com",
+            "balance": 0.0, "portfolio": [], "portfolio_version": 1,
+        }
+        document.update(fields)
+        return str(db.users.insert_one(document).inserted_id)
+
+    return make_user
+
+
+@pytest.fixture
+def auth(app):
+    """Returns the Authorization header of a user id."""
+    def auth(user_id):
+        with app.app_context():
+            return {"Authorization": f"Bearer {create_access_token(identity=user_id)}"}
+    return auth
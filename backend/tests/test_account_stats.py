@@ -0,0 +1,155 @@
+import datetime
+import mongomock
+import pytest
+from bson import ObjectId
+from scripts import reconcile_account_stats
+from services import account_stats, trade_engine
+from services.valuation import value_portfolio, value_portfolios
+
+DATE = datetime.datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(trade_engine, "_backoff", lambda attempt: None)
+
+
+@pytest.fixture
+def legacy(db, make_user):
+    """An account from before running totals: $600 deposited, 2 AAPL bought at $50 with $1 commission."""
+    user_id = make_user(balance=499.0, portfolio=[{"symbol": "AAPL", "quantity": 2.0, "total_cost": 100.0, "avg_price": 50.0}])
+    db.transactions.insert_many([
+        {"user_id": ObjectId(user_id), "type": "deposit", "amount": 600.0, "date": DATE},
+        {"user_id": ObjectId(user_id), "type": "buy", "symbol": "AAPL", "quantity": 2.0, "price": 50.0, "commission": 1.0, "date": DATE},
+    ])
+    return user_id
+
+
+def stats(db, user_id):
+    return db.users.find_one({"_id": ObjectId(user_id)}).get("stats")
+
+
+def change_account_once(monkeypatch):
+    """Makes the next ensure_stats lose its race: another write moves portfolio_version while it sums the history."""
+    original = account_stats.compute_stats_from_history
+    calls = []
+
+    def compute_then_write(database, user_data):
+        calls.append(user_data["_id"])
+        if len(calls) == 1:
+            database.users.update_one({"_id": user_data["_id"]}, {"$inc": {"portfolio_version": 1}})
+        return original(database, user_data)
+
+    monkeypatch.setattr(account_stats, "compute_stats_from_history", compute_then_write)
+    return calls
+
+
+def test_ensure_stats_does_not_overwrite_a_concurrent_change(db, legacy, monkeypatch):
+    change_account_once(monkeypatch)
+    assert account_stats.ensure_stats(db, legacy) is False
+    assert stats(db, legacy) is None
+
+
+def test_ensure_stats_initialises_a_legacy_account_once(db, legacy):
+    assert account_stats.ensure_stats(db, legacy) is True
+    assert stats(db, legacy) == {
+        "net_contributions": 600.0, "total_commissions": 1.0, "realized_pl": -1.0, "trade_count": 1, "last_trade_at": DATE
+    }
+    assert account_stats.ensure_stats(db, legacy) is False
+
+
+def test_ensure_stats_completes_partial_totals(db, legacy):
+    db.users.update_one({"_id": ObjectId(legacy)}, {"$set": {"stats": {"net_contributions": 600.0}}})
+    assert account_stats.ensure_stats(db, legacy) is True
+    assert stats(db, legacy)["trade_count"] == 1
+
+
+def test_deposit_updates_the_running_totals(client, auth, db, legacy):
+    response = client.post("/transaction/deposit", headers=auth(legacy), json={"amount": 100})
+    assert response.get_json()["new_balance"] == pytest.approx(599.0)
+    assert stats(db, legacy)["net_contributions"] == pytest.approx(700.0)
+    assert db.transactions.count_documents({"type": "deposit"}) == 2
+
+
+def test_deposit_is_retried_when_the_initialisation_loses_a_race(client, auth, db, legacy, monkeypatch, no_backoff):
+    calls = change_account_once(monkeypatch)
+    response = client.post("/transaction/deposit", headers=auth(legacy), json={"amount": 100})
+    assert response.status_code == 200
+    assert len(calls) == 2
+    assert stats(db, legacy)["net_contributions"] == pytest.approx(700.0)
+
+
+def test_deposit_gives_up_with_a_conflict(client, auth, db, legacy, monkeypatch, no_backoff):
+    monkeypatch.setattr(account_stats, "ensure_stats", lambda database, uid: False)
+    response = client.post("/transaction/deposit", headers=auth(legacy), json={"amount": 100})
+    assert response.status_code == 409
+    assert db.transactions.count_documents({"type": "deposit"}) == 1
+
+
+def test_deposit_to_a_deleted_account_is_not_found(client, auth, db):
+    response = client.post("/transaction/deposit", headers=auth(str(ObjectId())), json={"amount": 100})
+    assert response.status_code == 404
+
+
+def test_valuation_reports_the_stored_realized_pl():
+    aggregates = {"net_contributions": 600.0, "total_commissions": 1.0, "realized_pl": -12.346, "trade_count": 2}
+    portfolio = [{"symbol": "AAPL", "quantity": 2.0, "total_cost": 100.0, "avg_price": 50.0}]
+    assert value_portfolio(portfolio, {"AAPL": 60.0}, 499.0, aggregates).realized_pl == -12.35
+    accounts = [
+        {"portfolio": portfolio, "balance": 499.0, "stats": aggregates},
+        {"portfolio": portfolio, "balance": 499.0, "stats": {"net_contributions": 600.0}},
+    ]
+    assert [v.realized_pl for v in value_portfolios(accounts, {"AAPL": 60.0})] == [-12.35, -1.0]
+
+
+def test_valuation_without_stored_realized_pl_falls_back_to_overall_minus_unrealized():
+    portfolio = [{"symbol": "AAPL", "quantity": 2.0, "total_cost": 100.0, "avg_price": 50.0}]
+    valuation = value_portfolio(portfolio, {"AAPL": 60.0}, 499.0, {"net_contributions": 600.0})
+    assert valuation.realized_pl == round(valuation.overall_pl - valuation.unrealized_pl, 2) == -1.0
+
+
+class FakeClient:
+    """Stands in for MongoClient in the reconcile script, over the test database."""
+
+    def __init__(self, db):
+        self.db = db
+        self.admin = mongomock.MongoClient().admin
+
+    def get_database(self):
+        return self.db
+
+    def close(self):
+        pass
+
+
+def reconcile(monkeypatch, db, fix):
+    monkeypatch.setattr(reconcile_account_stats, "MONGO_URI", "mongodb://test")
+    monkeypatch.setattr(reconcile_account_stats, "MongoClient", lambda *args, **kwargs: FakeClient(db))
+    reconcile_account_stats.run_reconciliation(fix=fix)
+
+
+def test_reconcile_reports_without_fixing(db, legacy, monkeypatch, capsys):
+    reconcile(monkeypatch, db, fix=False)
+    assert "Accounts drifting:   1" in capsys.readouterr().out
+    assert stats(db, legacy) is None
+
+
+def test_reconcile_fix_skips_accounts_that_changed_during_the_check(db, legacy, make_user, monkeypatch, capsys):
+    drifting = make_user(balance=10.0, stats={**account_stats.empty_stats(), "net_contributions": 99.0})
+    original = reconcile_account_stats.compute_stats_from_history
+
+    def compute_then_trade(database, user_data):
+        expected = original(database, user_data)
+        if str(user_data["_id"]) == legacy:
+            database.users.update_one({"_id": user_data["_id"]}, {"$inc": {"portfolio_version": 1}})
+        return expected
+
+    monkeypatch.setattr(reconcile_account_stats, "compute_stats_from_history", compute_then_trade)
+    reconcile(monkeypatch, db, fix=True)
+
+    out = capsys.readouterr().out
+    assert "Accounts fixed:      1" in out
+    assert "Accounts skipped:    1" in out
+    assert stats(db, legacy) is None
+    assert stats(db, drifting)["net_contributions"] == 0.0
+    assert stats(db, drifting)["realized_pl"] == 10.0
@@ -0,0 +1,90 @@
+import datetime
+import pytest
+from bson import ObjectId
+from services import ai_context, trade_engine
+from services.ai_context import estimate_tokens, fit_lines, render_context
+from services.valuation import value_portfolio
+
+DATE = datetime.datetime(2024, 1, 1)
+
+
+def overflow(kept):
+    return f"... {kept} kept"
+
+
+def test_lines_that_fit_are_kept_whole():
+    assert fit_lines(["aaaa", "bbbb"], 4, overflow) == ["aaaa", "bbbb"]
+
+
+def test_lines_make_room_for_the_overflow_line():
+    lines = ["x" * 12] * 10
+    fitted = fit_lines(lines, 20, overflow)
+    assert fitted == ["x" * 12] * 4 + ["... 4 kept"]
+    assert sum(estimate_tokens(line) + 1 for line in fitted) <= 20
+
+
+def test_nothing_fits_but_maybe_the_overflow_line():
+    assert fit_lines(["x" * 400], 5, overflow) == ["... 0 kept"]
+    assert fit_lines(["x" * 400], 1, overflow) == []
+
+
+@pytest.fixture
+def big_account():
+    """An account with 300 holdings and 300 traded symbols."""
+    portfolio = [{"symbol": f"S{i}", "quantity": 1.0 + i, "total_cost": 10.0, "avg_price": 10.0 / (1.0 + i)} for i in range(300)]
+    valuation = value_portfolio(portfolio, {f"S{i}": 1.0 for i in range(300)}, 1000.0, {"net_contributions": 5000.0})
+    recent = [{"type": "buy", "symbol": f"S{i}", "quantity": 1.0, "price": 10.0, "date": DATE} for i in range(20)]
+    history = [{"_id": None, "cash_in": 5000.0}] + [
+        {"_id": f"S{i}", "trades": 2, "bought": 2.0, "sold": 1.0, "buy_value": 20.0, "sell_value": 12.0, "first": DATE, "last": DATE}
+        for i in range(300)
+    ]
+    return {"name": "Big"}, valuation, recent, history
+
+
+@pytest.mark.parametrize("max_tokens", [300, 800, 2000])
+def test_context_stays_within_the_token_budget(big_account, max_tokens):
+    text = render_context(*big_account, max_tokens)
+    assert estimate_tokens(text) <= max_tokens
+    assert "Total Equity: $" in text
+    assert "smaller holdings worth" in text
+    assert "less recently traded symbols" in text
+
+
+def test_largest_holdings_are_listed_first(big_account):
+    text = render_context(*big_account, 800)
+    holdings = text.split("--- Current Holdings (300) ---\n")[1].split("\n")
+    assert holdings[0].startswith("S299: 300.00 shares")
+
+
+def test_small_account_is_listed_in_full(make_user, db):
+    user_id = make_user(name="Small", balance=50.0, portfolio=[{"symbol": "AAPL", "quantity": 1.0, "total_cost": 10.0, "avg_price": 10.0}])
+    db.transactions.insert_many([
+        {"user_id": ObjectId(user_id), "type": "deposit", "amount": 60.0, "date": DATE},
+        {"user_id": ObjectId(user_id), "type": "buy", "symbol": "AAPL", "quantity": 1.0, "price": 10.0, "commission": 0.0, "date": DATE},
+    ])
+    text = ai_context.build_context(user_id)
+    assert "AAPL: 1.00 shares" in text
+    assert "2024-01-01 BUY AAPL: 1.00 shares at $10.00" in text
+    assert "AAPL: 1 trades, bought 1.00 at avg $10.00, last 2024-01-01" in text
+    assert "..." not in text
+
+
+def test_context_is_cached_until_the_account_changes(make_user, prices, monkeypatch):
+    prices.update(AAPL=20.0)
+    user_id = make_user(balance=100.0)
+    builds = []
+    original = ai_context.build_context
+    monkeypatch.setattr(ai_context.context_cache, "_fetch", lambda key: builds.append(key) or original(key[0]))
+
+    assert ai_context.get_profile_context(user_id) == ai_context.get_profile_context(user_id)
+    assert len(builds) == 1
+    trade_engine.execute_buy(user_id, "AAPL", 1, 20.0)
+    assert "AAPL: 1.00 shares" in ai_context.get_profile_context(user_id)
+    assert len(builds) == 2
+    monkeypatch.setattr(ai_context, "quote_epoch", lambda: -1)
+    ai_context.get_profile_context(user_id)
+    assert len(builds) == 3
+
+
+def test_missing_user_has_no_context(db):
+    assert ai_context.get_profile_context(str(ObjectId())) is None
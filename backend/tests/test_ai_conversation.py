@@ -0,0 +1,167 @@
+import datetime
+import pytest
+from models.chat import ChatMessage, ChatSession
+from services import ai_conversation
+from services.ai_context import estimate_tokens
+from services.ai_conversation import OMITTED_LINE, build_conversation, exchange_lines, fold_summary, split_window
+
+START = datetime.datetime.utcnow().replace(microsecond=0) - datetime.timedelta(hours=1)
+
+
+def exchange(i, answer_words=5):
+    return [
+        {"role": "user", "message": f"Question {i}?"},
+        {"role": "ai", "message": " ".join(["answer"] * answer_words) + f" {i}."},
+    ]
+
+
+def test_exchange_lines_pair_questions_with_their_answers():
+    messages = [{"role": "ai", "message": "Welcome!"}] + exchange(1) + [{"role": "user", "message": "Hello?"}]
+    assert exchange_lines(messages) == [
+        "AI: Welcome!",
+        "User: Question 1? -> AI: answer answer answer answer answer 1.",
+        "User: Hello?",
+    ]
+
+
+def test_exchange_lines_shorten_long_messages():
+    line, = exchange_lines([{"role": "user", "message": "why " * 200}, {"role": "ai", "message": "because " * 200}])
+    question, answer = line.split(" -> AI: ")
+    assert len(question) == len("User: ") + ai_conversation.QUESTION_CHARS
+    assert len(answer) == ai_conversation.ANSWER_CHARS
+    assert answer.endswith("...")
+
+
+def test_fold_appends_to_the_summary():
+    summary = fold_summary(None, exchange(1), 500)
+    summary = fold_summary(summary, exchange(2), 500)
+    assert summary.split("\n") == [
+        "User: Question 1? -> AI: answer answer answer answer answer 1.",
+        "User: Question 2? -> AI: answer answer answer answer answer 2.",
+    ]
+
+
+def test_fold_condenses_the_oldest_exchanges_before_dropping_any():
+    summary = None
+    for i in range(10):
+        summary = fold_summary(summary, exchange(i, answer_words=40), 200)
+    lines = summary.split("\n")
+    assert estimate_tokens(summary) <= 200
+    assert lines[0] == "User asked: Question 0?"
+    assert lines[-1].startswith("User: Question 9? -> AI: answer")
+    assert len(lines) == 10
+
+
+def test_fold_drops_the_oldest_lines_when_condensing_is_not_enough():
+    summary = None
+    for i in range(200):
+        summary = fold_summary(summary, exchange(i), 100)
+    lines = summary.split("\n")
+    assert sum(estimate_tokens(line) + 1 for line in lines) <= 100
+    assert lines[0] == OMITTED_LINE
+    assert lines[-1] == "User asked: Question 199?"
+    assert lines.count(OMITTED_LINE) == 1
+
+
+def turns(*roles_and_sizes):
+    return [{"role": role, "message": "x" * (4 * tokens)} for role, tokens in roles_and_sizes]
+
+
+def test_window_keeps_the_newest_messages_within_both_limits():
+    messages = turns(*[("user", 10), ("ai", 10)] * 5)
+    assert split_window(messages, 4, 1000) == 6
+    assert split_window(messages, 100, 35) == 8
+    assert split_window(messages, 100, 1000) == 0
+
+
+def test_window_opens_with_a_user_message():
+    messages = turns(("user", 1), ("ai", 1), ("user", 1), ("ai", 1))
+    assert split_window(messages, 3, 1000) == 2
+
+
+def test_newest_message_is_kept_however_long():
+    assert split_window(turns(("user", 1), ("user", 5000)), 10, 100) == 1
+
+
+@pytest.fixture
+def session(make_user, monkeypatch):
+    """A user whose session s1 has 4 exchanges (8 messages); the window holds 4 messages."""
+    monkeypatch.setattr(ai_conversation.Config, "AI_CONVERSATION_RECENT_MESSAGES", 4)
+    user_id = make_user()
+
+    def say(i, role, text):
+        ChatMessage(user_id, text, role, START + datetime.timedelta(minutes=i), "s1").save()
+
+    for i in range(4):
+        say(2 * i, "user", f"Question {i}?")
+        say(2 * i + 1, "ai", f"Answer {i}.")
+    return user_id, say
+
+
+def test_older_turns_are_folded_into_the_stored_summary(session):
+    user_id, _ = session
+    history, summary = build_conversation(user_id, "s1")
+    assert [m["content"] for m in history] == ["Question 2?", "Answer 2.", "Question 3?", "Answer 3."]
+    assert summary == "User: Question 0? -> AI: Answer 0.\nUser: Question 1? -> AI: Answer 1."
+    stored, through = ChatSession.get_summary(user_id, "s1")
+    assert stored == summary and through is not None
+
+
+def test_later_turns_fold_onto_the_summary(session):
+    user_id, say = session
+    build_conversation(user_id, "s1")
+    say(8, "user", "Question 4?")
+    say(9, "ai", "Answer 4.")
+    history, summary = build_conversation(user_id, "s1")
+    assert [m["content"] for m in history] == ["Question 3?", "Answer 3.", "Question 4?", "Answer 4."]
+    assert summary.split("\n")[-1] == "User: Question 2? -> AI: Answer 2."
+    assert len(summary.split("\n")) == 3
+
+
+def test_short_session_has_no_summary(make_user):
+    user_id = make_user()
+    ChatMessage(user_id, "Hi", "user", START, "s1").save()
+    assert build_conversation(user_id, "s1") == ([{"role": "user", "content": "Hi"}], None)
+
+
+def test_summary_is_only_stored_over_the_one_it_extends(session):
+    user_id, _ = session
+    _, summary = build_conversation(user_id, "s1")
+    _, through = ChatSession.get_summary(user_id, "s1")
+    # A request that read the session before the fold lost the race
+    assert not ChatSession.save_summary(user_id, "s1", None, "stale", "cursor")
+    assert ChatSession.get_summary(user_id, "s1") == (summary, through)
+    assert ChatSession.save_summary(user_id, "s1", through, "newer", "cursor")
+
+
+def test_concurrent_folds_of_the_same_turns_agree(session, monkeypatch):
+    user_id, _ = session
+    original = ChatSession.save_summary
+    results = []
+
+    def fold_elsewhere_first(*args):
+        # Another request folds the same turns right before this one stores its summary
+        monkeypatch.setattr(ChatSession, "save_summary", staticmethod(original))
+        results.append(original(*args))
+        results.append(original(*args))
+        return results[-1]
+
+    monkeypatch.setattr(ChatSession, "save_summary", staticmethod(fold_elsewhere_first))
+    history, summary = build_conversation(user_id, "s1")
+    assert results == [True, False]
+    assert ChatSession.get_summary(user_id, "s1")[0] == summary
+    assert len(history) == 4
+
+
+@pytest.mark.parametrize("session_id", [None, "", "   ", 42])
+def test_ask_requires_a_session(client, make_user, auth, session_id):
+    response = client.post(
+        "/chat/ask", headers=auth(make_user()),
+        json={"message": "Hi", "session_id": session_id, "model": "fake"}
+    )
+    assert response.status_code == 400
+
+
+def test_ask_without_a_session_saves_nothing(client, db, make_user, auth):
+    client.post("/chat/ask", headers=auth(make_user()), json={"message": "Hi", "model": "fake"})
+    assert db.chat.count_documents({}) == 0
@@ -0,0 +1,92 @@
+import time
+import pytest
+from config.config import Config
+from services import ai_models
+
+HISTORY = [{"role": "user", "content": "How is my portfolio doing?"}]
+
+
+class TaggedProvider(ai_models.FakeProvider):
+    """A FakeProvider whose answer names the provider, to tell which one answered."""
+
+    def __init__(self, name, timeout=5.0, first_chunk_delay=0.0):
+        super().__init__(timeout=timeout, chunk_delay=0, first_chunk_delay=first_chunk_delay)
+        self.name = name
+
+    async def stream(self, system_prompt, history):
+        async for chunk in super().stream(system_prompt, [{"role": "user", "content": self.name}]):
+            yield chunk
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    """Registers providers by name; with `hedge_to`, hedging is on for those pairs."""
+    registered = {}
+    monkeypatch.setattr(ai_models, "PROVIDERS", registered)
+    monkeypatch.setattr(Config, "AI_HEDGE_ENABLED", False)
+    monkeypatch.setattr(Config, "AI_HEDGE_DELAY_SECONDS", 0.05)
+
+    def register(*new, hedge_to=None):
+        for provider in new:
+            registered[provider.name] = provider
+        if hedge_to:
+            monkeypatch.setattr(Config, "AI_HEDGE_ENABLED", True)
+            monkeypatch.setattr(Config, "AI_HEDGE_FALLBACKS", hedge_to)
+
+    return register
+
+
+def test_complete_returns_the_whole_answer(providers):
+    providers(TaggedProvider("primary"))
+    assert ai_models.complete("primary", "system", HISTORY) == "This is a streamed test answer to: primary"
+
+
+def test_stream_yields_the_answer_in_chunks(providers):
+    providers(TaggedProvider("primary"))
+    chunks = list(ai_models.stream("primary", "system", HISTORY))
+    assert len(chunks) > 1
+    assert "".join(chunks).strip() == "This is a streamed test answer to: primary"
+
+
+def test_slow_completion_is_hedged_to_the_fallback(providers):
+    providers(TaggedProvider("slow", first_chunk_delay=2.0), TaggedProvider("quick"), hedge_to={"slow": "quick"})
+    started = time.monotonic()
+    answer = ai_models.complete("slow", "system", HISTORY)
+    assert answer.endswith("quick")
+    assert time.monotonic() - started < 1.0
+
+
+def test_fast_completion_is_not_hedged(providers):
+    providers(TaggedProvider("primary"), TaggedProvider("fallback", first_chunk_delay=2.0), hedge_to={"primary": "fallback"})
+    assert ai_models.complete("primary", "system", HISTORY).endswith("primary")
+
+
+def test_slow_stream_is_hedged_to_the_fallback(providers):
+    providers(TaggedProvider("slow", first_chunk_delay=2.0), TaggedProvider("quick"), hedge_to={"slow": "quick"})
+    assert "".join(ai_models.stream("slow", "system", HISTORY)).strip().endswith("quick")
+
+
+def test_hedge_falls_back_when_the_primary_times_out(providers):
+    providers(
+        TaggedProvider("slow", timeout=0.1, first_chunk_delay=2.0),
+        TaggedProvider("quick", first_chunk_delay=0.3),
+        hedge_to={"slow": "quick"}
+    )
+    assert ai_models.complete("slow", "system", HISTORY).endswith("quick")
+
+
+def test_completion_times_out(providers):
+    providers(TaggedProvider("slow", timeout=0.05, first_chunk_delay=2.0))
+    with pytest.raises(ai_models.ModelTimeout):
+        ai_models.complete("slow", "system", HISTORY)
+
+
+def test_stream_times_out(providers):
+    providers(TaggedProvider("slow", timeout=0.05, first_chunk_delay=2.0))
+    with pytest.raises(ai_models.ModelTimeout):
+        list(ai_models.stream("slow", "system", HISTORY))
+
+
+def test_unknown_model_is_rejected(providers):
+    with pytest.raises(ai_models.ModelError):
+        ai_models.complete("unknown", "system", HISTORY)
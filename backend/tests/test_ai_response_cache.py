@@ -0,0 +1,108 @@
+import pytest
+from services import ai_models, ai_response_cache
+
+
+@pytest.fixture
+def model_calls(monkeypatch):
+    """Counts the questions that reached the model."""
+    calls = []
+    original = ai_models.FakeProvider.stream
+
+    def stream(self, system_prompt, history):
+        calls.append(history[-1]["content"])
+        return original(self, system_prompt, history)
+
+    monkeypatch.setattr(ai_models.FakeProvider, "stream", stream)
+    return calls
+
+
+def ask(client, headers, message, session_id="s1", stream=False):
+    response = client.post(
+        "/chat/ask", headers=headers,
+        json={"message": message, "session_id": session_id, "model": "fake", "stream": stream}
+    )
+    return response.get_data(as_text=True) if stream else response.get_json()
+
+
+@pytest.mark.parametrize("question", [
+    "How is my portfolio doing?", "how's my portfolio doing", "Hey, how is the portfolio doing!!",
+    "  HOW   IS MY PORTFOLIO DOING  ",
+])
+def test_equivalent_questions_normalize_alike(question):
+    assert ai_response_cache.normalize_question(question) in ("how is my portfolio doing", "how is portfolio doing")
+
+
+def test_question_of_only_filler_words_has_no_key():
+    assert ai_response_cache.make_key("u", "fake", 1, [{"role": "user", "content": "Hi, thanks!"}], None) is None
+
+
+def test_key_depends_on_the_earlier_conversation():
+    question = {"role": "user", "content": "Why?"}
+    after_aapl = [{"role": "user", "content": "Should I sell AAPL?"}, {"role": "ai", "content": "No."}, question]
+    after_msft = [{"role": "user", "content": "Should I sell MSFT?"}, {"role": "ai", "content": "No."}, question]
+    key = ai_response_cache.make_key("u", "fake", 1, after_aapl, None)
+    assert key == ai_response_cache.make_key("u", "fake", 1, list(after_aapl), None)
+    assert key != ai_response_cache.make_key("u", "fake", 1, after_msft, None)
+    assert key != ai_response_cache.make_key("u", "fake", 1, after_aapl, "User: earlier question")
+
+
+def test_opening_question_misses_then_hits_in_another_new_session(client, make_user, auth, model_calls):
+    headers = auth(make_user())
+    assert ask(client, headers, "How is my portfolio doing?", session_id="s1")["cached"] is False
+    repeat = ask(client, headers, "how's my portfolio doing", session_id="s2")
+    assert repeat["cached"] is True
+    assert repeat["content"] == "This is a streamed test answer to: How is my portfolio doing?"
+    assert len(model_calls) == 1
+
+
+def test_repeat_after_a_different_conversation_misses(client, make_user, auth, model_calls):
+    headers = auth(make_user())
+    ask(client, headers, "Should I sell AAPL?", session_id="s1")
+    ask(client, headers, "Why?", session_id="s1")
+    ask(client, headers, "Should I sell MSFT?", session_id="s2")
+    assert ask(client, headers, "Why?", session_id="s2")["cached"] is False
+    assert len(model_calls) == 4
+
+
+def test_repeat_in_the_same_session_misses(client, make_user, auth, model_calls):
+    headers = auth(make_user())
+    ask(client, headers, "How is my portfolio doing?")
+    assert ask(client, headers, "How is my portfolio doing?")["cached"] is False
+    assert len(model_calls) == 2
+
+
+def test_cached_answer_is_streamed_and_saved(client, db, make_user, auth):
+    user_id = make_user()
+    ask(client, auth(user_id), "How is my portfolio doing?")
+    body = ask(client, auth(user_id), "How is my portfolio doing?", session_id="s2", stream=True)
+    assert '"cached": true' in body.split("event: done")[-1]
+    assert db.chat.count_documents({"role": "ai"}) == 2
+
+
+def test_account_change_misses(client, db, make_user, auth, model_calls):
+    user_id = make_user()
+    ask(client, auth(user_id), "How is my portfolio doing?")
+    db.users.update_one({}, {"$inc": {"portfolio_version": 1}})
+    assert ask(client, auth(user_id), "How is my portfolio doing?", session_id="s2")["cached"] is False
+    assert len(model_calls) == 2
+
+
+def test_new_quote_epoch_misses(client, make_user, auth, model_calls, monkeypatch):
+    headers = auth(make_user())
+    ask(client, headers, "How is my portfolio doing?")
+    monkeypatch.setattr(ai_response_cache, "quote_epoch", lambda: -1)
+    assert ask(client, headers, "How is my portfolio doing?", session_id="s2")["cached"] is False
+
+
+def test_other_users_do_not_share_answers(client, make_user, auth, model_calls):
+    ask(client, auth(make_user()), "How is my portfolio doing?")
+    assert ask(client, auth(make_user()), "How is my portfolio doing?")["cached"] is False
+    assert len(model_calls) == 2
+
+
+def test_disabled_cache_always_misses(client, make_user, auth, model_calls, monkeypatch):
+    monkeypatch.setattr(ai_response_cache.Config, "AI_RESPONSE_CACHE_ENABLED", False)
+    headers = auth(make_user())
+    ask(client, headers, "How is my portfolio doing?")
+    assert ask(client, headers, "How is my portfolio doing?", session_id="s2")["cached"] is False
+    assert len(model_calls) == 2
@@ -0,0 +1,75 @@
+import pytest
+from bson import ObjectId
+from routes import transaction_routes
+from services import account_stats
+
+
+@pytest.fixture
+def investor(make_user):
+    """An account with $100 and 10 AAPL bought at $10."""
+    return make_user(
+        balance=100.0, stats={**account_stats.empty_stats(), "net_contributions": 200.0},
+        portfolio=[{"symbol": "AAPL", "quantity": 10.0, "total_cost": 100.0, "avg_price": 10.0}]
+    )
+
+
+def submit(client, auth, user_id, *orders):
+    return client.post("/transaction/batch", headers=auth(user_id), json={"orders": list(orders)})
+
+
+def order(type, symbol, quantity, price, commission=0):
+    return {"type": type, "symbol": symbol, "quantity": quantity, "price": price, "commission": commission}
+
+
+def account(db, user_id):
+    return db.users.find_one({"_id": ObjectId(user_id)})
+
+
+def test_sells_fund_the_buys_that_follow_them(client, auth, db, investor):
+    response = submit(client, auth, investor, order("sell", "AAPL", 10, 20.0, 1), order("buy", "MSFT", 5, 50.0, 1))
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["new_balance"] == pytest.approx(48.0)
+    assert len(body["transaction_ids"]) == 2
+    stored = account(db, investor)
+    assert [h["symbol"] for h in stored["portfolio"]] == ["MSFT"]
+    assert stored["stats"]["trade_count"] == 2
+    assert stored["stats"]["total_commissions"] == pytest.approx(2.0)
+    assert stored["stats"]["realized_pl"] == pytest.approx(98.0)
+    assert [t["type"] for t in db.transactions.find().sort("_id", 1)] == ["sell", "buy"]
+
+
+def test_buys_cannot_be_funded_by_later_sells(client, auth, db, investor):
+    response = submit(client, auth, investor, order("buy", "MSFT", 5, 50.0), order("sell", "AAPL", 10, 20.0))
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Order 1 (MSFT): Insufficient funds"
+    assert account(db, investor)["balance"] == 100.0
+    assert db.transactions.count_documents({}) == 0
+
+
+def test_one_failing_order_applies_none(client, auth, db, investor):
+    response = submit(client, auth, investor, order("sell", "AAPL", 5, 20.0), order("sell", "AAPL", 6, 20.0))
+    assert response.get_json()["error"].startswith("Order 2 (AAPL)")
+    stored = account(db, investor)
+    assert stored["portfolio"][0]["quantity"] == 10.0
+    assert stored["portfolio_version"] == 1
+    assert db.transactions.count_documents({}) == 0
+
+
+@pytest.mark.parametrize("orders, error", [
+    ([], "non-empty"),
+    ([{"type": "hold", "symbol": "AAPL", "quantity": 1, "price": 1}], "Order 1"),
+    ([order("buy", "AAPL", 1, 1.0), order("buy", "", 1, 1.0)], "Order 2"),
+    ([order("sell", "AAPL", 1, 1.0, commission=5)], "Order 1"),
+])
+def test_invalid_orders_are_rejected_before_anything_runs(client, auth, db, investor, orders, error):
+    response = submit(client, auth, investor, *orders)
+    assert response.status_code == 400
+    assert error in response.get_json()["error"]
+    assert account(db, investor)["portfolio_version"] == 1
+
+
+def test_batch_size_is_bounded(client, auth, investor, monkeypatch):
+    monkeypatch.setattr(transaction_routes.Config, "TRADE_BATCH_MAX_ORDERS", 2)
+    response = submit(client, auth, investor, *[order("buy", "AAPL", 1, 1.0)] * 3)
+    assert response.status_code == 400
@@ -0,0 +1,153 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from services.cache import SWRCache, TTLCache
+
+
+class RecordingExecutor:
+    """Queues submitted calls until run() instead of running them."""
+
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        self.calls.append((fn, args))
+
+    def run(self):
+        calls, self.calls = self.calls, []
+        for fn, args in calls:
+            fn(*args)
+
+
+class Upstream:
+    """A fetch function that returns "<key>-<n>" for its n-th call, or None while `down`."""
+
+    def __init__(self):
+        self.calls = []
+        self.down = False
+
+    def __call__(self, key):
+        self.calls.append(key)
+        return None if self.down else f"{key}-{len(self.calls)}"
+
+
+@pytest.fixture
+def upstream():
+    return Upstream()
+
+
+def test_fresh_value_is_served_from_memory(upstream):
+    cache = SWRCache(upstream, ttl=60)
+    assert cache.get("AAPL") == "AAPL-1"
+    assert cache.get("AAPL") == "AAPL-1"
+    assert upstream.calls == ["AAPL"]
+    assert cache.stats()["hits"] == 1
+
+
+def test_concurrent_misses_share_one_fetch():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fetch(key):
+        calls.append(key)
+        started.set()
+        release.wait(5)
+        return 42
+
+    cache = SWRCache(fetch, ttl=60)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        first = pool.submit(cache.get, "AAPL")
+        started.wait(5)
+        others = [pool.submit(cache.get, "AAPL") for _ in range(7)]
+        # every other caller is waiting on the leader's fetch
+        deadline = time.monotonic() + 5
+        while cache.stats()["misses"] < 8 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+        assert [f.result(5) for f in [first] + others] == [42] * 8
+    assert calls == ["AAPL"]
+    assert cache.stats()["inflight"] == 0
+
+
+def test_stale_value_is_served_while_one_refresh_runs_on_the_executor(upstream):
+    executor = RecordingExecutor()
+    cache = SWRCache(upstream, ttl=0, stale_ttl=60, executor=executor)
+    cache.put("AAPL", "old")
+    assert cache.get("AAPL") == "old"
+    assert cache.get("AAPL") == "old"
+    assert len(executor.calls) == 1
+    assert upstream.calls == []
+    executor.run()
+    assert cache.peek("AAPL") == "AAPL-1"
+    assert cache.stats()["stale_hits"] == 2
+
+
+def test_expired_value_is_fetched_in_the_caller(upstream):
+    executor = RecordingExecutor()
+    cache = SWRCache(upstream, ttl=0, stale_ttl=0, executor=executor)
+    cache.put("AAPL", "old")
+    assert cache.get("AAPL") == "AAPL-1"
+    assert executor.calls == []
+
+
+def test_failures_are_not_cached_and_fall_back_to_the_last_value(upstream):
+    cache = SWRCache(upstream, ttl=0)
+    cache.put("AAPL", "old")
+    upstream.down = True
+    assert cache.get("AAPL") == "old"
+    assert cache.get("MSFT") is None
+    assert cache.peek("MSFT") is None
+    upstream.down = False
+    assert cache.get("MSFT") == "MSFT-3"
+
+
+def test_raising_fetch_counts_as_a_failure():
+    def fetch(key):
+        raise RuntimeError("upstream down")
+
+    cache = SWRCache(fetch, ttl=60)
+    assert cache.get("AAPL") is None
+    assert cache.stats()["inflight"] == 0
+
+
+def test_least_recently_used_key_is_evicted(upstream):
+    cache = SWRCache(upstream, ttl=60, max_size=2)
+    cache.get("A")
+    cache.get("B")
+    cache.get("A")
+    cache.get("C")
+    assert cache.peek("B") is None
+    assert cache.peek("A") == "A-1"
+
+
+def test_get_many_collapses_duplicates_and_fetches_misses_on_the_executor():
+    calls = []
+
+    def fetch(key):
+        calls.append((key, threading.current_thread().name))
+        return key.lower()
+
+    cache = SWRCache(fetch, ttl=60)
+    cache.put("A", "cached")
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="batch") as executor:
+        assert cache.get_many(["A", "B", "C", "B"], executor=executor) == {"A": "cached", "B": "b", "C": "c"}
+    assert sorted(key for key, _ in calls) == ["B", "C"]
+    assert all(thread.startswith("batch") for _, thread in calls)
+
+
+def test_refresh_many_refetches_fresh_keys(upstream):
+    cache = SWRCache(upstream, ttl=60)
+    cache.get("A")
+    assert cache.refresh_many(["A", "A"]) == 1
+    assert cache.peek("A") == "A-2"
+
+
+def test_ttl_cache_expires_values():
+    now = [0.0]
+    cache = TTLCache(ttl=10, clock=lambda: now[0])
+    cache.put("key", "value")
+    now[0] = 9.9
+    assert cache.get("key") == "value"
+    now[0] = 10.0
+    assert cache.get("key") is None
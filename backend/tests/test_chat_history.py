@@ -0,0 +1,77 @@
+import datetime
+import pytest
+from bson import ObjectId
+from config.config import Config
+
+START = datetime.datetime.utcnow().replace(microsecond=0) - datetime.timedelta(hours=1)
+
+
+@pytest.fixture
+def conversation(db, make_user):
+    """A user with 7 messages in session s1 (two pairs sharing a timestamp) and one in s2. Returns (user_id, s1 texts oldest first)."""
+    user_id = make_user()
+    minutes = [0, 1, 1, 2, 3, 3, 4]
+    texts = [f"m{i}" for i in range(len(minutes))]
+    for text, minute in zip(texts, minutes):
+        db.chat.insert_one({
+            "user_id": ObjectId(user_id), "session_id": "s1", "session_name": "One", "role": "user",
+            "message": text, "timestamp": START + datetime.timedelta(minutes=minute)
+        })
+    db.chat.insert_one({"user_id": ObjectId(user_id), "session_id": "s2", "role": "user", "message": "other", "timestamp": START})
+    db.chat.insert_one({"user_id": ObjectId(), "session_id": "s1", "role": "user", "message": "not mine", "timestamp": START})
+    return user_id, texts
+
+
+def history(client, auth, user_id, query):
+    return client.get(f"/chat/history?{query}", headers=auth(user_id))
+
+
+def test_whole_session_is_returned_oldest_first(client, auth, conversation):
+    user_id, texts = conversation
+    body = history(client, auth, user_id, "session_id=s1").get_json()
+    assert [m["message"] for m in body["messages"]] == texts
+    assert set(body["messages"][0]) == {"_id", "role", "message", "timestamp"}
+
+
+def test_pages_go_back_in_time_and_cover_the_session_once(client, auth, conversation):
+    user_id, texts = conversation
+    pages, before = [], None
+    while True:
+        body = history(client, auth, user_id, "session_id=s1&limit=2" + (f"&before={before}" if before else "")).get_json()
+        pages.append([m["message"] for m in body["messages"]])
+        before = body["next_cursor"]
+        if before is None:
+            break
+    assert pages == [["m5", "m6"], ["m3", "m4"], ["m1", "m2"], ["m0"]]
+
+
+def test_page_across_sessions_names_them(client, auth, conversation):
+    user_id, _ = conversation
+    messages = history(client, auth, user_id, "limit=100").get_json()["messages"]
+    assert len(messages) == 8
+    assert {m["session_id"] for m in messages} == {"s1", "s2"}
+
+
+def test_last_full_page_has_no_cursor(client, auth, conversation):
+    user_id, texts = conversation
+    assert history(client, auth, user_id, f"session_id=s1&limit={len(texts)}").get_json()["next_cursor"] is None
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=abc", "limit=2&before=garbage"])
+def test_invalid_paging_is_rejected(client, auth, conversation, query):
+    user_id, _ = conversation
+    assert history(client, auth, user_id, f"session_id=s1&{query}").status_code == 400
+
+
+def test_deleting_a_session_keeps_the_others(client, auth, db, conversation):
+    user_id, texts = conversation
+    response = client.delete("/chat/sessions/s1", headers=auth(user_id))
+    assert response.status_code == 200
+    assert db.chat.count_documents({"user_id": ObjectId(user_id)}) == 1
+    assert db.chat.count_documents({"message": "not mine"}) == 1
+    assert client.delete("/chat/sessions/s1", headers=auth(user_id)).status_code == 404
+
+
+def test_messages_expire_after_the_retention_period(db):
+    ttl = [index for index in db.chat.index_information().values() if "expireAfterSeconds" in index]
+    assert [(index["key"], index["expireAfterSeconds"]) for index in ttl] == [([("timestamp", 1)], int(Config.CHAT_RETENTION_DAYS * 24 * 3600))]
@@ -0,0 +1,91 @@
+import datetime
+import pytest
+from bson import ObjectId
+from config.config import Config
+from models.chat import ChatMessage, ChatSession
+
+NOW = datetime.datetime.utcnow().replace(microsecond=0)
+
+
+def say(user_id, session_id, minutes_ago, role="user", session_name="Portfolio"):
+    timestamp = NOW - datetime.timedelta(minutes=minutes_ago)
+    return ChatMessage(user_id, f"message at -{minutes_ago}", role, timestamp, session_id, session_name).save()
+
+
+def session(db, user_id, session_id):
+    return db.chat_sessions.find_one({"user_id": ObjectId(user_id), "session_id": session_id})
+
+
+@pytest.fixture
+def user_id(make_user):
+    return make_user()
+
+
+def test_messages_upsert_their_session(db, user_id):
+    say(user_id, "s1", 10, session_name="First name")
+    say(user_id, "s1", 20, role="ai")
+    say(user_id, "s1", 5, session_name="Renamed")
+    stored = session(db, user_id, "s1")
+    assert stored["message_count"] == 3
+    assert stored["created_at"] == NOW - datetime.timedelta(minutes=20)
+    assert stored["last_message_time"] == NOW - datetime.timedelta(minutes=5)
+    assert stored["session_name"] == "Renamed"
+    assert db.chat_sessions.count_documents({}) == 1
+
+
+def test_sessions_are_listed_most_recent_first(client, auth, user_id):
+    say(user_id, "old", 30)
+    say(user_id, "new", 1)
+    say(user_id, "old", 20)
+    sessions = client.get("/chat/sessions", headers=auth(user_id)).get_json()["sessions"]
+    assert [(s["session_id"], s["message_count"]) for s in sessions] == [("new", 1), ("old", 2)]
+
+
+def test_deleting_a_session_removes_its_summary(client, auth, db, user_id):
+    say(user_id, "s1", 1)
+    assert client.delete("/chat/sessions/s1", headers=auth(user_id)).status_code == 200
+    assert session(db, user_id, "s1") is None
+
+
+@pytest.fixture
+def expired(db, user_id):
+    """Session s1 with two retained messages and two that the TTL index already deleted."""
+    retention = datetime.timedelta(days=Config.CHAT_RETENTION_DAYS)
+    for minutes_ago in (2, 1):
+        say(user_id, "s1", minutes_ago)
+    for message in [say(user_id, "s1", 0) for _ in range(2)]:
+        db.chat.delete_one({"_id": ObjectId(message.id)})
+    # ...which were its first messages
+    db.chat_sessions.update_one(
+        {"session_id": "s1"}, {"$set": {"created_at": NOW - retention - datetime.timedelta(days=1)}}
+    )
+    return "s1"
+
+
+def test_listing_recounts_sessions_with_expired_messages(db, user_id, expired):
+    listed, = ChatSession.find_by_user(user_id)
+    assert listed["message_count"] == 2
+    stored = session(db, user_id, expired)
+    assert stored["message_count"] == 2
+    assert stored["created_at"] == NOW - datetime.timedelta(minutes=2)
+
+
+def test_recount_does_not_overwrite_a_message_counted_meanwhile(db, user_id, expired, monkeypatch):
+    original = ChatSession.recount
+
+    def message_then_recount(uid, sessions, since):
+        say(user_id, expired, 0)
+        original(uid, sessions, since)
+
+    monkeypatch.setattr(ChatSession, "recount", staticmethod(message_then_recount))
+    ChatSession.find_by_user(user_id)
+    assert session(db, user_id, expired)["message_count"] == 5
+    # The next listing recounts it: the two retained messages and the new one
+    monkeypatch.undo()
+    assert ChatSession.find_by_user(user_id)[0]["message_count"] == 3
+
+
+def test_recent_sessions_are_not_recounted(db, user_id, monkeypatch):
+    say(user_id, "s1", 1)
+    monkeypatch.setattr(ChatSession, "recount", staticmethod(lambda *args: pytest.fail("recounted")))
+    assert ChatSession.find_by_user(user_id)[0]["message_count"] == 1
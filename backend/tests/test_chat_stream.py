@@ -0,0 +1,70 @@
+import json
+from routes.chat import sse_event
+
+
+def parse_sse(body):
+    """Splits a text/event-stream body into [(event, data)]."""
+    events = []
+    for block in body.split("\n\n"):
+        if not block:
+            continue
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def ask(client, headers, message, session_id="s1", **body):
+    return client.post(
+        "/chat/ask", headers=headers,
+        json={"message": message, "session_id": session_id, "model": "fake", **body}
+    )
+
+
+def test_sse_event_framing():
+    assert sse_event("delta", {"content": "Hi"}) == 'event: delta\ndata: {"content": "Hi"}\n\n'
+
+
+def test_streamed_answer_is_framed_as_server_sent_events(client, make_user, auth):
+    response = ask(client, auth(make_user()), "How is my portfolio doing?", stream=True)
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-cache"
+    body = response.get_data(as_text=True)
+    assert body.endswith("\n\n")
+    events = parse_sse(body)
+    assert events[0] == ("start", {"session_id": "s1"})
+    assert [event for event, _ in events[1:-1]] == ["delta"] * (len(events) - 2)
+    done, answer = events[-1]
+    assert done == "done"
+    assert answer["content"] == "".join(data["content"] for _, data in events[1:-1]).strip()
+    assert answer["cached"] is False
+
+
+def test_accept_header_selects_streaming(client, make_user, auth):
+    headers = {**auth(make_user()), "Accept": "text/event-stream"}
+    response = ask(client, headers, "Hello there")
+    assert response.mimetype == "text/event-stream"
+    assert parse_sse(response.get_data(as_text=True))[-1][0] == "done"
+
+
+def test_streamed_answer_is_saved_once(client, db, make_user, auth):
+    user_id = make_user()
+    ask(client, auth(user_id), "How is my portfolio doing?", stream=True).get_data()
+
+    messages = list(db.chat.find({"session_id": "s1"}).sort("timestamp", 1))
+    assert [m["role"] for m in messages] == ["user", "ai"]
+    assert messages[1]["message"] == "This is a streamed test answer to: How is my portfolio doing?"
+
+
+def test_blocking_answer_is_json(client, make_user, auth):
+    response = ask(client, auth(make_user()), "How is my portfolio doing?")
+    assert response.status_code == 200
+    assert response.get_json() == {
+        "role": "ai", "content": "This is a streamed test answer to: How is my portfolio doing?", "cached": False
+    }
+
+
+def test_unknown_model_is_rejected_before_streaming(client, make_user, auth):
+    response = ask(client, auth(make_user()), "Hi", stream=True, model="unknown")
+    assert response.status_code == 400
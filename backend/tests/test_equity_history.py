@@ -0,0 +1,101 @@
+import datetime
+import pytest
+from bson import ObjectId
+from services import account_stats, equity_history, leaderboard
+from services.equity_history import SLOTS, load_points, period_baselines, period_return, record_day
+
+
+def day(month, day_of_month):
+    return datetime.datetime(2024, month, day_of_month)
+
+
+@pytest.fixture
+def accounts(make_user):
+    return [ObjectId(make_user()) for _ in range(3)]
+
+
+def test_first_day_of_a_month_creates_one_bucket_per_account(db, accounts):
+    record_day(accounts, day(3, 5), [100.0, 200.0, 300.0], [90.0, 180.0, 270.0], batch_size=2)
+    assert db.equity_history.count_documents({}) == 3
+    bucket = db.equity_history.find_one({"user_id": accounts[1]})
+    assert bucket["month"] == day(3, 1)
+    assert len(bucket["equity"]) == SLOTS
+    assert bucket["equity"][4] == 200.0 and bucket["net_contributions"][4] == 180.0
+    assert bucket["equity"].count(None) == SLOTS - 1
+
+
+def test_later_days_fill_slots_of_the_same_bucket(db, accounts):
+    record_day(accounts, day(3, 5), [1.0] * 3, [1.0] * 3)
+    record_day(accounts, day(3, 6), [2.0] * 3, [1.0] * 3)
+    record_day(accounts, day(3, 6), [3.0] * 3, [1.0] * 3)  # re-run overwrites the day
+    record_day(accounts, day(4, 1), [4.0] * 3, [1.0] * 3)
+    assert db.equity_history.count_documents({"user_id": accounts[0]}) == 2
+    assert [p["equity"] for p in load_points(accounts[0])] == [1.0, 3.0, 4.0]
+
+
+def test_load_points_reads_a_date_range(accounts):
+    for d in (1, 10, 20):
+        for month in (1, 2):
+            record_day(accounts[:1], day(month, d), [float(month * 100 + d)], [0.0])
+    points = load_points(accounts[0], start=day(1, 10), end=day(2, 10))
+    assert [(p["date"], p["equity"]) for p in points] == [
+        (day(1, 10), 110.0), (day(1, 20), 120.0), (day(2, 1), 201.0), (day(2, 10), 210.0)
+    ]
+
+
+def test_period_return_adjusts_for_deposits():
+    # 1000 -> 1600 with 500 deposited in between: 100 earned on 1500
+    assert period_return(1600.0, 1500.0, 1000.0, 1000.0) == (100.0, 6.67)
+    assert period_return(0.0, 0.0, 0.0, 0.0) == (0.0, 0.0)
+
+
+def test_baselines_are_the_last_point_before_each_period(accounts):
+    young, old = accounts[0], accounts[1]
+    for d in range(1, 31):
+        record_day([old], day(3, d), [float(d)], [0.0])
+    record_day([young], day(3, 28), [50.0], [10.0])
+    baselines = period_baselines([str(young), str(old), str(accounts[2])], day(3, 30))
+    assert baselines["1d"][str(old)] == (29.0, 0.0)
+    assert baselines["7d"][str(old)] == (23.0, 0.0)
+    # Older than the history: its first point
+    assert baselines["30d"][str(old)] == (1.0, 0.0)
+    assert baselines["7d"][str(young)] == (50.0, 10.0)
+    assert str(accounts[2]) not in baselines["1d"]
+
+
+@pytest.mark.parametrize("value, period", [(None, None), ("all", None), ("24h", "1d"), ("Week", "7d"), ("1m", "30d")])
+def test_parse_timeframe(value, period):
+    assert equity_history.parse_timeframe(value) == period
+
+
+def test_unknown_timeframe_is_rejected(client):
+    with pytest.raises(ValueError):
+        equity_history.parse_timeframe("decade")
+    assert client.get("/user/top?timeframe=decade").status_code == 400
+
+
+def test_top_ranks_by_return_over_a_period(db, make_user, monkeypatch):
+    monkeypatch.setattr(leaderboard, "_snapshot", {"top": {}, "refreshed_at": None})
+    monkeypatch.setattr(leaderboard, "_baselines", {"date": None, "seen": set(), "values": {}})
+    stats = {**account_stats.empty_stats(), "net_contributions": 1000.0}
+    # Best all-time, but flat this week
+    steady = make_user(name="steady", is_public=True, balance=2000.0, stats=stats)
+    # Worse all-time, but up 100 this week
+    rising = make_user(name="rising", is_public=True, balance=1100.0, stats=stats)
+    week_ago = datetime.datetime.utcnow() - datetime.timedelta(days=8)
+    record_day([ObjectId(steady), ObjectId(rising)], week_ago, [2000.0, 1000.0], [1000.0, 1000.0])
+
+    assert [row["name"] for row in leaderboard.get_top(2, "overall_pl")] == ["steady", "rising"]
+    top = leaderboard.get_top(2, "overall_pl", "7d")
+    assert [(row["name"], row["period_pl"], row["period_pl_percentage"]) for row in top] == [("rising", 100.0, 10.0), ("steady", 0.0, 0.0)]
+
+
+def test_performance_route_returns_points_and_return(client, auth, make_user):
+    user_id = make_user()
+    today = datetime.datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    record_day([ObjectId(user_id)], today - datetime.timedelta(days=3), [100.0], [100.0])
+    record_day([ObjectId(user_id)], today, [150.0], [120.0])
+    body = client.get("/user/profile/performance?range=1w", headers=auth(user_id)).get_json()
+    assert [p["equity"] for p in body["points"]] == [100.0, 150.0]
+    assert (body["pl"], body["pl_percentage"]) == (30.0, 25.0)
+    assert client.get("/user/profile/performance?range=2w", headers=auth(user_id)).status_code == 400
@@ -0,0 +1,61 @@
+import datetime
+import random
+import numpy as np
+import pytest
+from bson import ObjectId
+from benchmarks.bench_valuation import make_accounts, value_with_python_loop
+from services import equity_history
+from services.equity_snapshots import flatten_accounts, take_equity_snapshots, value_accounts
+
+SYMBOLS = [f"SYM{i}" for i in range(30)]
+DATE = datetime.datetime(2024, 3, 15)
+
+
+def price_lookup(prices):
+    return lambda distinct: np.array([prices.get(symbol) or np.nan for symbol in distinct], dtype=np.float64)
+
+
+def test_columnar_valuation_matches_the_per_holding_loop():
+    rng = random.Random(3)
+    prices = {symbol: rng.uniform(5, 500) for symbol in SYMBOLS[1:]}  # SYM0 has no quote
+    accounts = make_accounts(300, 6, SYMBOLS) + [{"_id": "empty", "balance": 25.0, "portfolio": [], "stats": {"net_contributions": 20.0}}]
+
+    totals = value_accounts(flatten_accounts(accounts), price_lookup(prices))
+
+    assert len(totals["total_equity"]) == len(accounts)
+    for i, account in enumerate(accounts):
+        overall_pl, overall_pl_percentage, _ = value_with_python_loop(account, prices)
+        assert totals["overall_pl"][i] == pytest.approx(overall_pl, abs=0.011)
+        assert totals["overall_pl_percentage"][i] == pytest.approx(overall_pl_percentage, abs=0.011)
+    assert totals["total_equity"][-1] == 25.0
+
+
+def test_flatten_interns_symbols_and_points_holdings_at_their_account():
+    accounts = [
+        {"_id": 1, "balance": 1.0, "stats": {"net_contributions": 1.0}, "portfolio": [{"symbol": "aapl", "quantity": 1.0}, {"symbol": "MSFT", "quantity": 2.0}]},
+        {"_id": 2, "balance": 2.0, "portfolio": [{"symbol": "AAPL", "quantity": 3.0}]},
+    ]
+    columns = flatten_accounts(accounts)
+    assert columns.symbols == ["AAPL", "MSFT"]
+    assert columns.symbol_code.tolist() == [0, 1, 0]
+    assert columns.owner.tolist() == [0, 0, 1]
+    assert columns.missing_stats.tolist() == [1]
+
+
+def test_snapshot_values_every_account(db, make_user, prices):
+    prices.update(AAPL=20.0)
+    holder = make_user(balance=100.0, stats={"net_contributions": 150.0, "total_commissions": 0.0},
+                       portfolio=[{"symbol": "AAPL", "quantity": 5.0, "total_cost": 50.0, "avg_price": 10.0}])
+    # Never reconciled: its contributions come from its history
+    legacy = make_user(balance=80.0)
+    db.transactions.insert_one({"user_id": ObjectId(legacy), "type": "deposit", "amount": 100.0, "date": DATE})
+
+    assert take_equity_snapshots(DATE) == 2
+
+    assert equity_history.load_points(holder) == [{"date": DATE, "equity": 200.0, "net_contributions": 150.0}]
+    assert equity_history.load_points(legacy) == [{"date": DATE, "equity": 80.0, "net_contributions": 100.0}]
+
+
+def test_snapshot_without_accounts_writes_nothing(db):
+    assert take_equity_snapshots(DATE) == 0
+    assert db.equity_history.count_documents({}) == 0
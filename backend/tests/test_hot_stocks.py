@@ -0,0 +1,59 @@
+import pytest
+from services import hot_stocks, market_data, quotes
+
+
+@pytest.fixture
+def movers(monkeypatch):
+    """Daily changes (%) of the popular symbols, {symbol: change}; the others have no quote."""
+    changes = {}
+
+    def fetch(symbol):
+        if symbol not in changes:
+            return None
+        return {"c": 100.0 + changes[symbol], "pc": 100.0}
+
+    monkeypatch.setattr(quotes.quote_cache, "_fetch", fetch)
+    monkeypatch.setattr(market_data, "finnhub_get", lambda path, symbol: {"name": f"{symbol} Inc", "logo": f"{symbol}.png"})
+    monkeypatch.setattr(hot_stocks, "_blob", {"body": None, "etag": None, "computed_at": None})
+    quotes.quote_cache.clear()
+    market_data.profile_cache.clear()
+    yield changes
+    quotes.quote_cache.clear()
+    market_data.profile_cache.clear()
+
+
+def test_hot_stocks_are_the_biggest_movers(movers):
+    movers.update({symbol: float(i) for i, symbol in enumerate(hot_stocks.POPULAR_SYMBOLS[:10])})
+    stocks = hot_stocks.compute_hot_stocks()
+    assert [s["symbol"] for s in stocks] == hot_stocks.POPULAR_SYMBOLS[9:3:-1]
+    assert stocks[0] == {"symbol": "INTC", "currentPrice": 109.0, "dailyChange": 9.0, "companyName": "INTC Inc", "logo": "INTC.png"}
+
+
+def test_unchanged_list_is_answered_with_304(client, movers):
+    movers.update(AAPL=2.0, MSFT=-1.0)
+    first = client.get("/market/hot")
+    assert first.status_code == 200
+    assert [s["symbol"] for s in first.get_json()] == ["AAPL", "MSFT"]
+    assert "max-age" in first.headers["Cache-Control"]
+
+    revalidated = client.get("/market/hot", headers={"If-None-Match": first.headers["ETag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.get_data() == b""
+
+
+def test_changed_list_gets_a_new_etag(client, movers):
+    movers.update(AAPL=2.0)
+    etag = client.get("/market/hot").headers["ETag"]
+    movers.update(MSFT=5.0)
+    quotes.quote_cache.clear()
+    hot_stocks.refresh_hot_stocks()
+    response = client.get("/market/hot", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.get_json()[0]["symbol"] == "MSFT"
+
+
+def test_requests_between_refreshes_reuse_the_body(client, movers, monkeypatch):
+    client.get("/market/hot")
+    monkeypatch.setattr(hot_stocks, "compute_hot_stocks", lambda: pytest.fail("recomputed"))
+    assert client.get("/market/hot").status_code == 200
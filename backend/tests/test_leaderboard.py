@@ -0,0 +1,74 @@
+import pytest
+from bson import ObjectId
+from services import account_stats, leaderboard
+
+
+@pytest.fixture(autouse=True)
+def fresh_leaderboard(monkeypatch):
+    monkeypatch.setattr(leaderboard, "_snapshot", {"top": {}, "refreshed_at": None})
+    monkeypatch.setattr(leaderboard, "_baselines", {"date": None, "seen": set(), "values": {}})
+
+
+@pytest.fixture
+def traders(db, make_user, prices):
+    """Three public accounts that each deposited, and a private one that did best."""
+    prices.update(AAPL=20.0)
+
+    def trader(name, deposited, balance, shares=0.0, is_public=True):
+        return make_user(
+            name=name, is_public=is_public, balance=balance,
+            stats={**account_stats.empty_stats(), "net_contributions": deposited},
+            portfolio=[{"symbol": "AAPL", "quantity": shares, "total_cost": shares * 10, "avg_price": 10.0}] if shares else [],
+        )
+
+    return {
+        "big": trader("big", deposited=10000.0, balance=10500.0),       # +500, +5%
+        "small": trader("small", deposited=100.0, balance=50.0, shares=10),  # +150, +150%
+        "loser": trader("loser", deposited=1000.0, balance=900.0),      # -100, -10%
+        "hidden": trader("hidden", deposited=100.0, balance=10000.0, is_public=False),
+    }
+
+
+def names(rows):
+    return [row["name"] for row in rows]
+
+
+def test_top_ranks_public_users_by_overall_pl(traders):
+    rows = leaderboard.get_top(3, "overall_pl")
+    assert names(rows) == ["big", "small", "loser"]
+    assert [row["overall_pl"] for row in rows] == [500.0, 150.0, -100.0]
+
+
+def test_top_ranks_by_percentage(traders):
+    assert names(leaderboard.get_top(2, "overall_pl_percentage")) == ["small", "big"]
+
+
+def test_unknown_sort_key_falls_back_to_overall_pl(traders):
+    assert names(leaderboard.get_top(1, "balance")) == ["big"]
+
+
+def test_top_beyond_the_snapshot_reads_the_collection_in_the_same_order(traders, monkeypatch):
+    monkeypatch.setattr(leaderboard.Config, "LEADERBOARD_SNAPSHOT_SIZE", 1)
+    rows = leaderboard.get_top(10, "overall_pl_percentage")
+    assert names(rows) == ["small", "big", "loser"]
+    assert "_id" not in rows[0] and "updated_at" not in rows[0]
+
+
+def test_refresh_drops_users_that_went_private(db, traders):
+    leaderboard.refresh_leaderboard()
+    db.users.update_one({"_id": ObjectId(traders["big"])}, {"$set": {"is_public": False}})
+    assert leaderboard.refresh_leaderboard() == 2
+    assert db.leaderboard.count_documents({}) == 2
+    assert names(leaderboard.get_top(3, "overall_pl")) == ["small", "loser"]
+
+
+def test_top_is_served_from_the_snapshot_without_revaluing(traders, monkeypatch):
+    leaderboard.get_top(3, "overall_pl")
+    monkeypatch.setattr(leaderboard, "refresh_leaderboard", lambda: pytest.fail("refreshed"))
+    assert names(leaderboard.get_top(3, "overall_pl")) == ["big", "small", "loser"]
+
+
+def test_top_route(client, traders):
+    response = client.get("/user/top?limit=2&sortBy=overall_pl_percentage")
+    assert response.status_code == 200
+    assert names(response.get_json()) == ["small", "big"]
@@ -0,0 +1,70 @@
+import json
+import logging
+import queue
+import pytest
+from config import log_config
+from config.log_config import DroppingQueueHandler, JsonFormatter, SamplingFilter, TextFormatter
+
+
+def record(level=logging.INFO, msg="quote %s", args=("AAPL",), **extra):
+    entry = logging.LogRecord("services.quotes", level, __file__, 1, msg, args, None)
+    entry.__dict__.update(extra)
+    return entry
+
+
+@pytest.fixture
+def dice(monkeypatch):
+    """Makes random.random() in the sampling filter return `value[0]`."""
+    value = [0.5]
+
+    class Dice:
+        @staticmethod
+        def random():
+            return value[0]
+
+    monkeypatch.setattr(log_config, "random", Dice)
+    return value
+
+
+def test_levels_are_sampled_at_their_rate(dice):
+    sampler = SamplingFilter({logging.DEBUG: 0.0, logging.INFO: 0.6})
+    assert not sampler.filter(record(logging.DEBUG))
+    assert sampler.filter(record(logging.INFO))
+    dice[0] = 0.7
+    assert not sampler.filter(record(logging.INFO))
+
+
+def test_warnings_and_unlisted_levels_are_always_kept(dice):
+    sampler = SamplingFilter({logging.INFO: 0.0, logging.WARNING: 0.0})
+    assert sampler.filter(record(logging.WARNING))
+    assert sampler.filter(record(logging.ERROR))
+    assert sampler.filter(record(logging.DEBUG))
+
+
+def test_per_call_sample_rate_overrides_the_level_rate(dice):
+    sampler = SamplingFilter({logging.INFO: 1.0})
+    assert not sampler.filter(record(sample_rate=0.1))
+    dice[0] = 0.05
+    assert sampler.filter(record(sample_rate=0.1))
+    assert SamplingFilter({logging.INFO: 0.0}).filter(record(sample_rate=1.0))
+
+
+def test_full_queue_drops_records_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(record())
+    handler.handle(record())
+    assert handler.dropped == 1
+    queued = handler.queue.get_nowait()
+    assert (queued.msg, queued.args) == ("quote AAPL", None)
+
+
+def test_json_lines_carry_extra_fields():
+    line = json.loads(JsonFormatter().format(record(user_id="u1", sample_rate=0.5)))
+    assert line["message"] == "quote AAPL"
+    assert line["level"] == "INFO"
+    assert line["user_id"] == "u1"
+    assert "sample_rate" not in line
+
+
+def test_text_lines_append_extra_fields():
+    assert TextFormatter().format(record(symbol="AAPL")).endswith("INFO [services.quotes] quote AAPL symbol=AAPL")
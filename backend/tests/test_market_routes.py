@@ -0,0 +1,77 @@
+import pytest
+from routes import market_routes
+from services import market_data
+from services.rate_limit import KeyedRateLimiter
+
+
+@pytest.fixture
+def finnhub(monkeypatch):
+    """Serves market data calls from `responses` ({path: data}) and records them."""
+    calls, responses = [], {}
+
+    def finnhub_get(path, **params):
+        calls.append((path, params))
+        return responses.get(path)
+
+    monkeypatch.setattr(market_data, "finnhub_get", finnhub_get)
+    for cache in (market_data.profile_cache, market_data.search_cache, market_data.news_cache):
+        cache.clear()
+    yield calls, responses
+    for cache in (market_data.profile_cache, market_data.search_cache, market_data.news_cache):
+        cache.clear()
+
+
+def from_ip(ip):
+    return {"environ_base": {"REMOTE_ADDR": ip}}
+
+
+def test_client_over_its_budget_gets_429_with_retry_after(client, prices, monkeypatch):
+    monkeypatch.setattr(market_routes, "client_limiter", KeyedRateLimiter(60, capacity=2))
+    prices.update(AAPL=150.0)
+    assert [client.get("/market/quote/AAPL", **from_ip("10.0.0.1")).status_code for _ in range(3)] == [200, 200, 429]
+    response = client.get("/market/quote/AAPL", **from_ip("10.0.0.1"))
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    # Other clients keep their own budget
+    assert client.get("/market/quote/AAPL", **from_ip("10.0.0.2")).status_code == 200
+
+
+def test_quotes_are_served_from_the_quote_cache(client, prices):
+    prices.update(AAPL=150.0)
+    body = client.get("/market/quotes?symbols=aapl, NONE,AAPL").get_json()
+    assert body["AAPL"]["c"] == 150.0
+    assert body["NONE"] is None
+    assert client.get("/market/quote/NONE").status_code == 502
+
+
+@pytest.mark.parametrize("symbols", ["", "AAPL,<script>", ",".join(f"S{i}" for i in range(51))])
+def test_invalid_symbol_lists_are_rejected(client, symbols):
+    assert client.get(f"/market/quotes?symbols={symbols}").status_code == 400
+
+
+def test_profiles_are_fetched_once(client, finnhub):
+    calls, responses = finnhub
+    responses["/stock/profile2"] = {"name": "Apple Inc"}
+    assert client.get("/market/profile/aapl").get_json() == {"name": "Apple Inc"}
+    assert client.get("/market/profile/AAPL").get_json() == {"name": "Apple Inc"}
+    assert calls == [("/stock/profile2", {"symbol": "AAPL"})]
+
+
+def test_equivalent_searches_share_a_cache_entry(client, finnhub):
+    calls, responses = finnhub
+    responses["/search"] = {"result": [{"symbol": "AAPL"}, {"symbol": "AAPL.MX"}, {"symbol": "APLE"}]}
+    assert client.get("/market/search?q=App%20Le").get_json() == [{"symbol": "AAPL"}, {"symbol": "APLE"}]
+    assert client.get("/market/search?q=app++le&limit=1").get_json() == [{"symbol": "AAPL"}]
+    assert len(calls) == 1
+    assert client.get("/market/search?q=" + "x" * 51).status_code == 400
+
+
+def test_news_keeps_articles_with_images(client, finnhub):
+    _, responses = finnhub
+    responses["/news"] = [{"headline": "a", "image": "a.png"}, {"headline": "b", "image": ""}]
+    assert [a["headline"] for a in client.get("/market/news").get_json()] == ["a"]
+    assert client.get("/market/news?category=sports").status_code == 400
+
+
+def test_unavailable_upstream_is_a_502(client, finnhub):
+    assert client.get("/market/news").status_code == 502
@@ -0,0 +1,75 @@
+import pytest
+from services import metrics
+from services.metrics import Histogram, timed
+
+TOKEN = "scrape-token"
+
+
+@pytest.fixture
+def token(monkeypatch):
+    monkeypatch.setattr(metrics.Config, "METRICS_TOKEN", TOKEN)
+
+
+def test_metrics_are_hidden_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(metrics.Config, "METRICS_TOKEN", "")
+    assert client.get("/metrics").status_code == 404
+    assert client.get("/metrics", headers={"Authorization": "Bearer "}).status_code == 404
+
+
+@pytest.mark.parametrize("authorization", [None, "Bearer wrong", f"Basic {TOKEN}", TOKEN])
+def test_metrics_need_the_bearer_token(client, token, authorization):
+    headers = {"Authorization": authorization} if authorization else {}
+    assert client.get("/metrics", headers=headers).status_code == 401
+
+
+def test_requests_are_counted_per_endpoint(client, token):
+    client.get("/market/quotes")
+    body = client.get("/metrics", headers={"Authorization": f"Bearer {TOKEN}"}).get_data(as_text=True)
+    assert 'smartinvest_http_requests_total{endpoint="market.quotes",method="GET",status="400"}' in body
+    assert 'smartinvest_http_request_component_seconds_count{endpoint="market.quotes",component="mongo"}' in body
+
+
+def test_responses_carry_server_timing(client):
+    header = client.get("/market/quotes").headers["Server-Timing"]
+    assert [part.split(";")[0] for part in header.split(", ")] == ["mongo", "finnhub", "ai", "total"]
+
+
+def test_profiling_needs_the_token(client, token, monkeypatch, tmp_path):
+    monkeypatch.setattr(metrics.Config, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(metrics.Config, "PROFILE_DIR", str(tmp_path))
+    assert "X-Profile-File" not in client.get("/market/quotes", headers={"X-Profile-Token": "wrong"}).headers
+    response = client.get("/market/quotes", headers={"X-Profile-Token": TOKEN})
+    assert (tmp_path / response.headers["X-Profile-File"]).exists()
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("h", "help", ("endpoint",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(("x",), value)
+    assert histogram.render()[2:] == [
+        'h_bucket{endpoint="x",le="0.1"} 1',
+        'h_bucket{endpoint="x",le="1.0"} 2',
+        'h_bucket{endpoint="x",le="+Inf"} 3',
+        'h_sum{endpoint="x"} 5.55',
+        'h_count{endpoint="x"} 3',
+    ]
+
+
+def test_nested_timed_blocks_count_once(monkeypatch):
+    ticks = iter([0.0, 1.0, 3.0, 10.0])
+
+    class Clock:
+        @staticmethod
+        def perf_counter():
+            return next(ticks)
+
+    monkeypatch.setattr(metrics, "time", Clock)
+    metrics._local.timings = dict.fromkeys(metrics.COMPONENTS, 0.0)
+    metrics._local.active = set()
+    try:
+        with timed("finnhub"):
+            with timed("finnhub", "/quote"):
+                pass
+        assert metrics._local.timings["finnhub"] == 10.0
+    finally:
+        metrics._local.timings = metrics._local.active = None
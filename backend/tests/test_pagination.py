@@ -0,0 +1,81 @@
+import datetime
+import json
+import pytest
+from bson import ObjectId
+from utils.pagination import decode_cursor, encode_cursor, parse_limit
+
+START = datetime.datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def history(db, make_user):
+    """A user with 7 deposits, two pairs of them on the same date. Returns (user_id, ids newest first)."""
+    user_id = make_user()
+    dates = [START, START + datetime.timedelta(days=1), START + datetime.timedelta(days=1), START + datetime.timedelta(days=2),
+             START + datetime.timedelta(days=3), START + datetime.timedelta(days=3), START + datetime.timedelta(days=4)]
+    for date in dates:
+        db.transactions.insert_one({"user_id": ObjectId(user_id), "type": "deposit", "amount": 1.0, "date": date})
+    rows = db.transactions.find({"user_id": ObjectId(user_id)}).sort([("date", -1), ("_id", -1)])
+    return user_id, [str(row["_id"]) for row in rows]
+
+
+def test_cursor_round_trip():
+    _id = ObjectId()
+    date = datetime.datetime(2024, 5, 6, 7, 8, 9, 123000)
+    cursor = encode_cursor(date, _id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (date, _id)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_cursor(START, ObjectId())[:-4]])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_parse_limit():
+    assert parse_limit(None, default=7) == 7
+    assert parse_limit("10000") == 500
+    with pytest.raises(ValueError):
+        parse_limit("0")
+
+
+def test_pages_cover_the_history_once(client, auth, history):
+    user_id, ids = history
+    seen, before = [], None
+    while True:
+        url = "/transaction/history?limit=2" + (f"&before={before}" if before else "")
+        page = client.get(url, headers=auth(user_id)).get_json()
+        assert len(page["transactions"]) <= 2
+        seen.extend(t["id"] for t in page["transactions"])
+        before = page["next_cursor"]
+        if before is None:
+            break
+    assert seen == ids
+
+
+def test_streamed_pages_cover_the_history_once(client, auth, history):
+    user_id, ids = history
+    seen, before = [], None
+    while True:
+        url = "/transaction/history?stream=1&limit=3" + (f"&before={before}" if before else "")
+        lines = [json.loads(line) for line in client.get(url, headers=auth(user_id)).get_data(as_text=True).splitlines()]
+        rows = [line for line in lines if "next_cursor" not in line]
+        assert len(rows) <= 3
+        seen.extend(row["id"] for row in rows)
+        before = lines[-1].get("next_cursor")
+        if before is None:
+            break
+    assert seen == ids
+
+
+def test_last_full_page_has_no_cursor(client, auth, history):
+    user_id, ids = history
+    page = client.get(f"/transaction/history?limit={len(ids)}", headers=auth(user_id)).get_json()
+    assert page["next_cursor"] is None
+
+
+def test_invalid_cursor_is_rejected(client, auth, history):
+    user_id, _ = history
+    response = client.get("/transaction/history?limit=2&before=garbage", headers=auth(user_id))
+    assert response.status_code == 400
@@ -0,0 +1,72 @@
+import pytest
+from services import hot_symbols as hot_symbols_module
+from services import quote_refresher, quotes
+from services.hot_symbols import HotSymbols
+from services.rate_limit import TokenBucket
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    """Replaces the Finnhub budget with a bucket of 10 tokens that does not refill."""
+    bucket = TokenBucket(0, capacity=10)
+    monkeypatch.setattr(quotes, "finnhub_budget", bucket)
+    monkeypatch.setattr(quote_refresher.Config, "QUOTE_REFRESH_BUDGET_SHARE", 0.5)
+    return bucket
+
+
+@pytest.fixture
+def hot(monkeypatch, prices):
+    """Eight held symbols; S0 is held by the most accounts. All have a quote upstream."""
+    symbols = HotSymbols(half_life=60)
+    symbols.set_held({f"S{i}": 8 - i for i in range(8)})
+    monkeypatch.setattr(quotes, "hot_symbols", symbols)
+    prices.update({f"S{i}": 10.0 + i for i in range(8)})
+    return symbols
+
+
+def test_cycle_spends_its_share_of_the_budget_on_the_highest_priorities(budget, hot):
+    assert quote_refresher.refresh_hot_quotes() == 5
+    assert [s for s in (f"S{i}" for i in range(8)) if quotes.quote_cache.peek(s)] == ["S0", "S1", "S2", "S3", "S4"]
+
+
+def test_fresh_quotes_are_not_refreshed(budget, hot):
+    quote_refresher.refresh_hot_quotes()
+    assert quote_refresher.refresh_hot_quotes() == 3
+    assert quote_refresher.refresh_hot_quotes() == 0
+
+
+def test_requested_symbols_join_the_hot_set(budget, hot):
+    hot.touch(["NEW"] * 20)
+    assert quote_refresher.pick_symbols(hot.priorities(), 2, refresh_age=10) == ["NEW", "S0"]
+
+
+def test_nothing_is_refreshed_without_budget(budget, hot):
+    assert budget.try_take(9)
+    assert quote_refresher.refresh_hot_quotes() == 0
+    assert quotes.quote_cache.stats()["size"] == 0
+
+
+def test_requests_decay_out_of_the_hot_set(monkeypatch):
+    now = [0.0]
+
+    class Clock:
+        @staticmethod
+        def monotonic():
+            return now[0]
+
+    monkeypatch.setattr(hot_symbols_module, "time", Clock)
+    symbols = HotSymbols(half_life=10, min_score=0.3)
+    symbols.touch(["AAPL"])
+    now[0] = 10.0
+    assert symbols.priorities() == {"AAPL": 0.5}
+    now[0] = 20.0
+    assert symbols.priorities() == {}
+    assert len(symbols) == 0
+
+
+def test_held_symbols_are_counted_per_account(db, make_user, monkeypatch):
+    monkeypatch.setattr(quotes, "hot_symbols", HotSymbols(half_life=60))
+    make_user(portfolio=[{"symbol": "aapl"}, {"symbol": "MSFT"}])
+    make_user(portfolio=[{"symbol": "AAPL"}])
+    assert quote_refresher.load_held_symbols() == 2
+    assert quotes.hot_symbols.priorities() == {"AAPL": 2, "MSFT": 1}
@@ -0,0 +1,90 @@
+import itertools
+import math
+import numpy as np
+import pytest
+from services import quote_table
+from services.quote_table import QuoteTable
+
+
+def quote(price, previous_close=None):
+    return {"c": price, "h": price + 1, "l": price - 1, "o": price, "pc": previous_close or price, "t": 1700000000}
+
+
+@pytest.fixture(autouse=True)
+def ticking_clock(monkeypatch):
+    """Every read of the table's clock is one tick later, so access order is never tied."""
+    ticks = itertools.count(1)
+
+    class Clock:
+        @staticmethod
+        def monotonic():
+            return float(next(ticks))
+
+    monkeypatch.setattr(quote_table, "time", Clock)
+
+
+@pytest.fixture
+def table():
+    return QuoteTable(lambda symbol: None, ttl=60, max_size=10)
+
+
+def test_quote_is_read_back_with_derived_change(table):
+    table.put("AAPL", {**quote(110.0, 100.0), "d": 999, "dp": 999})
+    assert table.peek("AAPL") == {"c": 110.0, "h": 111.0, "l": 109.0, "o": 110.0, "pc": 100.0, "t": 1700000000, "d": 10.0, "dp": 10.0}
+
+
+def test_symbols_are_interned_to_reused_slots(table):
+    table.put("AAPL", quote(1.0))
+    slot = table._slots["AAPL"]
+    table.put("AAPL", quote(2.0))
+    assert table._slots == {"AAPL": slot}
+    table.invalidate("AAPL")
+    assert table.peek("AAPL") is None
+    table.put("MSFT", quote(3.0))
+    assert table._slots == {"MSFT": slot}
+    assert table.stats()["size"] == 1
+
+
+def test_full_table_evicts_the_least_recently_read(table):
+    for i in range(10):
+        table.put(f"S{i}", quote(float(i + 1)))
+    table.peek("S0")  # peeking does not count as a read
+    table.gather(["S0"])
+    table.put("NEW", quote(99.0))
+    assert table.peek("S1") is None
+    assert table.peek("S0")["c"] == 1.0
+    assert table.peek("NEW")["c"] == 99.0
+    assert table.stats()["size"] == 10
+
+
+def test_gather_returns_nan_for_missing_symbols(table):
+    table.put("AAPL", quote(150.0, 140.0))
+    table.put("MSFT", quote(300.0))
+    prices = table.gather(["MSFT", "TSLA", "AAPL", "MSFT"])
+    assert prices[[0, 2, 3]].tolist() == [300.0, 150.0, 300.0]
+    assert math.isnan(prices[1])
+    assert table.gather(["AAPL"], field="pc").tolist() == [140.0]
+    assert table.gather([]).shape == (0,)
+
+
+def test_misses_are_fetched_and_stored_in_the_columns():
+    calls = []
+
+    def fetch(symbol):
+        calls.append(symbol)
+        return quote(42.0) if symbol != "NONE" else None
+
+    table = QuoteTable(fetch, ttl=60, max_size=4)
+    assert table.get("AAPL")["c"] == 42.0
+    assert table.get("AAPL")["c"] == 42.0
+    assert table.get("NONE") is None
+    assert calls == ["AAPL", "NONE"]
+    assert np.isnan(table.gather(["NONE"])[0])
+
+
+def test_clear_frees_every_slot(table):
+    for i in range(10):
+        table.put(f"S{i}", quote(1.0))
+    table.clear()
+    assert table.stats()["size"] == 0
+    assert len(table._free) == 10
@@ -0,0 +1,77 @@
+import json
+import pytest
+from services import symbol_index
+from services.symbol_index import SymbolIndex
+
+ENTRIES = [
+    {"symbol": "AAPL", "displaySymbol": "AAPL", "description": "APPLE INC", "type": "Common Stock"},
+    {"symbol": "APLE", "description": "APPLE HOSPITALITY REIT INC", "type": "REIT"},
+    {"symbol": "AAP", "description": "ADVANCE AUTO PARTS INC"},
+    {"symbol": "MSFT", "description": "MICROSOFT CORP"},
+    {"symbol": "SNAP", "description": "SNAP INC - A"},
+    {"symbol": "GOOGL", "description": "ALPHABET INC-CL A"},
+    {"symbol": "aapl", "description": "duplicate, dropped"},
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return SymbolIndex(ENTRIES)
+
+
+def symbols(results):
+    return [entry["symbol"] for entry in results]
+
+
+def test_duplicate_tickers_are_kept_once(index):
+    assert len(index) == 6
+    assert index.search("AAPL", 1)[0]["description"] == "APPLE INC"
+
+
+def test_exact_ticker_ranks_first_then_longer_tickers(index):
+    assert symbols(index.search("aap", 3)) == ["AAP", "AAPL"]
+
+
+def test_name_prefix_and_name_words_match(index):
+    assert symbols(index.search("Apple", 2)) == ["AAPL", "APLE"]
+    assert symbols(index.search("hospitality", 5)) == ["APLE"]
+    assert symbols(index.search("micro soft", 5)) == ["MSFT"]
+
+
+def test_misspelled_queries_fall_back_to_trigrams(index):
+    assert symbols(index.search("alphabe", 5)) == ["GOOGL"]
+    assert symbols(index.search("microsfot", 5)) == ["MSFT"]
+
+
+def test_empty_query_has_no_results(index):
+    assert index.search("  --  ") == []
+
+
+@pytest.mark.parametrize("query", ["a", "aap", "apple", "apple hosp", "microsfot", "inc", "zzz"])
+def test_snapshot_round_trip_searches_alike(index, query):
+    restored = SymbolIndex.from_snapshot(json.loads(json.dumps(index.to_snapshot())))
+    assert restored.search(query, 10) == index.search(query, 10)
+
+
+def test_snapshot_of_another_version_is_rejected(index):
+    with pytest.raises(ValueError):
+        SymbolIndex.from_snapshot({**index.to_snapshot(), "version": symbol_index.SNAPSHOT_VERSION - 1})
+
+
+def test_load_index_writes_and_then_uses_the_snapshot(tmp_path, monkeypatch):
+    list_path, snapshot_path = tmp_path / "symbols.json", tmp_path / "index.json"
+    list_path.write_text(json.dumps(ENTRIES))
+    monkeypatch.setattr(symbol_index.Config, "SYMBOL_LIST_PATH", str(list_path))
+    monkeypatch.setattr(symbol_index.Config, "SYMBOL_INDEX_SNAPSHOT_PATH", str(snapshot_path))
+    monkeypatch.setattr(symbol_index, "_index", None)
+
+    assert symbol_index.load_index() == 6
+    assert snapshot_path.exists()
+    monkeypatch.setattr(SymbolIndex, "__init__", lambda self, entries: pytest.fail("rebuilt"))
+    assert symbol_index.load_index() == 6
+    assert symbols(symbol_index.search("msft")) == ["MSFT"]
+
+
+def test_symbols_route_serves_the_index(client, index, monkeypatch):
+    monkeypatch.setattr(symbol_index, "_index", index)
+    assert symbols(client.get("/market/symbols?q=apple&limit=1").get_json()) == ["AAPL"]
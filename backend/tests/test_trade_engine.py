@@ -0,0 +1,182 @@
+import copy
+import datetime
+import pytest
+from bson import ObjectId
+from services import account_stats, trade_engine
+from services.trade_engine import Order
+
+NOW = datetime.datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(trade_engine, "_backoff", lambda attempt: None)
+
+
+def account(db, user_id):
+    return db.users.find_one({"_id": ObjectId(user_id)})
+
+
+def holding(db, user_id, symbol):
+    return next((h for h in account(db, user_id)["portfolio"] if h["symbol"] == symbol), None)
+
+
+def apply(db, plan):
+    """Runs a (query, update) plan; returns whether its guard matched."""
+    query, update = plan
+    return db.users.update_one(query, update).matched_count == 1
+
+
+def stale_reads(monkeypatch, db, user_id, symbol, times):
+    """Makes the next `times` reads of the holding go stale: another trade buys 1 share at $20 right after each."""
+    original = trade_engine._load_holding
+    remaining = [times]
+
+    def load(uid, sym):
+        # mongomock's $elemMatch projection returns the stored holding itself, not a copy
+        state = copy.deepcopy(original(uid, sym))
+        if remaining[0] > 0:
+            remaining[0] -= 1
+            current = holding(db, user_id, symbol)
+            quantity, total_cost = current["quantity"] + 1, current["total_cost"] + 20.0
+            db.users.update_one(
+                {"_id": ObjectId(user_id), "portfolio.symbol": symbol},
+                {
+                    "$set": {"portfolio.$.quantity": quantity, "portfolio.$.total_cost": total_cost, "portfolio.$.avg_price": total_cost / quantity},
+                    "$inc": {"balance": -20.0, "portfolio_version": 1}
+                }
+            )
+        return state
+
+    monkeypatch.setattr(trade_engine, "_load_holding", load)
+
+
+@pytest.fixture
+def investor(db, make_user):
+    """An account with $1000 and 10 AAPL bought at $10."""
+    user_id = make_user(
+        balance=1000.0, stats=account_stats.empty_stats(),
+        portfolio=[{"symbol": "AAPL", "quantity": 10.0, "total_cost": 100.0, "avg_price": 10.0}]
+    )
+    return user_id
+
+
+def test_buy_adds_to_the_holding(db, investor):
+    result = trade_engine.execute_buy(investor, "AAPL", 5, 16.0, commission=1.0)
+    assert result.new_balance == pytest.approx(919.0)
+    assert holding(db, investor, "AAPL") == {"symbol": "AAPL", "quantity": 15.0, "total_cost": 180.0, "avg_price": 12.0}
+    assert account(db, investor)["portfolio_version"] == 2
+
+
+def test_stale_buy_plan_does_not_apply_after_a_concurrent_buy(db, investor):
+    stale = holding(db, investor, "AAPL")
+    trade_engine.execute_buy(investor, "AAPL", 5, 20.0)
+    assert not apply(db, trade_engine.buy_plan(investor, "AAPL", 1, 30.0, 0.0, NOW, stale))
+    assert holding(db, investor, "AAPL")["quantity"] == 15.0
+
+
+def test_stale_closing_sell_does_not_apply_after_a_concurrent_buy(db, investor):
+    stale = holding(db, investor, "AAPL")
+    trade_engine.execute_buy(investor, "AAPL", 5, 20.0)
+    assert not apply(db, trade_engine.sell_plan(investor, "AAPL", 10, 30.0, 0.0, NOW, stale))
+    assert holding(db, investor, "AAPL")["quantity"] == 15.0
+
+
+def test_concurrent_partial_sells_both_apply(db, investor):
+    stale = holding(db, investor, "AAPL")
+    assert apply(db, trade_engine.sell_plan(investor, "AAPL", 3, 12.0, 0.0, NOW, stale))
+    assert apply(db, trade_engine.sell_plan(investor, "AAPL", 3, 12.0, 0.0, NOW, stale))
+    assert holding(db, investor, "AAPL")["quantity"] == 4.0
+    assert account(db, investor)["balance"] == pytest.approx(1072.0)
+
+
+def test_concurrent_sells_that_empty_the_holding_conflict(db, investor):
+    stale = holding(db, investor, "AAPL")
+    assert apply(db, trade_engine.sell_plan(investor, "AAPL", 5, 12.0, 0.0, NOW, stale))
+    assert not apply(db, trade_engine.sell_plan(investor, "AAPL", 5, 12.0, 0.0, NOW, stale))
+    assert holding(db, investor, "AAPL")["quantity"] == 5.0
+
+
+def test_concurrent_sells_of_the_whole_holding_leave_no_empty_holding(db, investor, monkeypatch, no_backoff):
+    # Both sells read the 10 shares; the other one is applied first
+    stale = holding(db, investor, "AAPL")
+    assert apply(db, trade_engine.sell_plan(investor, "AAPL", 5, 12.0, 0.0, NOW, stale))
+    original = trade_engine._load_holding
+    reads = []
+
+    def load(uid, sym):
+        reads.append(sym)
+        return (1000.0, copy.deepcopy(stale)) if len(reads) == 1 else original(uid, sym)
+
+    monkeypatch.setattr(trade_engine, "_load_holding", load)
+    trade_engine.execute_sell(investor, "AAPL", 5, 12.0)
+    assert len(reads) == 2
+    assert holding(db, investor, "AAPL") is None
+    assert account(db, investor)["balance"] == pytest.approx(1120.0)
+
+
+def test_buy_is_retried_after_a_conflict(db, investor, monkeypatch, no_backoff):
+    stale_reads(monkeypatch, db, investor, "AAPL", times=1)
+    trade_engine.execute_buy(investor, "AAPL", 5, 20.0)
+    assert holding(db, investor, "AAPL") == {"symbol": "AAPL", "quantity": 16.0, "total_cost": 220.0, "avg_price": 220.0 / 16}
+    assert db.transactions.count_documents({"type": "buy"}) == 1
+
+
+def test_buy_gives_up_with_a_conflict(db, investor, monkeypatch, no_backoff):
+    stale_reads(monkeypatch, db, investor, "AAPL", times=trade_engine.MAX_ATTEMPTS)
+    with pytest.raises(trade_engine.TradeConflict):
+        trade_engine.execute_buy(investor, "AAPL", 5, 20.0)
+    assert db.transactions.count_documents({}) == 0
+
+
+def test_conflict_is_answered_with_409(client, auth, db, investor, monkeypatch, no_backoff):
+    stale_reads(monkeypatch, db, investor, "AAPL", times=trade_engine.MAX_ATTEMPTS)
+    response = client.post("/transaction/sell", headers=auth(investor), json={"symbol": "AAPL", "quantity": 10, "price": 20})
+    assert response.status_code == 409
+
+
+def test_buy_beyond_the_balance_is_rejected(db, investor):
+    with pytest.raises(trade_engine.InsufficientFunds):
+        trade_engine.execute_buy(investor, "AAPL", 100, 20.0)
+    assert account(db, investor)["balance"] == 1000.0
+
+
+def test_sell_beyond_the_holding_is_rejected(db, investor):
+    with pytest.raises(trade_engine.InsufficientQuantity):
+        trade_engine.execute_sell(investor, "AAPL", 11, 20.0)
+
+
+def test_holding_without_total_cost_can_be_traded(db, make_user):
+    user_id = make_user(balance=1000.0, portfolio=[{"symbol": "MSFT", "quantity": 4.0, "avg_price": 25.0}])
+    trade_engine.execute_buy(user_id, "MSFT", 1, 50.0)
+    assert holding(db, user_id, "MSFT")["total_cost"] == pytest.approx(150.0)
+    trade_engine.execute_sell(user_id, "MSFT", 2, 40.0)
+    assert holding(db, user_id, "MSFT")["quantity"] == 3.0
+
+
+def test_batch_is_applied_entirely(db, investor):
+    result = trade_engine.execute_batch(investor, [Order("sell", "AAPL", 10, 20.0), Order("buy", "MSFT", 4, 50.0)])
+    assert result.new_balance == pytest.approx(1000.0)
+    assert [h["symbol"] for h in account(db, investor)["portfolio"]] == ["MSFT"]
+    assert db.transactions.count_documents({}) == 2
+
+
+def test_failing_batch_is_not_applied(db, investor):
+    with pytest.raises(trade_engine.InsufficientFunds):
+        trade_engine.execute_batch(investor, [Order("buy", "MSFT", 4, 50.0), Order("buy", "TSLA", 10, 100.0)])
+    assert account(db, investor)["portfolio_version"] == 1
+    assert db.transactions.count_documents({}) == 0
+
+
+def test_batch_gives_up_when_the_account_keeps_changing(db, investor, monkeypatch, no_backoff):
+    original = trade_engine.plan_batch
+
+    def plan_then_trade(user_data, orders, date):
+        planned = original(user_data, orders, date)
+        trade_engine.execute_buy(investor, "AAPL", 1, 10.0)
+        return planned
+
+    monkeypatch.setattr(trade_engine, "plan_batch", plan_then_trade)
+    with pytest.raises(trade_engine.TradeConflict):
+        trade_engine.execute_batch(investor, [Order("buy", "MSFT", 1, 50.0)])
+    assert holding(db, investor, "MSFT") is None
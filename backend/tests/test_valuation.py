@@ -0,0 +1,64 @@
+import random
+import pytest
+from benchmarks.bench_valuation import make_accounts, value_with_python_loop
+from services.valuation import value_portfolio, value_portfolios
+
+SYMBOLS = [f"SYM{i}" for i in range(40)]
+
+
+@pytest.fixture
+def market():
+    rng = random.Random(7)
+    prices = {symbol: rng.uniform(5, 500) for symbol in SYMBOLS}
+    # A few symbols without a usable quote
+    prices.update(SYM0=None, SYM1=0.0)
+    del prices["SYM2"]
+    return make_accounts(200, 8, SYMBOLS), prices
+
+
+def test_engine_matches_the_per_holding_loop(market):
+    accounts, prices = market
+    for account in accounts:
+        valuation = value_portfolio(account["portfolio"], prices, account["balance"], account["stats"])
+        overall_pl, overall_pl_percentage, realized_pl = value_with_python_loop(account, prices)
+        assert valuation.overall_pl == pytest.approx(overall_pl, abs=0.011)
+        assert valuation.overall_pl_percentage == pytest.approx(overall_pl_percentage, abs=0.011)
+        assert valuation.realized_pl == pytest.approx(realized_pl, abs=0.011)
+
+
+def test_batch_matches_one_account_at_a_time(market):
+    accounts, prices = market
+    batch = value_portfolios(accounts, prices)
+    for account, valuation in zip(accounts, batch):
+        single = value_portfolio(account["portfolio"], prices, account["balance"], account["stats"])
+        assert valuation.summary() == pytest.approx(single.summary())
+
+
+def test_holding_without_a_quote_is_valued_at_its_average_price():
+    portfolio = [
+        {"symbol": "aapl", "quantity": 2.0, "total_cost": 20.0, "avg_price": 10.0},
+        {"symbol": "MSFT", "quantity": 1.0, "total_cost": 30.0, "avg_price": 30.0},
+    ]
+    valuation = value_portfolio(portfolio, {"AAPL": 15.0, "MSFT": None}, 100.0, {"net_contributions": 140.0})
+    assert [h.current_price for h in valuation.holdings] == [15.0, 30.0]
+    assert [h.has_live_price for h in valuation.holdings] == [True, False]
+    assert valuation.total_portfolio_value == 60.0
+    assert valuation.unrealized_pl == 10.0
+    assert valuation.overall_pl == 20.0
+    assert valuation.overall_pl_percentage == 14.29
+
+
+def test_account_without_contributions_reports_no_pl():
+    valuation = value_portfolio([], {}, 50.0)
+    assert (valuation.overall_pl, valuation.overall_pl_percentage) == (0.0, 0.0)
+    assert valuation.total_equity == 50.0
+
+
+def test_enhanced_portfolio_keeps_the_stored_fields_in_order():
+    portfolio = [
+        {"symbol": "B", "quantity": 1.0, "total_cost": 10.0, "avg_price": 10.0, "note": "kept"},
+        {"symbol": "A", "quantity": 3.0, "total_cost": 3.0, "avg_price": 1.0},
+    ]
+    enhanced = value_portfolio(portfolio, {"A": 2.0, "B": 12.5}).enhanced_portfolio(portfolio)
+    assert [(row["symbol"], row["current_value"], row["unrealized_pl"]) for row in enhanced] == [("B", 12.5, 2.5), ("A", 6.0, 3.0)]
+    assert enhanced[0]["note"] == "kept"
@@ -0,0 +1,49 @@
+import base64
+import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# Keyset (cursor) pagination helpers. A cursor is an opaque token holding the sort
+# key of the last row a client has seen, so the next page is an index range read
+# instead of a growing skip().
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Parses a `limit` query parameter. Raises ValueError for non-positive or non-numeric values."""
+    if value is None:
+        return default
+    limit = int(value)
+    if limit <= 0:
+        raise ValueError("limit must be positive")
+    return min(limit, maximum)
+
+def encode_cursor(date: datetime.datetime, _id: ObjectId) -> str:
+    raw = f"{date.isoformat()}|{_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    """Returns the (date, _id) pair stored in a cursor. Raises ValueError if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        date_str, id_str = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.datetime.fromisoformat(date_str), ObjectId(id_str)
+    except (ValueError, InvalidId, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def before_filter(field: str, cursor: str) -> dict:
+    """Builds the query clause selecting rows that sort strictly after `cursor` in (field, _id) descending order."""
+    value, _id = decode_cursor(cursor)
+    return {"$or": [
+        {field: {"$lt": value}},
+        {field: value, "_id": {"$lt": _id}}
+    ]}
+
+def after_filter(field: str, cursor: str) -> dict:
+    """Builds the query clause selecting rows that sort strictly after `cursor` in (field, _id) ascending order."""
+    value, _id = decode_cursor(cursor)
+    return {"$or": [
+        {field: {"$gt": value}},
+        {field: value, "_id": {"$gt": _id}}
+    ]}
@@ -21,7 +21,7 @@ function TopUsersSection() {
     const [topUsers, setTopUsers] = useState([]);
     const [isLoading, setIsLoading] = useState(true);
     const [error, setError] = useState(null);
-    const [timeframe, setTimeframe] = useState('all'); // '24h', '7d', 'all'
+    const [timeframe, setTimeframe] = useState('all'); // '24h', '1m', 'all'
     const [sortBy, setSortBy] = useState('overall_pl'); // 'overall_pl' or 'overall_pl_percentage'
 
     useEffect(() => {
@@ -35,8 +35,17 @@ function TopUsersSection() {
                 const processedUsersPromises = rawUsers.map(user => 
                     calculatePortfolioStats(user)
                 );
-                const processedUsers = await Promise.all(processedUsersPromises);
-                
+                let processedUsers = await Promise.all(processedUsersPromises);
+
+                // For a timeframe, show the P/L over that period computed from the equity history
+                if (timeframe !== 'all') {
+                    processedUsers = processedUsers.map(user => ({
+                        ...user,
+                        overall_pl: user.period_pl ?? 0,
+                        overall_pl_percentage: user.period_pl_percentage ?? 0,
+                    }));
+                }
+
                 // 3. Re-sort based on freshly calculated data, as backend sort was on stale data
                 processedUsers.sort((a, b) => b[sortBy] - a[sortBy]);
 
@@ -3,6 +3,7 @@ import { updateProfileImage, updateUserPrivacy } from '../../services/userServic
 import apiClient from '../../services/apiClient'; // apiClient for deposit
 import Spinner from '../Spinner';
 import { generateProfilePdf } from '../../utils/pdfGenerator';
+import { getHistory } from '../../services/transactionService';
 
 /**
  * Displays user's profile info, P/L stats, and allows image updates and deposits.
@@ -80,7 +81,9 @@ function ProfileHeader({ user, onImageUpdate, onTransactionSuccess, onPrivacyUpd
   const handleDownloadPdf = async () => {
     setIsGeneratingPdf(true);
     try {
-      await generateProfilePdf(user);
+      // The profile only carries the newest transactions; the export lists all of them
+      const { data: transactions } = await getHistory();
+      await generateProfilePdf({ ...user, transactions });
     } catch (error) {
       console.error("PDF Generation failed", error);
       alert(`Could not generate PDF: ${error.message}`);
@@ -1,5 +1,5 @@
 import React, { useState, useEffect, useRef } from 'react';
-import { askQuestion, deleteSession } from '../services/chatService';
+import { askQuestionStream, deleteSession } from '../services/chatService';
 import Spinner from '../components/Spinner';
 
 const Message = ({ role, content }) => (
@@ -15,6 +15,7 @@ function ChatPage() {
     const [messages, setMessages] = useState([{ role: 'ai', content: 'Hello! How can I help you today?' }]);
     const [input, setInput] = useState('');
     const [isLoading, setIsLoading] = useState(false);
+    const [isStreaming, setIsStreaming] = useState(false); // the answer has started arriving
     const [sessionId, setSessionId] = useState(null);
     const [sessionName, setSessionName] = useState("Untitled Chat");
     const [error, setError] = useState(null);
@@ -52,14 +53,21 @@ function ChatPage() {
 
         try {
             // The backend now handles context, AI calls, and saving messages.
-            const aiMessage = await askQuestion({
-                messages: newMessages.slice(1), // Exclude the initial UI-only message
+            // The answer is rendered as it streams in, in a message appended on the first chunk.
+            // Only the new message is sent: the backend keeps the conversation of the session.
+            const aiMessage = await askQuestionStream({
+                message: input,
                 session_id: sessionId,
                 session_name: sessionName,
                 model: model // Send selected model to backend
+            }, (delta) => {
+                setIsStreaming(true);
+                setMessages(prev => prev.length > newMessages.length
+                    ? [...prev.slice(0, -1), { role: 'ai', content: prev[prev.length - 1].content + delta }]
+                    : [...prev, { role: 'ai', content: delta }]);
             });
-            
-            setMessages(prev => [...prev, aiMessage]);
+
+            setMessages(prev => [...prev.slice(0, newMessages.length), aiMessage]);
 
             // Set session name after first user message
             if (messages.length === 1) { // This means only the initial AI message was there
@@ -71,9 +79,11 @@ function ChatPage() {
             console.error("Chat error:", error);
             const errorMessage = { role: 'ai', content: `Error: ${error.response?.data?.error || error.message}` };
             setError(errorMessage.content);
-            setMessages(prev => [...prev, errorMessage]);
+            // Replace a partially streamed answer with the error
+            setMessages(prev => [...prev.slice(0, newMessages.length), errorMessage]);
         } finally {
             setIsLoading(false);
+            setIsStreaming(false);
         }
     };
     
@@ -88,7 +98,7 @@ function ChatPage() {
                 {messages.map((msg, index) => (
                     <Message key={index} role={msg.role} content={msg.content} />
                 ))}
-                {isLoading && <Message role="ai" content={<Spinner />} />}
+                {isLoading && !isStreaming && <Message role="ai" content={<Spinner />} />}
                 <div ref={messagesEndRef} />
             </div>
             <div className="p-4 bg-gray-900 border-t border-gray-700">
@@ -1,7 +1,7 @@
 import axios from 'axios';
 
 // Get the base URL from environment variables, with a fallback for local development
-const BASE_URL = import.meta.env.VITE_BASE_URL_SERVER || 'http://localhost:5000';
+export const BASE_URL = import.meta.env.VITE_BASE_URL_SERVER || 'http://localhost:5000';
 
 
 /**
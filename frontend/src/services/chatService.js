@@ -1,9 +1,10 @@
-import apiClient from './api';
+import apiClient, { BASE_URL } from './api';
 
 /**
- * Sends the entire conversation history to the backend to get a response from the AI.
- * The backend will save the user message and the AI response.
- * @param {object} payload - { messages, session_id, session_name }
+ * Sends a new message of a session to the backend to get a response from the AI.
+ * The backend builds the conversation from the session's saved messages, and saves
+ * the user message and the AI response.
+ * @param {object} payload - { message, session_id, session_name, model }
  * @returns {Promise<object>} The AI's response message object { role, content }.
  */
 export const askQuestion = async (payload) => {
@@ -11,6 +12,58 @@ export const askQuestion = async (payload) => {
     return response.data;
 };
 
+/**
+ * Like askQuestion, but the answer is streamed: `onDelta` is called with every chunk of
+ * text as the model generates it (Server-Sent Events from /chat/ask).
+ * Uses fetch because axios cannot read a response body progressively in the browser.
+ * @param {object} payload - { message, session_id, session_name, model }
+ * @param {function(string): void} onDelta - Called with each new chunk of the answer.
+ * @returns {Promise<object>} The complete AI message { role, content }, once it is saved.
+ */
+export const askQuestionStream = async (payload, onDelta) => {
+    const token = localStorage.getItem('token');
+    const response = await fetch(`${BASE_URL}/chat/ask`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream',
+            ...(token ? { 'Authorization': `Bearer ${token}` } : {}),
+        },
+        body: JSON.stringify({ ...payload, stream: true }),
+    });
+    if (!response.ok) {
+        const data = await response.json().catch(() => ({}));
+        throw new Error(data.error || `Request failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line: "event: <name>\ndata: <json>\n\n"
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = 'message';
+            let data = '';
+            for (const line of rawEvent.split('\n')) {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            }
+            const parsed = data ? JSON.parse(data) : {};
+            if (event === 'delta') onDelta(parsed.content);
+            else if (event === 'done') return parsed;
+            else if (event === 'error') throw new Error(parsed.error);
+        }
+    }
+    throw new Error('The connection closed before the answer was complete');
+};
+
 /**
  * Deletes all messages for a given session from the backend.
  * @param {string} sessionId - The ID of the session to delete.
@@ -34,4 +87,13 @@ export const getHistory = async (sessionId) => {
     if (!sessionId) return { messages: [] };
     const response = await apiClient.get(`/chat/history?session_id=${sessionId}`);
     return response.data;
-} 
\ No newline at end of file
+} 
+
+/**
+ * Fetches the user's chat sessions, most recently active first.
+ * @returns {Promise<object>} { sessions: [{ session_id, session_name, last_message_time, message_count }] }
+ */
+export const getSessions = async () => {
+    const response = await apiClient.get('/chat/sessions');
+    return response.data;
+};
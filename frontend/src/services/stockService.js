@@ -1,30 +1,12 @@
-import axios from 'axios';
+import apiClient from './apiClient';
 
-const FINNHUB_API_KEY = import.meta.env.VITE_FINNHUB_API_KEY;
-console.log('API Key loaded:', FINNHUB_API_KEY ? 'Yes' : 'No');
+// All market data goes through the backend's /market endpoints, which share one
+// server-side cache (and one Finnhub API key) between every user.
 
-const FINNHUB_BASE_URL = 'https://finnhub.io/api/v1';
-
-// helper function to check if the API key is valid
-const checkApiKey = () => {
-  if (!FINNHUB_API_KEY) {
-    console.error('API Key is missing!');
-    throw new Error('Finnhub API key is missing. Please set VITE_FINNHUB_API_KEY in your .env file.');
-  }
-  return FINNHUB_API_KEY;
-};
-
-// get stock quote from finnhub
+// get stock quote through the backend (cached server-side)
 export const getStockQuote = async (symbol) => {
-  const token = checkApiKey();
   try {
-    console.log('Using API key for quote:', token ? 'Yes' : 'No');
-    const response = await axios.get(`${FINNHUB_BASE_URL}/quote`, {
-      params: {
-        symbol: symbol,
-        token: token,
-      },
-    });
+    const response = await apiClient.get(`/market/quote/${encodeURIComponent(symbol)}`);
     return response.data;
   } catch (error) {
     console.error(`Error fetching quote for ${symbol}:`, error.response?.data || error.message);
@@ -32,136 +14,65 @@ export const getStockQuote = async (symbol) => {
   }
 };
 
-// search for symbols in finnhub
-export const searchSymbols = async (query) => {
-  if (!FINNHUB_API_KEY) {
-    throw new Error('Finnhub API key is missing.');
+// get quotes for several symbols in one request; returns { SYMBOL: quote or null }
+export const getStockQuotes = async (symbols) => {
+  const unique = [...new Set(symbols.map(s => s.toUpperCase()))];
+  if (unique.length === 0) {
+    return {};
+  }
+  try {
+    const response = await apiClient.get('/market/quotes', { params: { symbols: unique.join(',') } });
+    return response.data;
+  } catch (error) {
+    console.error('Error fetching quotes:', error.response?.data || error.message);
+    return {};
   }
+};
+
+// typeahead symbol search, served from the backend's local symbol index
+export const searchSymbols = async (query) => {
   if (!query) {
     return [];
   }
 
   try {
-    const response = await axios.get(`${FINNHUB_BASE_URL}/search`, {
-      params: {
-        q: query,
-        token: FINNHUB_API_KEY,
-      },
-    });
-    return response.data.result
-      .filter(item => !item.symbol.includes('.')) // Filter out non-primary US stocks
-      .slice(0, 7); // Limit to 7 results
+    const response = await apiClient.get('/market/symbols', { params: { q: query, limit: 7 } });
+    return response.data;
   } catch (error) {
     console.error(`Error searching for symbol "${query}":`, error.message);
     return []; // Return empty array on error to prevent UI crash
   }
 };
 
-// get hot stocks from finnhub
+// get hot stocks, computed once on the server for everyone.
+// The response carries an ETag and Cache-Control, so the browser's HTTP cache
+// serves repeat visits and revalidates with a cheap 304.
 export const getHotStocks = async () => {
-  // Check cache first
-  const cachedData = sessionStorage.getItem('hotStocks');
-  if (cachedData) {
-    const { stocks, timestamp } = JSON.parse(cachedData);
-    // Cache is valid for 5 minutes
-    if (Date.now() - timestamp < 5 * 60 * 1000) {
-      console.log('Returning cached hot stocks');
-      return stocks;
-    }
-  }
-
-  const token = checkApiKey();
   try {
-    const popularSymbols = [
-      'AAPL', 'MSFT', 'GOOGL', 'AMZN', 'NVDA', 'TSLA', 'META', 'ADBE', 'CRM', 'INTC',
-      'JPM', 'BAC', 'WFC', 'GS', 'MS', 'V', 'MA',
-      'JNJ', 'UNH', 'PFE', 'MRK', 'ABBV',
-      'HD', 'MCD', 'NKE', 'SBUX', 'WMT', 'COST',
-      'BA', 'CAT', 'XOM', 'CVX', 'DIS'
-    ]; 
-
-    const stockPromises = popularSymbols.map(async (symbol) => {
-      try {
-        const quoteResponse = await axios.get(`${FINNHUB_BASE_URL}/quote`, {
-          params: { symbol, token }
-        });
-        const companyResponse = await axios.get(`${FINNHUB_BASE_URL}/stock/profile2`, {
-          params: { symbol, token }
-        });
-
-        if (quoteResponse.data && companyResponse.data && quoteResponse.data.pc !== 0) {
-          return {
-            symbol: symbol,
-            currentPrice: quoteResponse.data.c,
-            // Calculate percentage change
-            dailyChange: ((quoteResponse.data.c - quoteResponse.data.pc) / quoteResponse.data.pc) * 100,
-            companyName: companyResponse.data.name || symbol,
-            logo: companyResponse.data.logo
-          };
-        }
-        return null;
-      } catch (error) {
-        console.error(`Error fetching data for ${symbol}:`, error);
-        return null; // Return null if a single stock fails
-      }
-    });
-
-    const allStocks = await Promise.all(stockPromises);
-    
-    const top6 = allStocks
-      .filter(stock => stock && stock.dailyChange !== null && !isNaN(stock.dailyChange))
-      .sort((a, b) => b.dailyChange - a.dailyChange)
-      .slice(0, 6);
-      
-    // Save to cache
-    sessionStorage.setItem('hotStocks', JSON.stringify({ stocks: top6, timestamp: Date.now() }));
-
-    return top6;
-
+    const response = await apiClient.get('/market/hot');
+    return response.data;
   } catch (error) {
     console.error('Error fetching hot stocks:', error);
-    // If we hit the rate limit, try to return stale cache data if available
-    if (cachedData) {
-        const { stocks } = JSON.parse(cachedData);
-        console.warn('API limit reached, returning stale cached data.');
-        return stocks;
-    }
     return [];
   }
 };
 
-// get stock details from finnhub
+// get stock details through the backend
 export const getStockDetails = async (symbol) => {
-  const token = checkApiKey();
   try {
     // clean the symbol
     const cleanSymbol = symbol.replace(/[^\w]/g, '').toUpperCase();
-    console.log('Fetching data for cleaned symbol:', cleanSymbol);
 
-    // Get current quote
-    const quoteResponse = await axios.get(`${FINNHUB_BASE_URL}/quote`, {
-      params: {
-        symbol: cleanSymbol,
-        token: token
-      }
-    });
-
-    console.log('Quote response:', quoteResponse.data);
+    // Quote and company info in parallel
+    const [quoteResponse, companyResponse] = await Promise.all([
+      apiClient.get(`/market/quote/${cleanSymbol}`),
+      apiClient.get(`/market/profile/${cleanSymbol}`)
+    ]);
 
     if (!quoteResponse.data || quoteResponse.data.c === 0) {
       throw new Error(`No data available for ${cleanSymbol}`);
     }
 
-    // Get company info
-    const companyResponse = await axios.get(`${FINNHUB_BASE_URL}/stock/profile2`, {
-      params: {
-        symbol: cleanSymbol,
-        token: token
-      }
-    });
-
-    console.log('Company response:', companyResponse.data);
-
     // instead of using candle, we use quote data
     const chartData = {
       labels: [new Date(Date.now() - 24 * 60 * 60 * 1000), new Date()],
@@ -194,16 +105,13 @@ export const getStockDetails = async (symbol) => {
       logo: companyResponse.data.logo
     };
 
-    console.log('Processed data:', data);
     return data;
   } catch (error) {
     console.error(`Error fetching details for ${symbol}:`, error);
     console.error('Error response:', error.response?.data);
     console.error('Error status:', error.response?.status);
     
-    if (error.response?.status === 403) {
-      throw new Error('Invalid API key. Please check your Finnhub API key.');
-    } else if (error.response?.status === 429) {
+    if (error.response?.status === 429) {
       throw new Error('Rate limit exceeded. Please try again later.');
     }
     throw new Error(`Failed to fetch data for ${symbol}: ${error.message}`);
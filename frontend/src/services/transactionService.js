@@ -12,4 +12,26 @@ export const sellStock = (tradeData) => {
 
 export const getHistory = () => {
   return apiClient.get(`${BASE_TRANSACTION_URL}/history`);
-};
\ No newline at end of file
+};
+
+/**
+ * Fetches one page of the transaction history, newest first.
+ * @param {number} limit - Page size.
+ * @param {string|null} before - The `next_cursor` returned by the previous page.
+ * @returns {Promise} Resolves to { transactions, next_cursor }.
+ */
+export const getHistoryPage = (limit = 50, before = null) => {
+  return apiClient.get(`${BASE_TRANSACTION_URL}/history`, {
+    params: before ? { limit, before } : { limit },
+  });
+};
+
+/**
+ * Executes several buy/sell orders at once; either all of them are applied or none is.
+ * @param {Array<{type: 'buy'|'sell', symbol: string, quantity: number, price: number, commission?: number}>} orders
+ *   Executed in the given order, so list sells before the buys they fund.
+ * @returns {Promise} Resolves to { message, new_balance, transaction_ids }.
+ */
+export const submitBatchOrders = (orders) => {
+  return apiClient.post(`${BASE_TRANSACTION_URL}/batch`, { orders });
+};
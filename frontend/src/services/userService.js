@@ -3,7 +3,8 @@ import axios from 'axios';
 
 /**
  * Fetches the complete profile data for the logged-in user.
- * This includes portfolio, transactions, and calculated stats.
+ * This includes portfolio, calculated stats and the newest transactions
+ * (`transactions_next_cursor` pages further back via /transaction/history).
  * @returns {Promise<object>} The user's profile data.
  */
 export const getProfileData = async () => {
@@ -48,11 +49,12 @@ export const updateProfileImage = async (formData) => {
 /**
  * Fetches the top users, ranked by performance.
  * @param {string} timeframe - The time window for performance calculation (e.g., '24h', '1m', 'all').
+ * @param {string} sortBy - 'overall_pl' or 'overall_pl_percentage'.
  * @returns {Promise<Array>} A list of top user objects with their stats.
  */
-export const getTopUsers = async (timeframe = 'all') => {
+export const getTopUsers = async (timeframe = 'all', sortBy = 'overall_pl') => {
   try {
-    const response = await apiClient.get(`/user/top?timeframe=${timeframe}`);
+    const response = await apiClient.get('/user/top', { params: { timeframe, sortBy } });
     return response.data;
   } catch (error) {
     console.error(`Error fetching top users for timeframe ${timeframe}:`, error);
@@ -60,6 +62,16 @@ export const getTopUsers = async (timeframe = 'all') => {
   }
 };
 
+/**
+ * Fetches the logged-in user's daily equity history for the performance chart.
+ * @param {string} range - '1w', '1m', '3m', '6m', '1y' or 'all'.
+ * @returns {Promise<Object>} { range, points: [{ date, equity, net_contributions }], pl, pl_percentage }
+ */
+export const getProfilePerformance = async (range = '1m') => {
+  const response = await apiClient.get('/user/profile/performance', { params: { range } });
+  return response.data;
+};
+
 /**
  * Updates the user's privacy setting.
  * @param {boolean} isPublic - The new privacy status.
@@ -149,10 +149,10 @@ export const generateProfileAsText = (profileData) => {
     }
     summary += "\n";
 
-    // Transaction History (last 5 for brevity)
+    // Transaction History (last 5 for brevity; the profile lists them newest first)
     summary += "--- Recent Transactions (last 5) ---\n";
     if (profileData.transactions && profileData.transactions.length > 0) {
-        profileData.transactions.slice(-5).forEach(t => {
+        profileData.transactions.slice(0, 5).forEach(t => {
             summary += `${t.type.toUpperCase()} ${t.symbol || ''}: ${t.quantity ? t.quantity.toFixed(2) : ''} shares at ${formatCurrency(t.price || 0)}\n`;
         });
     } else {
@@ -1,4 +1,4 @@
-import { getStockQuote } from '../services/stockService';
+import { getStockQuotes } from '../services/stockService';
 
 export const calculatePortfolioStats = async (rawData) => {
   try {
@@ -6,8 +6,8 @@ export const calculatePortfolioStats = async (rawData) => {
     const transactions = rawData.transactions || [];
 
     // 1. Fetch live prices and enhance the portfolio
-    const quotePromises = portfolio.map(stock => getStockQuote(stock.symbol));
-    const quotes = await Promise.all(quotePromises);
+    const quotesBySymbol = await getStockQuotes(portfolio.map(stock => stock.symbol));
+    const quotes = portfolio.map(stock => quotesBySymbol[stock.symbol.toUpperCase()]);
 
     let total_portfolio_value = 0;
     let invested_amount = 0;
@@ -30,11 +30,12 @@ export const calculatePortfolioStats = async (rawData) => {
     });
 
     // 2. Calculate P&L stats
-    const net_contributions = transactions
+    // Prefer the totals computed by the backend (e.g. leaderboard rows carry no transactions)
+    const net_contributions = rawData.net_contributions ?? transactions
       .filter(t => t.type === 'deposit' || t.type === 'liquidation')
       .reduce((sum, t) => sum + (t.amount || 0), 0);
     
-    const total_commissions = transactions
+    const total_commissions = rawData.total_commissions ?? transactions
       .filter(t => t.type === 'buy' || t.type === 'sell')
       .reduce((sum, t) => sum + (t.commission || 0), 0);
 